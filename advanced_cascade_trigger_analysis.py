@@ -1,139 +1,21 @@
-import os
-import json
-import pandas as pd
-import networkx as nx
-import numpy as np
-import pickle
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.neural_network import MLPRegressor
-from sklearn.linear_model import Ridge
+import argparse
+from model_experiments import DEFAULT_EXPERIMENTS, run_experiments
+from instrumentation import add_arguments, from_arguments
 
-def load_json(file_path):
-    with open(file_path, 'r') as f:
-        data = json.load(f)
-    return data
-
-def load_graph(graph_file_path):
-    with open(graph_file_path, 'rb') as f:
-        return pickle.load(f)
-
-def extract_graph_features(graph):
-    num_nodes = graph.number_of_nodes()
-    num_edges = graph.number_of_edges()
-    in_degrees = [d for n, d in graph.in_degree()]
-    out_degrees = [d for n, d in graph.out_degree()]
-    degree_centrality = nx.degree_centrality(graph)
-    clustering_coefficient = nx.clustering(graph)
-
-    features = {
-        'num_nodes': num_nodes,
-        'num_edges': num_edges,
-        'mean_in_degree': np.mean(in_degrees),
-        'mean_out_degree': np.mean(out_degrees),
-        'mean_degree_centrality': np.mean(list(degree_centrality.values())),
-        'mean_clustering_coefficient': np.mean(list(clustering_coefficient.values()))
-    }
-    return features
-
-def combine_features(graph_features, content_features):
-    combined_features = graph_features.copy()
-    combined_features.update(content_features)
-    return combined_features
-
-def analyze_cascade_triggering_ability(base_dir, output_dir):
-    os.makedirs(output_dir, exist_ok=True)
-
-    for dataset in ['Twitter15', 'Twitter16']:
-        all_features = []
-        all_labels = []
-        for label in ['true', 'false', 'unverified', 'non-rumor']:
-            sentiment_file = os.path.join(base_dir, f"content_analysis_results_{dataset.lower()}", label, f"{label}_sentiment_emotion_analysis.json")
-            graph_dir = os.path.join(base_dir, f"graphs{dataset[-2:]}", f"{label}_graphs")
-            graph_analysis_dir = os.path.join(base_dir, f"analysis_results{dataset[-2:]}", label)
-
-            sentiment_data = load_json(sentiment_file)
-            graph_analysis_files = [f for f in os.listdir(graph_analysis_dir) if f.endswith('_graphs_analysis.json')]
-
-            for entry in sentiment_data:
-                tweet_id = entry['tweet_id']
-                sentiment_score = entry['sentiment_score']
-                sentiment_label = entry['sentiment_label']
-                emotion_label = entry['emotion_label']
-
-                graph_file_path = os.path.join(graph_dir, f"{tweet_id}.pkl")
-                if dataset == 'Twitter15':
-                    graph_analysis_file_path = os.path.join(graph_analysis_dir, f"{tweet_id}_graphs_analysis.json")
-                else:
-                    graph_analysis_file_path = os.path.join(graph_analysis_dir, f"{label}_{tweet_id}_graphs_analysis.json")
-
-                if os.path.exists(graph_file_path) and os.path.exists(graph_analysis_file_path):
-                    graph = load_graph(graph_file_path)
-                    graph_features = extract_graph_features(graph)
-                    graph_analysis_data = load_json(graph_analysis_file_path)
-
-                    content_features = {
-                        'sentiment_score': sentiment_score,
-                        'sentiment_label': sentiment_label,
-                        'emotion_label': emotion_label
-                    }
-
-                    combined_features = combine_features(graph_features, content_features)
-                    all_features.append(combined_features)
-                    all_labels.append({
-                        'cascade_size': graph_analysis_data.get('cascade_size', 0),
-                        'cascade_depth': graph_analysis_data.get('tree_depth', 0) if isinstance(graph_analysis_data.get('tree_depth', 0), (int, float)) else 0
-                    })
-
-        if all_features:
-            feature_df = pd.DataFrame(all_features)
-            label_df = pd.DataFrame(all_labels)
-
-            # Encode categorical features
-            label_encoder = LabelEncoder()
-            feature_df['sentiment_label'] = label_encoder.fit_transform(feature_df['sentiment_label'])
-            feature_df['emotion_label'] = label_encoder.fit_transform(feature_df['emotion_label'])
-
-            X_train, X_test, y_train, y_test = train_test_split(feature_df, label_df, test_size=0.2, random_state=42)
-
-            # Using Ridge Regression as a baseline model
-            model = Ridge(random_state=42)
-            model.fit(X_train, y_train)
-
-            predictions = model.predict(X_test)
-
-            mse = mean_squared_error(y_test, predictions)
-            mae = mean_absolute_error(y_test, predictions)
-            r2 = r2_score(y_test, predictions)
-
-            # Perform cross-validation
-            cv_scores = cross_val_score(model, feature_df, label_df, cv=5, scoring='neg_mean_squared_error')
-
-            print(f"Mean Squared Error for {dataset}: {mse}")
-            print(f"Mean Absolute Error for {dataset}: {mae}")
-            print(f"R^2 Score for {dataset}: {r2}")
-            print(f"Cross-Validation MSE for {dataset}: {-np.mean(cv_scores)}")
-
-            results = {
-                'mse': mse,
-                'mae': mae,
-                'r2': r2,
-                'cross_val_mse': -np.mean(cv_scores),
-                'feature_importances': model.coef_.tolist()
-            }
-
-            dataset_output_file = os.path.join(output_dir, f"cascade_triggering_analysis_results_{dataset.lower()}.json")
-            with open(dataset_output_file, 'w') as f:
-                json.dump(results, f, indent=4)
-
-            print(f"Cascade triggering analysis results for {dataset} saved to {dataset_output_file}")
+def analyze_cascade_triggering_ability(base_dir, output_dir, workers=1, metrics=None):
+    # Ridge Regression as a baseline model, on the shared splits of model_experiments.py
+    experiment = dict(DEFAULT_EXPERIMENTS['ridge'], output_dir=output_dir)
+    return run_experiments(base_dir, {'ridge': experiment}, workers=workers, output_root=".", metrics=metrics)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and evaluate the Ridge baseline cascade triggering model.")
+    add_arguments(parser, 'advanced_cascade_trigger_analysis')
+    args = parser.parse_args()
+    metrics = from_arguments('advanced_cascade_trigger_analysis', args)
     base_dir = "."
     output_dir = "cascade_triggering_analysis_results_advanced"
     
     print("Starting advanced cascade triggering ability analysis...")
-    analyze_cascade_triggering_ability(base_dir, output_dir)
+    analyze_cascade_triggering_ability(base_dir, output_dir, metrics=metrics)
+    metrics.write(args.metrics_output)
     print("Advanced cascade triggering ability analysis complete.")
\ No newline at end of file
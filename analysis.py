@@ -1,14 +1,30 @@
 import os
+import argparse
 import networkx as nx
 import pickle
 import statistics
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
 from data_loader import parse_tree_file
+from cascade_store import CascadeStore
+from result_cache import DEFAULT_CACHE_DIR, ResultCache, arrays_digest, file_digest, result_key, run_deduplicated
+from cascade_metrics import analyze_cascade
+from analysis_store import NODE_DICT_METRICS, AnalysisStore, has_analysis_store, read_legacy_results, write_analysis_store
+from centrality import APPROX_THRESHOLD, compute_centralities
+from quantile_sketch import QuantileSketch
+from instrumentation import add_arguments, from_arguments, stage
 
-def analyze_graph(graph):
+def analyze_graph(graph, approx_threshold=APPROX_THRESHOLD, approx_k=None, approx_epsilon=None, seed=42):
     """
     Analyze basic properties of the graph.
     Args:
         graph (nx.DiGraph): Directed graph to analyze.
+        approx_threshold (int): Node count above which centralities are pivot-sampled (None for always exact).
+        approx_k (int): Number of pivots in approximate mode.
+        approx_epsilon (float): Target betweenness error used to pick the pivot count when approx_k is None.
+        seed (int): Seed for pivot sampling.
     Returns:
         dict: Dictionary containing analysis results.
     """
@@ -45,113 +61,322 @@ def analyze_graph(graph):
     analysis_results['reaction_time_mean'] = statistics.mean(reaction_times)
     analysis_results['reaction_time_max'] = max(reaction_times)
 
-    # Betweenness Centrality
-    betweenness_centrality = nx.betweenness_centrality(graph)
+    # Betweenness and Closeness Centrality (pivot-sampled above approx_threshold nodes)
+    betweenness_centrality, closeness_centrality, centrality_info = compute_centralities(
+        graph, approx_threshold=approx_threshold, approx_k=approx_k, approx_epsilon=approx_epsilon, seed=seed)
     analysis_results['betweenness_centrality'] = betweenness_centrality
-
-    # Closeness Centrality
-    closeness_centrality = nx.closeness_centrality(graph)
     analysis_results['closeness_centrality'] = closeness_centrality
+    analysis_results.update(centrality_info)
 
     return analysis_results
 
-def save_analysis_results(label, tweet_id, results, output_dir):
+def analyze_graph_file(graph_file_path, centrality_options=None):
     """
-    Save analysis results to a file.
+    Load a pickled graph and analyze it; used as the per-cascade worker task.
     Args:
-        label (str): Label of the tweet (true, false, etc.)
-        tweet_id (str): Tweet ID
-        results (dict): Analysis results
-        output_dir (str): Directory to save the results
+        graph_file_path (str): Path to the pickled graph file
+        centrality_options (dict): Keyword arguments for analyze_graph's approximate centrality mode
+    Returns:
+        dict: Dictionary containing analysis results.
     """
-    label_output_dir = os.path.join(output_dir, label)
-    os.makedirs(label_output_dir, exist_ok=True)
-    file_path = os.path.join(label_output_dir, f"{label}_{tweet_id}_analysis.txt")
-    with open(file_path, 'w') as file:
-        for key, value in results.items():
-            file.write(f"{key}: {value}\n")
-    print(f"Analysis results saved to {file_path}")
+    with open(graph_file_path, 'rb') as f:
+        graph = pickle.load(f)
+    return analyze_graph(graph, **(centrality_options or {}))
 
-def process_graphs(graph_dir, output_dir):
+def process_graphs(graph_dir, output_dir, workers=1, centrality_options=None, metrics=None, cache=None):
     """
     Process all graphs in the directory and save analysis results.
     Args:
         graph_dir (str): Directory containing graph files
         output_dir (str): Directory to save the analysis results
+        workers (int): Number of worker processes to analyze graphs with
+        centrality_options (dict): Keyword arguments for analyze_graph's approximate centrality mode
+        metrics (RunMetrics): Optional instrumentation; records the per-cascade analysis times
+        cache (ResultCache): Optional result cache keyed by graph file content, so identical cascades
+                             (in this or other datasets) are analyzed once
     """
+    tasks, sizes, labels = [], [], []
     for label in ['true', 'false', 'unverified', 'non-rumor']:
         label_dir = os.path.join(graph_dir, f"{label}_graphs")
         for graph_file in os.listdir(label_dir):
             if graph_file.endswith(".pkl"):
                 graph_file_path = os.path.join(label_dir, graph_file)
-                with open(graph_file_path, 'rb') as f:
-                    graph = pickle.load(f)
                 tweet_id = graph_file.replace('.pkl', '')
-                print(f"Processing {label} tweet ID {tweet_id}...")
-                results = analyze_graph(graph)
-                save_analysis_results(label, tweet_id, results, output_dir)
+                tasks.append((tweet_id, (graph_file_path, centrality_options)))
+                sizes.append(os.path.getsize(graph_file_path))
+                labels.append(label)
+    print(f"Analyzing {len(tasks)} graphs with {workers} worker(s)...")
+    with stage(metrics, 'analyze_graphs') as analyze_stage:
+        keys = [result_key('analysis', file_digest(args[0]), centrality_options) for _, args in tasks] if cache is not None else None
+        outcomes = run_deduplicated(analyze_graph_file, tasks, keys, cache, 'analysis', workers=workers, sizes=sizes,
+                                    stage_metrics=analyze_stage)
+        records = [(label, tweet_id, results) for label, (tweet_id, results, error) in zip(labels, outcomes) if error is None]
+    with stage(metrics, 'write_analysis_store') as write_stage:
+        write_analysis_store(records, output_dir)
+        write_stage.add_items(len(records))
+
+_open_stores = {}
+
+def analyze_store_cascade(store_dir, tweet_id, engine='networkx', centrality_options=None):
+    """
+    Analyze one cascade from a cascade store; used as the per-cascade worker task.
+    The store is opened once per process.
+    Args:
+        store_dir (str): Directory written by cascade_store.build_cascade_store
+        tweet_id (str): Tweet ID
+        engine (str): 'networkx' for analyze_graph on the uid graph, 'tree' for the
+                      event-tree engine in cascade_metrics.py
+        centrality_options (dict): Keyword arguments for analyze_graph's approximate centrality mode
+    Returns:
+        dict: Dictionary containing analysis results.
+    """
+    if store_dir not in _open_stores:
+        _open_stores[store_dir] = CascadeStore(store_dir)
+    store = _open_stores[store_dir]
+    if engine == 'tree':
+        return analyze_cascade(store.arrays(tweet_id))
+    return analyze_graph(store.graph(tweet_id), **(centrality_options or {}))
+
+def process_store(store_dir, output_dir, workers=1, engine='networkx', centrality_options=None, metrics=None, cache=None):
+    """
+    Analyze every cascade in a cascade store (see cascade_store.py) and save the results.
+    Args:
+        store_dir (str): Directory written by cascade_store.build_cascade_store
+        output_dir (str): Directory to save the analysis results
+        workers (int): Number of worker processes to analyze cascades with
+        engine (str): 'networkx' or 'tree' (see analyze_store_cascade)
+        centrality_options (dict): Keyword arguments for analyze_graph's approximate centrality mode
+        metrics (RunMetrics): Optional instrumentation; records the per-cascade analysis times
+        cache (ResultCache): Optional result cache keyed by the cascade's edge columns, so identical
+                             cascades (in this or other stores) are analyzed once
+    """
+    store = CascadeStore(store_dir)
+    cascades = list(store.iter_cascades())
+    tasks = [(tweet_id, (store_dir, tweet_id, engine, centrality_options)) for _, tweet_id in cascades]
+    sizes = [store.num_edges(tweet_id) for _, tweet_id in cascades]
+    print(f"Analyzing {len(tasks)} cascades with {workers} worker(s)...")
+    with stage(metrics, 'analyze_cascades', engine=engine) as analyze_stage:
+        config = {'engine': engine, 'centrality_options': centrality_options if engine == 'networkx' else None}
+        keys = [result_key('analysis', arrays_digest(store.arrays(tweet_id)), config) for _, tweet_id in cascades] if cache is not None else None
+        outcomes = run_deduplicated(analyze_store_cascade, tasks, keys, cache, 'analysis', workers=workers, sizes=sizes,
+                                    stage_metrics=analyze_stage)
+        records = [(label, tweet_id, results) for (label, _), (tweet_id, results, error) in zip(cascades, outcomes) if error is None]
+        analyze_stage.count('edges', sum(sizes))
+    with stage(metrics, 'write_analysis_store') as write_stage:
+        write_analysis_store(records, output_dir)
+        write_stage.add_items(len(records))
 
 def aggregate_results(output_dir):
     """
-    Aggregate results from all analysis files in the output directory.
+    Aggregate results from the analysis store in the output directory (see analysis_store.py),
+    falling back to per-file results written by earlier versions. Every (label, tweet_id) contributes
+    one result, so a cascade stored twice is not counted twice in comparisons and significance tests.
     Args:
-        output_dir (str): Directory containing analysis result files
+        output_dir (str): Directory containing analysis results
     Returns:
         dict: Dictionary containing aggregated results
     """
-    aggregated_results = {}
-    for label in ['true', 'false', 'unverified', 'non-rumor']:
-        label_dir = os.path.join(output_dir, label)
-        label_results = []
-        for file_name in os.listdir(label_dir):
-            if file_name.endswith("_analysis.txt"):
-                file_path = os.path.join(label_dir, file_name)
-                with open(file_path, 'r') as file:
-                    result = {}
-                    for line in file:
-                        if ': ' in line:
-                            key, value = line.strip().split(': ', 1)
-                            if value == "Graph contains a cycle":
-                                result[key] = value
-                            else:
-                                try:
-                                    result[key] = eval(value)
-                                except:
-                                    result[key] = value
-                    label_results.append(result)
-        aggregated_results[label] = label_results
+    if has_analysis_store(output_dir):
+        records = AnalysisStore(output_dir).results()
+    else:
+        records = read_legacy_results(output_dir)
+    aggregated_results = {label: [] for label in ['true', 'false', 'unverified', 'non-rumor']}
+    seen = set()
+    for label, tweet_id, result in records:
+        if (label, tweet_id) in seen:
+            continue
+        seen.add((label, tweet_id))
+        aggregated_results[label].append(result)
     return aggregated_results
 
-def compare_labels(aggregated_results):
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 10
+
+def _summarize_scalars(values, percentiles, edges):
+    values = np.asarray(values)
+    histogram, _ = np.histogram(values, bins=edges)
+    return {
+        'min': values.min().item(),
+        'mean': float(values.mean()),
+        'max': values.max().item(),
+        'count': len(values),
+        'percentiles': dict(zip(percentiles, np.percentile(values, percentiles).tolist())),
+        'histogram': {'edges': edges.tolist(), 'counts': histogram.tolist()},
+    }
+
+def _summarize_sketch(sketch, percentiles, edges):
+    return {
+        'min': sketch.min,
+        'mean': sketch.mean,
+        'max': sketch.max,
+        'count': sketch.count,
+        'percentiles': dict(zip(percentiles, sketch.quantiles(np.asarray(percentiles) / 100).tolist())),
+        'histogram': {'edges': edges.tolist(), 'counts': sketch.histogram(edges).tolist()},
+    }
+
+def compare_labels(aggregated_results, percentiles=PERCENTILES, bins=HISTOGRAM_BINS):
     """
     Compare analysis results across different labels.
+    Scalar metrics are summarized exactly from one array per label. List metrics (per-node degree
+    distributions and the like) are summarized per cascade in a QuantileSketch and the sketches are
+    merged per label, so node values are never gathered into one list; their min, mean, max and count
+    stay exact and their percentiles and histograms are within the sketch's relative accuracy.
+    Histograms of a metric share the same bin edges across labels.
     Args:
         aggregated_results (dict): Dictionary containing aggregated results for each label
+        percentiles (tuple): Percentiles to report
+        bins (int): Number of histogram bins
     Returns:
         dict: Dictionary containing comparison results
     """
     comparison_results = {}
     for metric in aggregated_results['true'][0].keys():
         comparison_results[metric] = {}
+        summaries = {}
         for label in aggregated_results.keys():
-            metric_values = [result[metric] for result in aggregated_results[label] if isinstance(result[metric], (int, float))]
+            metric_values = [result[metric] for result in aggregated_results[label] if isinstance(result.get(metric), (int, float))]
+            if metric_values:
+                summaries[label] = (_summarize_scalars, np.asarray(metric_values))
+                continue
+            # Handle list type metrics
+            sketch = QuantileSketch()
+            for result in aggregated_results[label]:
+                if isinstance(result.get(metric), list) and result[metric]:
+                    sketch.merge(QuantileSketch().add(result[metric]))
+            if sketch.count:
+                summaries[label] = (_summarize_sketch, sketch)
+        if not summaries:
+            continue
+        low = min(data.min() if isinstance(data, np.ndarray) else data.min for _, data in summaries.values())
+        high = max(data.max() if isinstance(data, np.ndarray) else data.max for _, data in summaries.values())
+        edges = np.histogram_bin_edges([low, high], bins=bins)
+        for label, (summarize, data) in summaries.items():
+            comparison_results[metric][label] = summarize(data, percentiles, edges)
+    return comparison_results
+
+def compare_store(store, percentiles=PERCENTILES, bins=HISTOGRAM_BINS):
+    """
+    compare_labels computed straight from an analysis store (see analysis_store.py). Each metric is
+    split by label with boolean masks over its column; a per-node metric's label sketch is built from
+    the label's slice of the concatenated column, which equals merging its per-cascade sketches.
+    Args:
+        store (AnalysisStore): Analysis results to compare
+        percentiles (tuple): Percentiles to report
+        bins (int): Number of histogram bins
+    Returns:
+        dict: Dictionary containing comparison results, as compare_labels returns it
+    """
+    metrics = store.metrics
+    labels = ['true', 'false', 'unverified', 'non-rumor']
+    row_labels = metrics['label'].to_numpy()
+    node_metrics = store.node_metrics()
+    comparison_results = {}
+    for metric in store.metric_names():
+        comparison_results[metric] = {}
+        summaries = {}
+        if metric in node_metrics:
+            if metric in NODE_DICT_METRICS:
+                continue
+            values, offsets = store.column(metric)
+            node_labels = np.repeat(row_labels, np.diff(offsets))
+            for label in labels:
+                label_values = values[node_labels == label]
+                if len(label_values):
+                    summaries[label] = (_summarize_sketch, QuantileSketch().add(label_values))
+        elif metric in metrics and pd.api.types.is_numeric_dtype(metrics[metric]) and not pd.api.types.is_bool_dtype(metrics[metric]):
+            column = metrics[metric]
+            for label in labels:
+                label_values = column[row_labels == label].dropna().to_numpy()
+                if len(label_values):
+                    summaries[label] = (_summarize_scalars, label_values)
+        if not summaries:
+            continue
+        low = min(data.min() if isinstance(data, np.ndarray) else data.min for _, data in summaries.values())
+        high = max(data.max() if isinstance(data, np.ndarray) else data.max for _, data in summaries.values())
+        edges = np.histogram_bin_edges([low, high], bins=bins)
+        for label, (summarize, data) in summaries.items():
+            comparison_results[metric][label] = summarize(data, percentiles, edges)
+    return comparison_results
+
+def _compare_labels_reference(aggregated_results):
+    """
+    The previous pure-Python comparison (min/mean/max over flattened lists), kept as the benchmark baseline.
+    """
+    comparison_results = {}
+    for metric in aggregated_results['true'][0].keys():
+        comparison_results[metric] = {}
+        for label in aggregated_results.keys():
+            metric_values = [result[metric] for result in aggregated_results[label] if isinstance(result.get(metric), (int, float))]
             if metric_values:
                 comparison_results[metric][label] = {
-                    'min': min(metric_values) if metric_values else None,
-                    'mean': statistics.mean(metric_values) if metric_values else None,
-                    'max': max(metric_values) if metric_values else None
+                    'min': min(metric_values),
+                    'mean': statistics.mean(metric_values),
+                    'max': max(metric_values)
                 }
             else:
-                # Handle list type metrics
-                list_metric_values = [item for sublist in [result[metric] for result in aggregated_results[label] if isinstance(result[metric], list)] for item in sublist]
+                list_metric_values = [item for sublist in [result[metric] for result in aggregated_results[label] if isinstance(result.get(metric), list)] for item in sublist]
                 if list_metric_values:
                     comparison_results[metric][label] = {
-                        'min': min(list_metric_values) if list_metric_values else None,
-                        'mean': statistics.mean(list_metric_values) if list_metric_values else None,
-                        'max': max(list_metric_values) if list_metric_values else None
+                        'min': min(list_metric_values),
+                        'mean': statistics.mean(list_metric_values),
+                        'max': max(list_metric_values)
                     }
     return comparison_results
 
+def _time_and_peak(func, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+def benchmark_comparison(output_dirs, repeats=3):
+    """
+    Time the label comparison against the previous implementation, from already aggregated results
+    and end to end from disk (through the analysis store when the directory has one), and report
+    peak traced memory and the largest relative difference in min/mean/max.
+    Args:
+        output_dirs (list): Analysis result directories (see aggregate_results)
+        repeats (int): Timing repetitions; the best time is reported
+    Returns:
+        list: One report dict per directory
+    """
+    reports = []
+    for output_dir in output_dirs:
+        aggregated_results = aggregate_results(output_dir)
+        reference, reference_seconds, reference_peak = _time_and_peak(lambda: _compare_labels_reference(aggregated_results), repeats)
+        vectorized, vectorized_seconds, vectorized_peak = _time_and_peak(lambda: compare_labels(aggregated_results), repeats)
+        report = {'output_dir': output_dir,
+                  'reference_seconds': reference_seconds, 'reference_peak_bytes': reference_peak,
+                  'vectorized_seconds': vectorized_seconds, 'vectorized_peak_bytes': vectorized_peak}
+        line = (f"{output_dir}: compare_labels {reference_seconds:.3f}s / {reference_peak / 1e6:.1f} MB -> "
+                f"{vectorized_seconds:.3f}s / {vectorized_peak / 1e6:.1f} MB")
+        comparisons = [vectorized]
+        if has_analysis_store(output_dir):
+            _, end_to_end_reference, _ = _time_and_peak(lambda: _compare_labels_reference(aggregate_results(output_dir)), 1)
+            from_store, store_seconds, store_peak = _time_and_peak(lambda: compare_store(AnalysisStore(output_dir)), repeats)
+            comparisons.append(from_store)
+            report.update({'end_to_end_reference_seconds': end_to_end_reference, 'store_seconds': store_seconds,
+                           'store_peak_bytes': store_peak})
+            line += (f"; from disk {end_to_end_reference:.3f}s -> {store_seconds:.3f}s / {store_peak / 1e6:.1f} MB "
+                     f"with compare_store")
+        max_difference = 0.0
+        for metric, labels in reference.items():
+            for label, stats in labels.items():
+                for comparison in comparisons:
+                    for key in ('min', 'mean', 'max'):
+                        expected, actual = stats[key], comparison[metric][label][key]
+                        max_difference = max(max_difference, abs(actual - expected) / max(abs(expected), 1e-12))
+        report['max_relative_difference'] = max_difference
+        print(f"{line}; max relative difference {max_difference:.2e}")
+        reports.append(report)
+    return reports
+
 def save_comparison_results(comparison_results, output_path):
     """
     Save comparison results to a file.
@@ -167,17 +392,71 @@ def save_comparison_results(comparison_results, output_path):
                 file.write(f"    Min: {stats['min']}\n")
                 file.write(f"    Mean: {stats['mean']}\n")
                 file.write(f"    Max: {stats['max']}\n")
+                file.write(f"    Count: {stats['count']}\n")
+                for percentile, value in stats['percentiles'].items():
+                    file.write(f"    P{percentile}: {value}\n")
+                file.write(f"    Histogram edges: {stats['histogram']['edges']}\n")
+                file.write(f"    Histogram counts: {stats['histogram']['counts']}\n")
     print(f"Comparison results saved to {output_path}")
 
 if __name__ == "__main__":
-    graph_dir = "graphs16"
-    output_dir = "analysis_results16"
-    comparison_output_path = "comparison_results16.txt"
-    
-    print("Starting analysis...")
-    process_graphs(graph_dir, output_dir)
-    print("Analysis complete. Starting label-based comparison...")
-    aggregated_results = aggregate_results(output_dir)
-    comparison_results = compare_labels(aggregated_results)
-    save_comparison_results(comparison_results, comparison_output_path)
-    print("Label-based comparison complete. Check the output file for results.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze cascade graphs and compare metrics across labels.")
+    parser.add_argument('--graph-dir', default="graphs16")
+    parser.add_argument('--store-dir', default=None, help="Read cascades from a cascade store instead of --graph-dir")
+    parser.add_argument('--output-dir', default="analysis_results16")
+    parser.add_argument('--comparison-output', default="comparison_results16.txt")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    parser.add_argument('--engine', choices=['networkx', 'tree'], default='networkx',
+                        help="Metrics engine; 'tree' models retweet events as nodes and requires --store-dir")
+    parser.add_argument('--approx-threshold', type=int, default=APPROX_THRESHOLD,
+                        help="Node count above which centralities are pivot-sampled (-1 for always exact)")
+    parser.add_argument('--approx-k', type=int, default=None, help="Number of pivots in approximate mode")
+    parser.add_argument('--approx-epsilon', type=float, default=None, help="Target betweenness error; sets the pivot count")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--result-cache', default=DEFAULT_CACHE_DIR, help="Content-addressed cache of analysis results, shared across datasets")
+    parser.add_argument('--no-result-cache', action='store_true', help="Analyze every cascade, even if an identical one was analyzed before")
+    parser.add_argument('--compare-only', action='store_true', help="Skip the analysis and compare the results already in --output-dir")
+    parser.add_argument('--benchmark-comparison', nargs='+', default=None, metavar='ANALYSIS_DIR',
+                        help="Time the label comparison against the previous implementation on these result directories and exit")
+    add_arguments(parser, 'analysis')
+    args = parser.parse_args()
+    metrics = from_arguments('analysis', args)
+    centrality_options = {
+        'approx_threshold': None if args.approx_threshold < 0 else args.approx_threshold,
+        'approx_k': args.approx_k,
+        'approx_epsilon': args.approx_epsilon,
+        'seed': args.seed,
+    }
+    if args.engine == 'tree' and not args.store_dir:
+        parser.error("--engine tree needs the tweet ids kept in a cascade store; pass --store-dir")
+
+    if args.benchmark_comparison:
+        benchmark_comparison(args.benchmark_comparison)
+        raise SystemExit
+
+    if not args.compare_only:
+        print("Starting analysis...")
+        cache = None if args.no_result_cache else ResultCache(args.result_cache)
+        if args.store_dir:
+            process_store(args.store_dir, args.output_dir, workers=args.workers, engine=args.engine,
+                          centrality_options=centrality_options, metrics=metrics, cache=cache)
+        else:
+            process_graphs(args.graph_dir, args.output_dir, workers=args.workers, centrality_options=centrality_options,
+                           metrics=metrics, cache=cache)
+        if cache is not None:
+            cache.report_to(metrics)
+        print("Analysis complete.")
+    print("Starting label-based comparison...")
+    with metrics.stage('compare_labels') as compare_stage:
+        if has_analysis_store(args.output_dir):
+            store = AnalysisStore(args.output_dir)
+            comparison_results = compare_store(store)
+            compare_stage.add_items(len(store))
+        else:
+            aggregated_results = aggregate_results(args.output_dir)
+            comparison_results = compare_labels(aggregated_results)
+            compare_stage.add_items(sum(len(results) for results in aggregated_results.values()))
+    with metrics.stage('save_comparison'):
+        save_comparison_results(comparison_results, args.comparison_output)
+    print("Label-based comparison complete. Check the output file for results.")
+    metrics.write(args.metrics_output)
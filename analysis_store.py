@@ -0,0 +1,234 @@
+# analysis_store.py
+
+import os
+import ast
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+METRICS_FILE = "metrics.parquet"
+NODES_FILE = "nodes.npz"
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+# analyze_graph reports this instead of a depth for cyclic graphs; it is stored as a missing tree_depth
+CYCLE_MARKER = "Graph contains a cycle"
+# Dict-valued metrics hold per-node values keyed by node name, in graph node order
+NODE_DICT_METRICS = ('betweenness_centrality', 'closeness_centrality')
+
+
+def has_analysis_store(output_dir):
+    return os.path.exists(os.path.join(output_dir, METRICS_FILE))
+
+
+def write_analysis_store(records, output_dir):
+    """
+    Write analysis results in columnar form: scalar metrics go to one Parquet table with a row per
+    cascade, list and per-node dict metrics go to one NPZ file where every metric is a single
+    concatenated array plus offsets (row i owns values[offsets[i]:offsets[i + 1]]).
+    Node names of the dict metrics are stored once, in the shared 'node_names' column.
+    Args:
+        records (list): (label, tweet_id, results dict) tuples as produced by analysis.analyze_graph
+                        or cascade_metrics.analyze_cascade.
+        output_dir (str): Directory to write metrics.parquet and nodes.npz to.
+    """
+    rows = []
+    arrays = {}
+    metric_names = {}
+    for row_index, (label, tweet_id, results) in enumerate(records):
+        row = {'label': label, 'tweet_id': tweet_id}
+        row_arrays = {}
+        metric_names.update(dict.fromkeys(results))
+        for key, value in results.items():
+            if isinstance(value, dict):
+                row_arrays.setdefault('node_names', list(value.keys()))
+                row_arrays[key] = list(value.values())
+            elif isinstance(value, list):
+                row_arrays[key] = value
+            elif key == 'tree_depth' and not isinstance(value, (int, float)):
+                row[key] = None
+            else:
+                row[key] = value
+        rows.append(row)
+        # Keep every column aligned with the rows, also for results lacking a metric
+        for key in list(arrays.keys() | row_arrays.keys()):
+            arrays.setdefault(key, [[]] * row_index).append(row_arrays.get(key, []))
+
+    os.makedirs(output_dir, exist_ok=True)
+    metrics = pd.DataFrame(rows)
+    if 'tree_depth' in metrics:
+        # Nullable integers keep depths integral next to the missing depths of cyclic graphs
+        metrics['tree_depth'] = metrics['tree_depth'].astype('Int64')
+    metrics.to_parquet(os.path.join(output_dir, METRICS_FILE), index=False)
+    columns = {'metric_names': np.array(list(metric_names), dtype=str)}
+    for key, values in arrays.items():
+        columns[f"{key}_offsets"] = np.concatenate([[0], np.cumsum([len(v) for v in values])]).astype(np.int64)
+        flat = [item for v in values for item in v]
+        columns[key] = np.array(flat, dtype=str) if key == 'node_names' else np.array(flat, dtype=np.float64 if any(isinstance(item, float) for item in flat) else np.int64)
+    np.savez_compressed(os.path.join(output_dir, NODES_FILE), **columns)
+    print(f"Analysis results for {len(rows)} cascades saved to {output_dir}/{{{METRICS_FILE},{NODES_FILE}}}")
+
+
+class AnalysisStore:
+    """
+    Read-only access to results written by write_analysis_store.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.metrics = pd.read_parquet(os.path.join(output_dir, METRICS_FILE))
+        nodes_path = os.path.join(output_dir, NODES_FILE)
+        self._nodes = np.load(nodes_path) if os.path.exists(nodes_path) else {}
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.metrics)
+
+    def metric_names(self):
+        """
+        Metric names in the order the analysis produced them.
+        """
+        return self._nodes['metric_names'].tolist()
+
+    def node_metrics(self):
+        return [key for key in self.metric_names() if f"{key}_offsets" in self._nodes]
+
+    def column(self, key):
+        """
+        (values, offsets) of a list or per-node metric; decompressed once and cached.
+        """
+        if key not in self._columns:
+            self._columns[key] = (self._nodes[key], self._nodes[f"{key}_offsets"])
+        return self._columns[key]
+
+    def values(self, key, row):
+        values, offsets = self.column(key)
+        return values[offsets[row]:offsets[row + 1]]
+
+    def results(self, label=None):
+        """
+        Yield (label, tweet_id, results dict) in the shape analysis.analyze_graph returns, so code
+        written against the per-file results keeps working.
+        """
+        records = self.metrics.to_dict('records')
+        metric_names = self.metric_names()
+        node_metrics = set(self.node_metrics())
+        for row, record in enumerate(records):
+            if label is not None and record['label'] != label:
+                continue
+            results = {}
+            for key in metric_names:
+                if key in node_metrics:
+                    values = self.values(key, row).tolist()
+                    if key in NODE_DICT_METRICS:
+                        values = dict(zip(self.values('node_names', row).tolist(), values))
+                    results[key] = values
+                elif key in record:
+                    value = record[key]
+                    if pd.isna(value):
+                        value = CYCLE_MARKER if key == 'tree_depth' else None
+                    results[key] = value
+            yield record['label'], record['tweet_id'], results
+
+
+def _parse_legacy_value(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def legacy_result_files(label_dir, label):
+    """
+    One (tweet_id, file name) per cascade of a legacy label folder. Earlier versions of analysis.py
+    saved most Twitter15 cascades under both {tweet_id}_analysis.txt and {label}_{tweet_id}_analysis.txt;
+    the unprefixed file is used.
+    """
+    files = {}
+    for file_name in sorted(os.listdir(label_dir)):
+        if not file_name.endswith("_analysis.txt"):
+            continue
+        tweet_id = file_name[:-len("_analysis.txt")]
+        prefixed = tweet_id.startswith(f"{label}_")
+        if prefixed:
+            tweet_id = tweet_id[len(label) + 1:]
+        if tweet_id not in files or not prefixed:
+            files[tweet_id] = file_name
+    return sorted(files.items())
+
+
+def read_legacy_results(output_dir):
+    """
+    Read a per-file analysis tree ({label}/[{label}_]{tweet_id}_analysis.txt, as written by earlier
+    versions of analysis.py) into (label, tweet_id, results dict) records, one per cascade
+    (see legacy_result_files).
+    """
+    records = []
+    for label in LABELS:
+        label_dir = os.path.join(output_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for tweet_id, file_name in legacy_result_files(label_dir, label):
+            results = {}
+            with open(os.path.join(label_dir, file_name), 'r') as file:
+                for line in file:
+                    if ': ' in line:
+                        key, value = line.strip().split(': ', 1)
+                        results[key] = _parse_legacy_value(value)
+            records.append((label, tweet_id, results))
+    return records
+
+
+def _tree_size(output_dir, suffixes):
+    total = 0
+    for root, _, files in os.walk(output_dir):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files if f.endswith(suffixes))
+    return total
+
+
+def convert_legacy_tree(output_dir, store_dir=None):
+    """
+    Convert a per-file analysis tree to the columnar form and report disk size and load time of both.
+    Args:
+        output_dir (str): analysis_results* directory holding the legacy files.
+        store_dir (str): Where to write the columnar files (defaults to output_dir).
+    Returns:
+        dict: Sizes in bytes and load times in seconds.
+    """
+    store_dir = store_dir or output_dir
+    start = time.perf_counter()
+    records = read_legacy_results(output_dir)
+    legacy_seconds = time.perf_counter() - start
+    write_analysis_store(records, store_dir)
+
+    start = time.perf_counter()
+    store = AnalysisStore(store_dir)
+    for key in store.node_metrics():
+        store.column(key)
+    columnar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    sum(1 for _ in store.results())
+    columnar_dict_seconds = time.perf_counter() - start + columnar_seconds
+
+    report = {
+        'cascades': len(records),
+        'legacy_txt_bytes': _tree_size(output_dir, ('_analysis.txt',)),
+        'legacy_json_bytes': _tree_size(output_dir, ('_graphs_analysis.json',)),
+        'columnar_bytes': os.path.getsize(os.path.join(store_dir, METRICS_FILE)) + os.path.getsize(os.path.join(store_dir, NODES_FILE)),
+        'legacy_load_seconds': legacy_seconds,
+        'columnar_load_seconds': columnar_seconds,
+        'columnar_dict_load_seconds': columnar_dict_seconds,
+    }
+    legacy_bytes = report['legacy_txt_bytes'] + report['legacy_json_bytes']
+    print(f"{output_dir}: {report['cascades']} cascades, {legacy_bytes / 1e6:.1f} MB txt+json -> "
+          f"{report['columnar_bytes'] / 1e6:.1f} MB columnar; load {legacy_seconds:.2f}s -> "
+          f"{columnar_seconds:.2f}s ({columnar_dict_seconds:.2f}s as result dicts)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert per-file analysis results to the columnar analysis store.")
+    parser.add_argument('--analysis-dirs', nargs='+', default=["analysis_results15", "analysis_results16"])
+    args = parser.parse_args()
+
+    for analysis_dir in args.analysis_dirs:
+        convert_legacy_tree(analysis_dir)
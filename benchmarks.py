@@ -0,0 +1,268 @@
+# benchmarks.py
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import resource
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from synthetic_cascades import write_cascade
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_DATASETS = ['twitter15', 'twitter16']
+# A case regresses when it is this much slower (or uses this much more peak memory) than the baseline
+DEFAULT_THRESHOLD = 0.2
+# Differences below these are timer and allocator noise, not regressions
+MIN_SECONDS_DELTA = 0.01
+MIN_RSS_DELTA_MB = 5.0
+
+# Stages and the inputs they run on. Graph stages run on the bundled trees and on synthetic trees of
+# every size up to max_edges; the content and comparison stages only have bundled inputs. Synthetic
+# Hawkes cascades are star-like (about half the edges hang off the source), which makes clustering in
+# extract_graph_features and the centralities in analyze_graph slow on them: ~305s and ~95s for 100k
+# edges. Larger trees are opt-in with --no-size-caps.
+STAGES = {
+    'parse_tree_file': {'unit': 'edges', 'synthetic': True, 'max_edges': None},
+    'build_tree_network': {'unit': 'edges', 'synthetic': True, 'max_edges': None},
+    'extract_graph_features': {'unit': 'edges', 'synthetic': True, 'max_edges': 10_000},
+    'analyze_graph': {'unit': 'edges', 'synthetic': True, 'max_edges': 10_000},
+    'perform_sentiment_analysis': {'unit': 'tweets', 'synthetic': False},
+    'compare_labels': {'unit': 'cascades', 'synthetic': False},
+}
+
+
+def bundled_inputs(dataset, base_dir="."):
+    """
+    Input paths of a bundled dataset ('twitter15' or 'twitter16').
+    """
+    return {
+        'tree_dir': os.path.join(base_dir, "rumor_detection_acl2017", dataset, "tree"),
+        'source_tweets': os.path.join(base_dir, "rumor_detection_acl2017", dataset, "source_tweets.txt"),
+        'analysis_dir': os.path.join(base_dir, f"analysis_results{dataset[-2:]}"),
+    }
+
+
+def _tree_files(source):
+    if 'tree_file' in source:
+        return [source['tree_file']]
+    tree_dir = source['tree_dir']
+    tree_files = sorted(os.path.join(tree_dir, f) for f in os.listdir(tree_dir) if f.endswith(".txt"))
+    return tree_files[:source['limit']] if source.get('limit') else tree_files
+
+
+def _build_graphs(tree_files):
+    from save_graph import build_tree_network
+    return [build_tree_network(path) for path in tree_files]
+
+
+def _prepare_stage(stage, source):
+    """
+    Untimed setup of one case: the stage callable and the number of items it processes.
+    """
+    if stage == 'parse_tree_file':
+        from data_loader import parse_tree_file
+        tree_files = _tree_files(source)
+        num_edges = sum(len(parse_tree_file(path)) for path in tree_files)
+        return lambda: [parse_tree_file(path) for path in tree_files], num_edges
+    if stage == 'build_tree_network':
+        tree_files = _tree_files(source)
+        graphs = _build_graphs(tree_files)
+        num_edges = sum(graph.number_of_edges() for graph in graphs)
+        del graphs
+        return lambda: _build_graphs(tree_files), num_edges
+    if stage in ('extract_graph_features', 'analyze_graph'):
+        if stage == 'analyze_graph':
+            from analysis import analyze_graph as stage_func
+        else:
+            from feature_store import extract_graph_features as stage_func
+        graphs = _build_graphs(_tree_files(source))
+        return lambda: [stage_func(graph) for graph in graphs], sum(graph.number_of_edges() for graph in graphs)
+    if stage == 'perform_sentiment_analysis':
+        from content_analysis import load_source_tweets, perform_sentiment_analysis
+        tweets = load_source_tweets(source['source_tweets'])
+        if source.get('limit'):
+            tweets = dict(list(tweets.items())[:source['limit']])
+        output_dir = tempfile.mkdtemp(prefix="benchmark_sentiment_")
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                perform_sentiment_analysis(tweets, 'benchmark', output_dir)
+        # Load the models outside the timed runs
+        run()
+        return run, len(tweets)
+    if stage == 'compare_labels':
+        from analysis import aggregate_results, compare_labels
+        aggregated_results = aggregate_results(source['analysis_dir'])
+        return lambda: compare_labels(aggregated_results), sum(len(results) for results in aggregated_results.values())
+    raise ValueError(f"Unknown stage {stage!r}")
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(stage, source, repeats):
+    """
+    Run one stage on one input, in a fresh process so peak RSS belongs to this case alone.
+    Returns:
+        dict: Items processed, best and mean wall time, throughput and peak RSS; 'skipped' when a
+              dependency is missing and 'error' when the stage failed, so one case cannot stop the suite.
+    """
+    try:
+        run, num_items = _prepare_stage(stage, source)
+    except ImportError as error:
+        return {'status': 'skipped', 'reason': str(error)}
+    except Exception as error:
+        return {'status': 'error', 'reason': f"{type(error).__name__}: {error}"}
+    rss_before = _peak_rss_mb()
+    timings = []
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+    except Exception as error:
+        return {'status': 'error', 'reason': f"{type(error).__name__}: {error}"}
+    peak_rss = _peak_rss_mb()
+    best = min(timings)
+    return {
+        'status': 'ok',
+        'items': num_items,
+        'unit': STAGES[stage]['unit'],
+        'wall_seconds': best,
+        'mean_wall_seconds': float(np.mean(timings)),
+        'throughput_per_sec': num_items / best if best > 0 else None,
+        'peak_rss_mb': peak_rss,
+        # Growth of the process peak during the timed runs; 0 when setup already peaked higher
+        'stage_rss_increase_mb': max(0.0, peak_rss - rss_before),
+    }
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_benchmarks(stages=tuple(STAGES), datasets=DEFAULT_DATASETS, sizes=DEFAULT_SIZES, repeats=3, limit=None,
+                   base_dir=".", seed=42, size_caps=True):
+    """
+    Time every stage on the bundled datasets and on synthetic trees of each size.
+    Args:
+        stages (list): Stage names from STAGES.
+        datasets (list): Bundled datasets to run on.
+        sizes (list): Synthetic tree sizes in edges.
+        repeats (int): Timed runs per case; the best is reported as wall_seconds.
+        limit (int): Optional number of cascades (or tweets) per bundled dataset.
+        base_dir (str): Repository root.
+        seed (int): Seed of the synthetic trees.
+        size_caps (bool): Skip synthetic sizes above a stage's max_edges.
+    Returns:
+        dict: {'environment': ..., 'results': [one dict per (stage, input)]}
+    """
+    synthetic_dir = tempfile.mkdtemp(prefix="benchmark_trees_")
+    cases = []
+    for stage in stages:
+        for dataset in datasets:
+            cases.append((stage, dataset, dict(bundled_inputs(dataset, base_dir), limit=limit)))
+        if STAGES[stage]['synthetic']:
+            for size in sizes:
+                if not size_caps or STAGES[stage]['max_edges'] is None or size <= STAGES[stage]['max_edges']:
+                    tree_file = os.path.join(synthetic_dir, f"synthetic_{size}.txt")
+                    cases.append((stage, f"synthetic-{size}", {'tree_file': tree_file, 'num_edges': size}))
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    try:
+        for stage, input_name, source in cases:
+            if 'tree_file' in source and not os.path.exists(source['tree_file']):
+                write_cascade(source['tree_file'], source['num_edges'], seed=seed)
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(_run_case, stage, source, repeats).result()
+            except Exception as error:
+                # The case process itself died (e.g. killed when out of memory)
+                result = {'status': 'error', 'reason': f"{type(error).__name__}: {error}"}
+            result = {'stage': stage, 'input': input_name, **result}
+            results.append(result)
+            if result['status'] == 'ok':
+                print(f"{stage:>28} {input_name:>18}: {result['wall_seconds']:.4f}s, "
+                      f"{result['throughput_per_sec']:,.0f} {result['unit']}/sec, peak RSS {result['peak_rss_mb']:.0f} MB")
+            else:
+                print(f"{stage:>28} {input_name:>18}: {result['status']} ({result['reason']})")
+    finally:
+        shutil.rmtree(synthetic_dir, ignore_errors=True)
+    return {'environment': _environment(), 'repeats': repeats, 'results': results}
+
+
+def compare_to_baseline(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare a run with a saved baseline, case by case.
+    Args:
+        report (dict): run_benchmarks output.
+        baseline (dict): A previously saved run_benchmarks output.
+        threshold (float): Relative slowdown (or peak RSS growth) counted as a regression.
+    Returns:
+        list: Regressed cases as (stage, input, metric, baseline value, current value).
+    """
+    baseline_results = {(result['stage'], result['input']): result for result in baseline['results'] if result['status'] == 'ok'}
+    regressions = []
+    for result in report['results']:
+        previous = baseline_results.get((result['stage'], result['input']))
+        if result['status'] != 'ok' or previous is None:
+            continue
+        for metric, min_delta in (('wall_seconds', MIN_SECONDS_DELTA), ('peak_rss_mb', MIN_RSS_DELTA_MB)):
+            ratio = result[metric] / previous[metric] if previous[metric] else 1.0
+            regressed = ratio > 1 + threshold and result[metric] - previous[metric] > min_delta
+            if regressed:
+                regressions.append((result['stage'], result['input'], metric, previous[metric], result[metric]))
+            print(f"{result['stage']:>28} {result['input']:>18} {metric:>12}: {previous[metric]:.4f} -> {result[metric]:.4f} "
+                  f"({ratio - 1:+.1%}){'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on bundled and synthetic cascades.")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--datasets', nargs='*', default=DEFAULT_DATASETS, help="Bundled datasets (pass none to run only synthetic inputs)")
+    parser.add_argument('--sizes', nargs='*', type=int, default=DEFAULT_SIZES, help="Synthetic tree sizes in edges")
+    parser.add_argument('--no-size-caps', action='store_true', help="Run every stage on every synthetic size")
+    parser.add_argument('--limit', type=int, default=None, help="Cascades (or tweets) per bundled dataset")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=None, help="Saved benchmark JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.stages, args.datasets, args.sizes, repeats=args.repeats, limit=args.limit,
+                            size_caps=not args.no_size_caps)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark results saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, threshold=args.threshold)
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.baseline}")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,266 @@
+# cascade_metrics.py
+
+import time
+import argparse
+import numpy as np
+from tree_parser import ROOT_ID, list_tree_files, parse_tree_arrays
+
+
+def build_event_tree(arrays):
+    """
+    Turn the edge columns of a tree file into a rooted tree of retweet events.
+    Each node is a (uid, tweet_id) event, so repeat retweeters no longer collapse into one
+    node and create cycles. Self-loops are dropped and an event that appears as a child more
+    than once keeps the parent from its first occurrence. Node 0 is the 'ROOT' placeholder.
+    Events without a kept incoming edge are attached to ROOT; their delay is unknown and stored as NaN.
+    Args:
+        arrays (dict): Edge columns as returned by tree_parser.parse_tree_arrays.
+    Returns:
+        dict: Per-node arrays ('uid', 'tweet_id', 'parent', 'delay', 'depth', 'subtree_size',
+              'num_children'), the BFS 'levels' and the number of 'discarded_edges'.
+    """
+    num_edges = len(arrays['delay'])
+    events = np.empty((2 * num_edges + 1, 2), dtype=np.int64)
+    events[0] = (ROOT_ID, ROOT_ID)
+    events[1:num_edges + 1, 0] = arrays['parent_uid']
+    events[1:num_edges + 1, 1] = arrays['parent_tweet_id']
+    events[num_edges + 1:, 0] = arrays['child_uid']
+    events[num_edges + 1:, 1] = arrays['child_tweet_id']
+
+    # Map every event to a node index; ROOT sorts first because ROOT_ID is negative
+    unique_events, inverse = np.unique(events, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    parent_idx = inverse[1:num_edges + 1]
+    child_idx = inverse[num_edges + 1:]
+    num_nodes = len(unique_events)
+
+    # Keep the first non-self-loop edge into every child
+    valid = np.flatnonzero(parent_idx != child_idx)
+    first_children, first_positions = np.unique(child_idx[valid], return_index=True)
+    tree_edges = valid[first_positions]
+
+    parent = np.full(num_nodes, -1, dtype=np.int64)
+    parent[first_children] = parent_idx[tree_edges]
+    delay = np.full(num_nodes, np.nan, dtype=np.float64)
+    delay[0] = 0.0
+    delay[first_children] = arrays['delay'][tree_edges]
+    parent[0] = -1
+    # Events that only ever appear as a parent have no incoming edge; they hang off ROOT as well
+    parent[1:][parent[1:] < 0] = 0
+
+    levels, depth = _bfs_levels(parent)
+    unreached = np.flatnonzero(depth < 0)
+    if len(unreached):
+        # Events cut off from ROOT by contradictory parent attributions hang off ROOT directly
+        parent[unreached] = 0
+        levels, depth = _bfs_levels(parent)
+
+    num_children = np.bincount(parent[1:], minlength=num_nodes)
+    subtree_size = np.ones(num_nodes, dtype=np.int64)
+    for level in reversed(levels[1:]):
+        np.add.at(subtree_size, parent[level], subtree_size[level])
+
+    return {
+        'uid': unique_events[:, 0],
+        'tweet_id': unique_events[:, 1],
+        'parent': parent,
+        'delay': delay,
+        'depth': depth,
+        'subtree_size': subtree_size,
+        'num_children': num_children,
+        'levels': levels,
+        # Input edges not kept as tree edges; ROOT attachments above are not input edges
+        'discarded_edges': num_edges - len(tree_edges),
+    }
+
+
+def _bfs_levels(parent):
+    """
+    Group nodes by distance from node 0 using a CSR child index, one vectorized step per level.
+    Returns:
+        tuple: (list of node index arrays per level, depth array with -1 for unreached nodes)
+    """
+    num_nodes = len(parent)
+    children = np.argsort(parent, kind='stable')[1:]
+    counts = np.bincount(parent[1:], minlength=num_nodes)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    depth = np.full(num_nodes, -1, dtype=np.int64)
+    depth[0] = 0
+    levels = [np.array([0], dtype=np.int64)]
+    while True:
+        frontier = levels[-1]
+        frontier_counts = counts[frontier]
+        total = int(frontier_counts.sum())
+        if total == 0:
+            break
+        # Positions of every child of the frontier inside the CSR 'children' array
+        offsets = np.repeat(starts[frontier] - np.cumsum(frontier_counts) + frontier_counts, frontier_counts)
+        level = children[offsets + np.arange(total)]
+        level = level[depth[level] < 0]
+        if len(level) == 0:
+            break
+        depth[level] = len(levels)
+        levels.append(level)
+    return levels, depth
+
+
+def node_names(tree):
+    """
+    Readable node keys ('uid:tweet_id', 'ROOT' for the placeholder) in node order.
+    """
+    names = [f"{uid}:{tweet_id}" for uid, tweet_id in zip(tree['uid'].tolist(), tree['tweet_id'].tolist())]
+    names[0] = 'ROOT'
+    return names
+
+
+def tree_betweenness(tree, normalized=True):
+    """
+    Exact directed betweenness centrality of every node of an event tree in O(n).
+    In a rooted tree, v lies on the single path from each of its ancestors to each of its
+    descendants, so its betweenness is depth(v) * (subtree_size(v) - 1).
+    """
+    betweenness = tree['depth'] * (tree['subtree_size'] - 1).astype(np.float64)
+    num_nodes = len(betweenness)
+    if normalized and num_nodes > 2:
+        betweenness /= (num_nodes - 1) * (num_nodes - 2)
+    return betweenness
+
+
+def tree_closeness(tree):
+    """
+    Exact closeness centrality of every node of an event tree in O(n), matching
+    nx.closeness_centrality (incoming distances, Wasserman-Faust scaling).
+    A node at depth d is reached by its d ancestors at distances 1..d.
+    """
+    depth = tree['depth'].astype(np.float64)
+    num_nodes = len(depth)
+    closeness = np.zeros(num_nodes, dtype=np.float64)
+    if num_nodes > 1:
+        reached = depth > 0
+        closeness[reached] = 2 * depth[reached] / ((depth[reached] + 1) * (num_nodes - 1))
+    return closeness
+
+
+def structural_virality(tree):
+    """
+    Mean shortest-path distance between all pairs of events in the cascade, ignoring the
+    'ROOT' placeholder. Computed in O(n) from the Wiener index: every edge (p, v) is crossed by
+    subtree_size(v) * (m - subtree_size(v)) pairs.
+    """
+    sizes = tree['subtree_size'][tree['depth'] >= 2]
+    num_events = len(tree['depth']) - 1
+    if num_events < 2:
+        return 0.0
+    wiener_index = float(np.sum(sizes * (num_events - sizes)))
+    return wiener_index / (num_events * (num_events - 1) / 2)
+
+
+def analyze_cascade(arrays):
+    """
+    Analyze a cascade from its edge columns with the tree-native engine.
+    Emits the same metric keys as analysis.analyze_graph (with event nodes instead of uid nodes)
+    plus breadth, structural virality and subtree sizes.
+    Args:
+        arrays (dict): Edge columns as returned by tree_parser.parse_tree_arrays or CascadeStore.arrays.
+    Returns:
+        dict: Dictionary containing analysis results.
+    """
+    tree = build_event_tree(arrays)
+    num_nodes = len(tree['parent'])
+    names = node_names(tree)
+    # Events attached to ROOT without an incoming edge have no known delay
+    delays = tree['delay'][1:]
+    delays = delays[~np.isnan(delays)]
+    breadth = [len(level) for level in tree['levels'][1:]]
+
+    analysis_results = {}
+    analysis_results['number_of_nodes'] = num_nodes
+    analysis_results['number_of_edges'] = num_nodes - 1
+    analysis_results['cascade_size'] = num_nodes - 1
+    analysis_results['tree_depth'] = len(tree['levels']) - 1
+    analysis_results['in_degree_distribution'] = (tree['parent'] >= 0).astype(np.int64).tolist()
+    analysis_results['out_degree_distribution'] = tree['num_children'].tolist()
+    analysis_results['propagation_delay_min'] = float(delays.min()) if len(delays) else 0.0
+    analysis_results['propagation_delay_mean'] = float(delays.mean()) if len(delays) else 0.0
+    analysis_results['propagation_delay_max'] = float(delays.max()) if len(delays) else 0.0
+    analysis_results['reaction_time_min'] = analysis_results['propagation_delay_min']
+    analysis_results['reaction_time_mean'] = analysis_results['propagation_delay_mean']
+    analysis_results['reaction_time_max'] = analysis_results['propagation_delay_max']
+    analysis_results['betweenness_centrality'] = dict(zip(names, tree_betweenness(tree).tolist()))
+    analysis_results['closeness_centrality'] = dict(zip(names, tree_closeness(tree).tolist()))
+    analysis_results['max_breadth'] = max(breadth) if breadth else 0
+    analysis_results['breadth_per_level'] = breadth
+    analysis_results['structural_virality'] = structural_virality(tree)
+    analysis_results['subtree_sizes'] = tree['subtree_size'].tolist()
+    analysis_results['discarded_edges'] = int(tree['discarded_edges'])
+    return analysis_results
+
+
+def analyze_tree_file(tree_file_path):
+    """
+    Parse and analyze a single tree file with the tree-native engine.
+    Args:
+        tree_file_path (str): Path to the tree file.
+    Returns:
+        dict: Dictionary containing analysis results.
+    """
+    return analyze_cascade(parse_tree_arrays(tree_file_path))
+
+
+def event_graph(tree):
+    """
+    Build the event tree as an nx.DiGraph with the same node keys as analyze_cascade,
+    used to check the engine against networkx.
+    """
+    import networkx as nx
+    names = node_names(tree)
+    G = nx.DiGraph()
+    G.add_nodes_from(names)
+    G.add_edges_from((names[p], names[v]) for v, p in enumerate(tree['parent'].tolist()) if p >= 0)
+    return G
+
+
+def benchmark_engines(tree_dirs, top=20):
+    """
+    Time the networkx path (build_tree_network + analyze_graph) against the tree-native engine
+    on the largest tree files, and check the engine's centralities against networkx on the event tree.
+    Args:
+        tree_dirs (list): Directories containing tree files.
+        top (int): Number of largest tree files to benchmark.
+    """
+    import os
+    import networkx as nx
+    from analysis import analyze_graph
+    from save_graph import build_tree_network
+
+    tree_files = sorted(list_tree_files(tree_dirs), key=os.path.getsize, reverse=True)[:top]
+    networkx_seconds = engine_seconds = 0.0
+    max_error = 0.0
+    for tree_file_path in tree_files:
+        start = time.perf_counter()
+        analyze_graph(build_tree_network(tree_file_path))
+        networkx_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = analyze_tree_file(tree_file_path)
+        engine_seconds += time.perf_counter() - start
+
+        G = event_graph(build_event_tree(parse_tree_arrays(tree_file_path)))
+        for key, reference in (('betweenness_centrality', nx.betweenness_centrality(G)),
+                               ('closeness_centrality', nx.closeness_centrality(G))):
+            max_error = max(max_error, max(abs(reference[node] - value) for node, value in results[key].items()))
+        assert results['tree_depth'] == nx.dag_longest_path_length(G)
+
+    print(f"networkx path: {networkx_seconds:.2f}s for {len(tree_files)} largest trees")
+    print(f"tree engine:   {engine_seconds:.2f}s ({networkx_seconds / engine_seconds:.0f}x faster)")
+    print(f"max centrality deviation from networkx on the event tree: {max_error:.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tree-native cascade metrics engine against networkx.")
+    parser.add_argument('--tree-dirs', nargs='+', default=["rumor_detection_acl2017/twitter15/tree", "rumor_detection_acl2017/twitter16/tree"])
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    benchmark_engines(args.tree_dirs, top=args.top)
@@ -0,0 +1,134 @@
+# cascade_store.py
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import networkx as nx
+from data_loader import list_label_trees, load_tree_manifest
+from tree_parser import ARRAY_FIELDS, ROOT_ID, parse_tree_arrays
+
+INDEX_FILE = "index.json"
+OFFSETS_FILE = "offsets.npy"
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+
+
+def build_cascade_store(input_dir, store_dir, labels=LABELS):
+    """
+    Pack every tree file of a processed dataset into a single columnar store.
+    The store holds one .npy file per edge column (see tree_parser.ARRAY_FIELDS),
+    CSR-style offsets delimiting each cascade, and a JSON index of tweet ids and labels.
+    Args:
+        input_dir (str): Processed data directory containing {label}_trees folders or a tree manifest.
+        store_dir (str): Directory to write the store to.
+        labels (list): Labels to include.
+    Returns:
+        int: Number of cascades written.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    tweet_ids, tweet_labels, chunks = [], [], []
+    offsets = [0]
+    manifest = load_tree_manifest(input_dir)
+    for label in labels:
+        for tweet_id, tree_file_path in list_label_trees(input_dir, label, manifest):
+            arrays = parse_tree_arrays(tree_file_path)
+            tweet_ids.append(tweet_id)
+            tweet_labels.append(label)
+            chunks.append(arrays)
+            offsets.append(offsets[-1] + len(arrays['delay']))
+
+    for field in ARRAY_FIELDS:
+        dtype = np.float64 if field == 'delay' else np.int64
+        column = np.concatenate([chunk[field] for chunk in chunks]) if chunks else np.empty(0, dtype=dtype)
+        np.save(os.path.join(store_dir, f"{field}.npy"), column.astype(dtype, copy=False))
+    np.save(os.path.join(store_dir, OFFSETS_FILE), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(store_dir, INDEX_FILE), 'w') as f:
+        json.dump({'tweet_ids': tweet_ids, 'labels': tweet_labels}, f)
+
+    print(f"Cascade store with {len(tweet_ids)} cascades and {offsets[-1]} edges written to {store_dir}")
+    return len(tweet_ids)
+
+
+def _node_ids(values):
+    return ['ROOT' if value == ROOT_ID else str(value) for value in values.tolist()]
+
+
+class CascadeStore:
+    """
+    Read-only, memory-mapped view over a store written by build_cascade_store.
+    Cascades are returned as array slices without copying or unpickling anything.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+        self.tweet_ids = index['tweet_ids']
+        self.labels = index['labels']
+        self.positions = {tweet_id: i for i, tweet_id in enumerate(self.tweet_ids)}
+        self.offsets = np.load(os.path.join(store_dir, OFFSETS_FILE), mmap_mode='r')
+        self.columns = {field: np.load(os.path.join(store_dir, f"{field}.npy"), mmap_mode='r') for field in ARRAY_FIELDS}
+
+    def __len__(self):
+        return len(self.tweet_ids)
+
+    def __contains__(self, tweet_id):
+        return tweet_id in self.positions
+
+    def label(self, tweet_id):
+        return self.labels[self.positions[tweet_id]]
+
+    def num_edges(self, tweet_id):
+        position = self.positions[tweet_id]
+        return int(self.offsets[position + 1] - self.offsets[position])
+
+    def arrays(self, tweet_id):
+        """
+        Get the edge columns of one cascade.
+        Args:
+            tweet_id (str): Source tweet ID.
+        Returns:
+            dict: Read-only array views keyed by tree_parser.ARRAY_FIELDS.
+        """
+        position = self.positions[tweet_id]
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return {field: column[start:end] for field, column in self.columns.items()}
+
+    def graph(self, tweet_id):
+        """
+        Build the same uid-keyed nx.DiGraph that save_graph.build_tree_network produces,
+        so the result can be passed to analysis.analyze_graph or extract_graph_features.
+        Args:
+            tweet_id (str): Source tweet ID.
+        Returns:
+            nx.DiGraph: Directed graph of the cascade.
+        """
+        arrays = self.arrays(tweet_id)
+        G = nx.DiGraph()
+        G.add_edges_from(zip(_node_ids(arrays['parent_uid']), _node_ids(arrays['child_uid']),
+                             ({'delay': delay} for delay in arrays['delay'].tolist())))
+        return G
+
+    def iter_cascades(self, label=None):
+        """
+        Iterate over (label, tweet_id) pairs in store order, optionally for a single label.
+        """
+        for tweet_id, tweet_label in zip(self.tweet_ids, self.labels):
+            if label is None or tweet_label == label:
+                yield tweet_label, tweet_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a memory-mapped cascade store from processed tree files.")
+    parser.add_argument('--input-dir', default="processed_data16")
+    parser.add_argument('--store-dir', default="cascades16")
+    args = parser.parse_args()
+
+    build_cascade_store(args.input_dir, args.store_dir)
+
+    start = time.perf_counter()
+    store = CascadeStore(args.store_dir)
+    num_edges = sum(len(store.arrays(tweet_id)['delay']) for _, tweet_id in store.iter_cascades())
+    elapsed = time.perf_counter() - start
+    print(f"Opened store and sliced {len(store)} cascades ({num_edges} edges) in {elapsed * 1000:.1f} ms")
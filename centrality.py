@@ -0,0 +1,146 @@
+# centrality.py
+
+import math
+import time
+import random
+import argparse
+import networkx as nx
+
+# Graphs with more nodes than this use pivot-sampled centralities by default
+APPROX_THRESHOLD = 5000
+# Pivot count used in approximate mode when neither k nor a target error is given
+DEFAULT_PIVOTS = 500
+# Failure probability used for the error bound
+DEFAULT_DELTA = 0.1
+
+
+def pivots_for_error(num_nodes, epsilon, delta=DEFAULT_DELTA):
+    """
+    Number of pivots needed so that, by Hoeffding's inequality and a union bound over all nodes,
+    every normalized betweenness estimate is within epsilon of the exact value with probability 1 - delta.
+    Args:
+        num_nodes (int): Number of nodes in the graph.
+        epsilon (float): Target absolute error.
+        delta (float): Allowed failure probability.
+    Returns:
+        int: Number of pivots, capped at num_nodes.
+    """
+    return min(num_nodes, math.ceil(math.log(2 * num_nodes / delta) / (2 * epsilon ** 2)))
+
+
+def error_bound(num_nodes, k, delta=DEFAULT_DELTA):
+    """
+    Absolute error bound guaranteed with probability 1 - delta by k pivots (inverse of pivots_for_error).
+    """
+    if k >= num_nodes:
+        return 0.0
+    return math.sqrt(math.log(2 * num_nodes / delta) / (2 * k))
+
+
+def approximate_closeness(graph, pivots):
+    """
+    Estimate nx.closeness_centrality (incoming distances, Wasserman-Faust scaling) from BFS runs
+    started at a sample of pivot nodes.
+    With c pivots reaching u at a total distance s, the reachable count and distance sum are scaled
+    by (n - 1) / k, which gives closeness(u) ~= c^2 / (k * s).
+    Args:
+        graph (nx.DiGraph): Graph to analyze.
+        pivots (list): Sampled source nodes.
+    Returns:
+        dict: Estimated closeness centrality per node.
+    """
+    reached = dict.fromkeys(graph, 0)
+    total_distance = dict.fromkeys(graph, 0)
+    for pivot in pivots:
+        for node, distance in nx.single_source_shortest_path_length(graph, pivot).items():
+            if distance > 0:
+                reached[node] += 1
+                total_distance[node] += distance
+    k = len(pivots)
+    return {node: reached[node] ** 2 / (k * total_distance[node]) if total_distance[node] > 0 else 0.0 for node in graph}
+
+
+def compute_centralities(graph, approx_threshold=APPROX_THRESHOLD, approx_k=None, approx_epsilon=None, seed=42):
+    """
+    Compute betweenness and closeness centrality, switching to pivot sampling for large graphs.
+    Args:
+        graph (nx.DiGraph): Graph to analyze.
+        approx_threshold (int): Node count above which approximate mode is used; None disables it.
+        approx_k (int): Number of pivots in approximate mode.
+        approx_epsilon (float): Target betweenness error; sets the pivot count when approx_k is not given.
+        seed (int): Seed for pivot sampling.
+    Returns:
+        tuple: (betweenness dict, closeness dict, dict describing the mode, sample size and error bound)
+    """
+    num_nodes = graph.number_of_nodes()
+    if approx_threshold is None or num_nodes <= approx_threshold:
+        info = {'centrality_mode': 'exact', 'centrality_sample_size': num_nodes, 'centrality_error_bound': 0.0}
+        return nx.betweenness_centrality(graph), nx.closeness_centrality(graph), info
+
+    if approx_k is None:
+        approx_k = pivots_for_error(num_nodes, approx_epsilon) if approx_epsilon else DEFAULT_PIVOTS
+    k = min(approx_k, num_nodes)
+    pivots = random.Random(seed).sample(list(graph.nodes()), k)
+    betweenness = nx.betweenness_centrality(graph, k=k, seed=seed)
+    closeness = approximate_closeness(graph, pivots)
+    info = {'centrality_mode': 'approximate', 'centrality_sample_size': k, 'centrality_error_bound': error_bound(num_nodes, k)}
+    return betweenness, closeness, info
+
+
+def measure_approximation_error(graph_dirs, k_values, top=10, seed=42):
+    """
+    Report max/mean absolute error and speedup of approximate vs exact centralities
+    on the largest pickled graphs.
+    Args:
+        graph_dirs (list): Graph directories (e.g. graphs15, graphs16) with {label}_graphs folders.
+        k_values (list): Pivot counts to evaluate.
+        top (int): Number of largest graphs to evaluate.
+        seed (int): Seed for pivot sampling.
+    """
+    import os
+    import pickle
+
+    graph_files = []
+    for graph_dir in graph_dirs:
+        for label_dir in os.listdir(graph_dir):
+            label_path = os.path.join(graph_dir, label_dir)
+            if os.path.isdir(label_path):
+                graph_files.extend(os.path.join(label_path, f) for f in os.listdir(label_path) if f.endswith('.pkl'))
+    graph_files = sorted(graph_files, key=os.path.getsize, reverse=True)[:top]
+
+    exact = []
+    exact_seconds = 0.0
+    for graph_file_path in graph_files:
+        with open(graph_file_path, 'rb') as f:
+            graph = pickle.load(f)
+        start = time.perf_counter()
+        betweenness, closeness, _ = compute_centralities(graph, approx_threshold=None)
+        exact_seconds += time.perf_counter() - start
+        exact.append((graph, betweenness, closeness))
+    print(f"exact: {exact_seconds:.2f}s on {len(graph_files)} graphs")
+
+    for k in k_values:
+        seconds = 0.0
+        errors = {'betweenness': [], 'closeness': []}
+        bound = 0.0
+        for graph, exact_betweenness, exact_closeness in exact:
+            start = time.perf_counter()
+            betweenness, closeness, info = compute_centralities(graph, approx_threshold=0, approx_k=k, seed=seed)
+            seconds += time.perf_counter() - start
+            bound = max(bound, info['centrality_error_bound'])
+            errors['betweenness'].extend(abs(betweenness[n] - exact_betweenness[n]) for n in graph)
+            errors['closeness'].extend(abs(closeness[n] - exact_closeness[n]) for n in graph)
+        print(f"k={k}: {seconds:.2f}s ({exact_seconds / seconds:.1f}x faster), bound {bound:.4f}, "
+              f"betweenness max/mean error {max(errors['betweenness']):.2e}/{sum(errors['betweenness']) / len(errors['betweenness']):.2e}, "
+              f"closeness max/mean error {max(errors['closeness']):.2e}/{sum(errors['closeness']) / len(errors['closeness']):.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure approximate centrality error against exact centralities.")
+    parser.add_argument('--graph-dirs', nargs='+', default=["graphs15", "graphs16"])
+    parser.add_argument('--k', nargs='+', type=int, default=[50, 100, 250, 500])
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    measure_approximation_error(args.graph_dirs, args.k, top=args.top, seed=args.seed)
@@ -1,10 +1,13 @@
 import os
 import json
+import time
+import argparse
 import pandas as pd
-from transformers import pipeline
-from gensim import corpora
-from gensim.models import LdaModel
-from gensim.parsing.preprocessing import preprocess_string
+from topic_modeling import (TweetCorpus, load_topic_model, perplexity, save_topic_model, save_topics,
+                            train_topic_model, update_topic_model)
+from inference_engine import analyze_tweets, configure_threads
+from inference_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, InferenceCache
+from instrumentation import add_arguments, from_arguments
 
 def load_source_tweets(file_path):
     """
@@ -21,76 +24,103 @@ def load_source_tweets(file_path):
             source_tweets[tweet_id] = tweet_content
     return source_tweets
 
-def perform_sentiment_analysis(tweets, label, output_dir):
+def perform_sentiment_analysis(tweets, label, output_dir, batch_size=32, workers=1, backend='torch', cache=None,
+                               sentiment_mode='transformer', ambiguity_band=None):
     """
     Perform sentiment analysis and emotion detection on tweets.
     Args:
         tweets (dict): Dictionary containing tweet IDs and their content.
         label (str): Label of the tweets (true, false, etc.).
         output_dir (str): Directory to save the analysis results.
+        batch_size (int): Number of tweets per forward pass.
+        workers (int): Number of worker processes to shard the tweets across.
+        backend (str): 'torch' for eager PyTorch, 'onnx' for the quantized ONNX Runtime backend.
+        cache (InferenceCache): Optional prediction cache; only uncached tweets are run through the models.
+        sentiment_mode (str): 'transformer', or 'tiered' for VADER first with transformer escalation.
+        ambiguity_band (tuple): (low, high) VADER compound band escalated to the transformer in tiered mode.
+    Returns:
+        dict: Tiered-mode counters ('lexicon', 'escalated'); empty in transformer mode.
     """
     os.makedirs(output_dir, exist_ok=True)
-    results = []
-
-    # Initialize sentiment and emotion analyzers
-    sentiment_analyzer = pipeline("sentiment-analysis")
-    emotion_analyzer = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=False)
-
-    for tweet_id, tweet_content in tweets.items():
-        sentiment = sentiment_analyzer(tweet_content)[0]
-        emotion = emotion_analyzer(tweet_content)[0]
-
-        result = {
-            "tweet_id": tweet_id,
-            "content": tweet_content,
-            "sentiment_score": sentiment['score'],
-            "sentiment_label": sentiment['label'],
-            "emotion_label": emotion['label'],
-            "emotion_score": emotion['score']
-        }
-        results.append(result)
 
-        print(f"Processed tweet ID: {tweet_id} | Sentiment: {sentiment['label']} | Emotion: {emotion['label']}")
+    # Models are loaded once per process by the inference engine and run on length-sorted batches
+    start = time.perf_counter()
+    stats = {}
+    results = analyze_tweets(tweets, batch_size=batch_size, workers=workers, backend=backend, cache=cache,
+                             sentiment_mode=sentiment_mode, ambiguity_band=ambiguity_band, stats=stats)
+    elapsed = time.perf_counter() - start
+    print(f"Processed {len(results)} {label} tweets in {elapsed:.1f}s ({len(results) / max(elapsed, 1e-9):.1f} tweets/sec)")
+    if sentiment_mode == 'tiered':
+        print(f"Escalated {stats['escalated']} of {len(results)} {label} tweets to the transformer "
+              f"({stats['escalated'] / max(len(results), 1):.1%})")
 
     output_file_path = os.path.join(output_dir, f"{label}_sentiment_emotion_analysis.json")
     with open(output_file_path, 'w') as f:
         json.dump(results, f, indent=4)
 
     print(f"Sentiment and emotion analysis results saved to {output_file_path}")
+    return stats
 
-def perform_topic_modeling(tweets, label, output_dir, num_topics=5, num_words=10):
+def perform_topic_modeling(tweets, label, output_dir, num_topics=5, num_words=10, model_dir=None, mode='multicore',
+                           workers=None, passes=15, retrain=False):
     """
     Perform topic modeling on tweets using LDA.
     Args:
-        tweets (dict): Dictionary containing tweet IDs and their content.
+        tweets (dict or str): Dictionary containing tweet IDs and their content, or the path of a
+                              source tweets file to stream the corpus from.
         label (str): Label of the tweets (true, false, etc.).
         output_dir (str): Directory to save the analysis results.
         num_topics (int): Number of topics to extract.
         num_words (int): Number of words to show per topic.
+        model_dir (str): Directory to persist the dictionary and model in; an existing model there is
+                         updated with tweets it has not seen instead of being retrained.
+        mode (str): 'multicore', 'online' or 'batch' (see topic_modeling.train_topic_model).
+        workers (int): Worker processes for multicore LDA.
+        passes (int): Passes over the corpus when training.
+        retrain (bool): Train from scratch even if model_dir holds a model.
     """
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Preprocess tweets for topic modeling
-    processed_tweets = [preprocess_string(tweet_content) for tweet_content in tweets.values()]
-
-    # Create a dictionary and corpus
-    dictionary = corpora.Dictionary(processed_tweets)
-    corpus = [dictionary.doc2bow(text) for text in processed_tweets]
-
-    # Perform LDA topic modeling
-    lda_model = LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=15)
-
-    # Extract topics
-    topics = lda_model.print_topics(num_words=num_words)
-    topics_dict = {f"Topic {i+1}": topic for i, topic in topics}
-
-    output_file_path = os.path.join(output_dir, f"{label}_topic_modeling.json")
-    with open(output_file_path, 'w') as f:
-        json.dump(topics_dict, f, indent=4)
-
+    start = time.perf_counter()
+    saved = None if (model_dir is None or retrain) else load_topic_model(model_dir)
+    if saved is None:
+        lda_model, dictionary, trained_ids = train_topic_model(tweets, num_topics=num_topics, passes=passes, mode=mode, workers=workers)
+        action = f"Trained {mode} LDA"
+    else:
+        lda_model, dictionary, trained_ids = saved
+        new_tweets = update_topic_model(tweets, lda_model, dictionary, trained_ids)
+        action = f"Updated LDA with {new_tweets} new tweets"
+    elapsed = time.perf_counter() - start
+    if model_dir is not None:
+        save_topic_model(model_dir, lda_model, dictionary, trained_ids)
+    score = perplexity(lda_model, TweetCorpus(tweets, dictionary))
+    print(f"{action} for {label} in {elapsed:.2f}s (perplexity {score:.1f})")
+
+    output_file_path = save_topics(lda_model, label, output_dir, num_words=num_words)
     print(f"Topic modeling results saved to {output_file_path}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiment, emotion and topic analysis of source tweets.")
+    parser.add_argument('--batch-size', type=int, default=32, help="Tweets per forward pass")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes to shard tweets across")
+    parser.add_argument('--threads', type=int, default=None, help="Torch intra-op threads (defaults to all cores)")
+    parser.add_argument('--backend', choices=['torch', 'onnx'], default='torch',
+                        help="'onnx' serves both models from cached int8-quantized ONNX exports")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="SQLite cache of model predictions")
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES)
+    parser.add_argument('--no-cache', action='store_true', help="Always run the models")
+    parser.add_argument('--sentiment-mode', choices=['transformer', 'tiered'], default='transformer',
+                        help="'tiered' scores with VADER first and escalates only ambiguous tweets")
+    parser.add_argument('--ambiguity-band', nargs=2, type=float, default=[-0.5, 0.5], metavar=('LOW', 'HIGH'),
+                        help="VADER compound scores strictly inside this band are escalated in tiered mode")
+    parser.add_argument('--lda-mode', choices=['multicore', 'online', 'batch'], default='multicore')
+    parser.add_argument('--lda-workers', type=int, default=None, help="Worker processes for multicore LDA")
+    parser.add_argument('--lda-model-dir', default="lda_models", help="Where dictionaries and LDA models are persisted")
+    parser.add_argument('--retrain', action='store_true', help="Retrain LDA models instead of updating saved ones")
+    add_arguments(parser, 'content_analysis')
+    args = parser.parse_args()
+    metrics = from_arguments('content_analysis', args)
+    configure_threads(args.threads)
+    cache = None if args.no_cache else InferenceCache(args.cache, max_entries=args.cache_max_entries)
+
     base_dirs = {
         "Twitter15": "processed_data15",
         "Twitter16": "processed_data16"
@@ -105,7 +135,27 @@ if __name__ == "__main__":
             source_tweets_file_path = os.path.join(base_dir, f"{label}_source_tweets.txt")
             tweets = load_source_tweets(source_tweets_file_path)
             label_output_dir = os.path.join(output_dir, label)
-            perform_sentiment_analysis(tweets, label, label_output_dir)
-            perform_topic_modeling(tweets, label, label_output_dir)
+            with metrics.stage('sentiment_emotion', dataset=dataset, label=label) as sentiment_stage:
+                hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+                tiered_stats = perform_sentiment_analysis(tweets, label, label_output_dir, batch_size=args.batch_size, workers=args.workers,
+                                                          backend=args.backend, cache=cache, sentiment_mode=args.sentiment_mode,
+                                                          ambiguity_band=tuple(args.ambiguity_band))
+                sentiment_stage.add_items(len(tweets))
+                for name, value in tiered_stats.items():
+                    sentiment_stage.count(name, value)
+                if cache is not None:
+                    sentiment_stage.count('cache_hits', cache.hits - hits)
+                    sentiment_stage.count('cache_misses', cache.misses - misses)
+            with metrics.stage('topic_modeling', dataset=dataset, label=label) as topic_stage:
+                perform_topic_modeling(source_tweets_file_path, label, label_output_dir,
+                                       model_dir=os.path.join(args.lda_model_dir, dataset.lower(), label),
+                                       mode=args.lda_mode, workers=args.lda_workers, retrain=args.retrain)
+                topic_stage.add_items(len(tweets))
         print(f"Finished processing {dataset}.")
+    if cache is not None:
+        stats = cache.stats()
+        metrics.cache('inference', stats['hits'], stats['misses'])
+        print(f"Inference cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries")
+        cache.close()
+    metrics.write(args.metrics_output)
     print("All analyses complete.")
\ No newline at end of file
@@ -1,5 +1,9 @@
 # data_loader.py
 
+import os
+import json
+from tree_parser import parse_tree_edges
+
 def load_labels(label_file_path):
     """
     Load labels from the label file.
@@ -42,12 +46,47 @@ def parse_tree_file(tree_file_path):
     Returns:
         list: List of edges represented as (parent, child, attributes).
     """
-    edges = []
-    with open(tree_file_path, 'r') as file:
-        lines = file.readlines()
-        for line in lines:
-            parent, child = line.strip().split('->')
-            parent = eval(parent.strip())
-            child = eval(child.strip())
-            edges.append((parent[0], child[0], {'delay': float(child[2])}))  # Use UID for nodes and ensure delay is float
-    return edges
\ No newline at end of file
+    # Use UID for nodes and delay as float; see tree_parser for the streaming/columnar variants
+    return parse_tree_edges(tree_file_path)
+
+# Written by preprocess_data.separate_data_by_labels next to the per-label files
+TREE_MANIFEST_FILE = "tree_manifest.json"
+
+def load_tree_manifest(processed_dir):
+    """
+    Load the tree manifest of a processed data directory.
+    Args:
+        processed_dir (str): Directory written by preprocess_data.separate_data_by_labels.
+    Returns:
+        dict: Tweet IDs as keys and {'label', 'path', 'bytes'} as values, with paths resolved
+              against processed_dir; None when the directory has no manifest.
+    """
+    manifest_path = os.path.join(processed_dir, TREE_MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as file:
+        trees = json.load(file)['trees']
+    for entry in trees.values():
+        entry['path'] = os.path.normpath(os.path.join(processed_dir, entry['path']))
+    return trees
+
+def list_label_trees(processed_dir, label, manifest=None):
+    """
+    List the tree files of one label of a processed data directory, sorted by tweet ID.
+    The {label}_trees folder is used when preprocessing copied or linked the files into it;
+    otherwise the files are read in place from the raw dataset through the tree manifest.
+    Args:
+        processed_dir (str): Directory written by preprocess_data.separate_data_by_labels.
+        label (str): Label to list.
+        manifest (dict): Already loaded tree manifest, to avoid reading it once per label.
+    Returns:
+        list: (tweet_id, tree file path) tuples.
+    """
+    tree_dir = os.path.join(processed_dir, f"{label}_trees")
+    if os.path.isdir(tree_dir):
+        return [(tree_file.replace('.txt', ''), os.path.join(tree_dir, tree_file))
+                for tree_file in sorted(os.listdir(tree_dir)) if tree_file.endswith(".txt")]
+    manifest = manifest if manifest is not None else load_tree_manifest(processed_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"{processed_dir} has neither a {label}_trees folder nor a {TREE_MANIFEST_FILE}")
+    return sorted((tweet_id, entry['path']) for tweet_id, entry in manifest.items() if entry['label'] == label)
@@ -0,0 +1,157 @@
+# early_prediction.py
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, r2_score
+from cascade_metrics import build_event_tree
+from cascade_store import CascadeStore
+from data_loader import list_label_trees, load_tree_manifest
+from tree_parser import parse_tree_arrays
+
+# Observation windows in minutes (the unit of the tree files' delay field)
+DEFAULT_WINDOWS = [5, 15, 60, 240]
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+
+
+def iter_cascades(source):
+    """
+    Yield (label, tweet_id, edge arrays) from a cascade store directory or a processed data directory.
+    Args:
+        source (str): Directory written by cascade_store.build_cascade_store, or a processed_data*
+                      directory with {label}_trees folders or a tree manifest.
+    """
+    if os.path.exists(os.path.join(source, "index.json")):
+        store = CascadeStore(source)
+        for label, tweet_id in store.iter_cascades():
+            yield label, tweet_id, store.arrays(tweet_id)
+        return
+    manifest = load_tree_manifest(source)
+    for label in LABELS:
+        for tweet_id, tree_file_path in list_label_trees(source, label, manifest):
+            yield label, tweet_id, parse_tree_arrays(tree_file_path)
+
+
+def extract_window_features(arrays, windows=DEFAULT_WINDOWS):
+    """
+    Features of a cascade as it looked after each observation window, computed in one pass:
+    events are sorted by delay once and every window is a prefix of that order.
+    Args:
+        arrays (dict): Edge columns as returned by tree_parser.parse_tree_arrays or CascadeStore.arrays.
+        windows (list): Observation windows in minutes, ascending.
+    Returns:
+        tuple: (list of feature dicts, one per window; dict of final targets)
+    """
+    tree = build_event_tree(arrays)
+    # Node 0 is the ROOT placeholder; every other node is a retweet event. Events with no known
+    # delay (NaN) sort last and are never inside a window.
+    delays = tree['delay'][1:]
+    depths = tree['depth'][1:]
+    uids = tree['uid'][1:]
+    order = np.argsort(delays, kind='stable')
+    sorted_delays = delays[order]
+    sorted_depths = depths[order]
+    running_depth = np.maximum.accumulate(sorted_depths) if len(order) else sorted_depths
+    observed_counts = np.searchsorted(sorted_delays, windows, side='right')
+
+    features = []
+    for window, observed in zip(windows, observed_counts.tolist()):
+        window_delays = sorted_delays[:observed]
+        window_depths = sorted_depths[:observed]
+        breadth = np.bincount(window_depths) if observed else np.zeros(1, dtype=np.int64)
+        recent = int(np.sum(window_delays > window / 2)) if observed else 0
+        features.append({
+            'window': window,
+            'observed_size': observed,
+            'observed_depth': int(running_depth[observed - 1]) if observed else 0,
+            'observed_max_breadth': int(breadth.max()),
+            'observed_direct_retweets': int(breadth[2]) if len(breadth) > 2 else 0,
+            'observed_unique_users': int(len(np.unique(uids[order[:observed]]))) if observed else 0,
+            'observed_mean_delay': float(window_delays.mean()) if observed else 0.0,
+            'observed_last_delay': float(window_delays[-1]) if observed else 0.0,
+            # Share of the observed events that arrived in the second half of the window
+            'observed_recent_fraction': recent / observed if observed else 0.0,
+        })
+    targets = {'cascade_size': len(delays), 'cascade_depth': int(depths.max()) if len(depths) else 0}
+    return features, targets
+
+
+def build_window_dataset(sources, windows=DEFAULT_WINDOWS):
+    """
+    Extract window features for every cascade of every dataset.
+    Args:
+        sources (dict): Dataset name -> cascade store or processed data directory.
+        windows (list): Observation windows in minutes.
+    Returns:
+        pd.DataFrame: One row per (cascade, window) with features and final targets.
+    """
+    rows = []
+    windows = sorted(windows)
+    for dataset, source in sources.items():
+        for label, tweet_id, arrays in iter_cascades(source):
+            window_features, targets = extract_window_features(arrays, windows)
+            for features in window_features:
+                rows.append({'dataset': dataset, 'label': label, 'tweet_id': tweet_id, **features, **targets})
+    return pd.DataFrame(rows)
+
+
+def evaluate_windows(dataset_df, test_size=0.2, random_state=42):
+    """
+    Train and evaluate the cascade-trigger models (RandomForest and Ridge) separately for each window,
+    predicting final cascade size and depth from what was observed so far.
+    Args:
+        dataset_df (pd.DataFrame): Output of build_window_dataset.
+    Returns:
+        list: One result dict per (window, model).
+    """
+    feature_columns = [column for column in dataset_df.columns if column.startswith('observed_')]
+    target_columns = ['cascade_size', 'cascade_depth']
+    models = {
+        'random_forest': lambda: RandomForestRegressor(random_state=random_state),
+        'ridge': lambda: Ridge(random_state=random_state),
+    }
+    results = []
+    for window, window_df in dataset_df.groupby('window'):
+        X_train, X_test, y_train, y_test = train_test_split(window_df[feature_columns], window_df[target_columns],
+                                                            test_size=test_size, random_state=random_state)
+        for name, make_model in models.items():
+            model = make_model()
+            model.fit(X_train, y_train)
+            predictions = model.predict(X_test)
+            result = {'window': int(window), 'model': name}
+            for i, target in enumerate(target_columns):
+                result[f'{target}_mae'] = mean_absolute_error(y_test[target], predictions[:, i])
+                result[f'{target}_r2'] = r2_score(y_test[target], predictions[:, i])
+            results.append(result)
+            print(f"window {window:>4} min, {name:>13}: size MAE {result['cascade_size_mae']:.1f} (R² {result['cascade_size_r2']:.2f}), "
+                  f"depth MAE {result['cascade_depth_mae']:.2f} (R² {result['cascade_depth_r2']:.2f})")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time-windowed early-prediction features and per-window models.")
+    parser.add_argument('--sources', nargs='+', default=["Twitter15=processed_data15", "Twitter16=processed_data16"],
+                        help="dataset=directory pairs; directories may be cascade stores or processed data")
+    parser.add_argument('--windows', nargs='+', type=float, default=DEFAULT_WINDOWS, help="Observation windows in minutes")
+    parser.add_argument('--features-output', default=None, help="Optional CSV path for the extracted features")
+    parser.add_argument('--evaluate', action='store_true', help="Train and evaluate models per window")
+    parser.add_argument('--output', default="early_prediction_results.json")
+    args = parser.parse_args()
+
+    sources = dict(pair.split('=', 1) for pair in args.sources)
+    start = time.perf_counter()
+    dataset_df = build_window_dataset(sources, args.windows)
+    print(f"Extracted {len(dataset_df)} window feature vectors in {time.perf_counter() - start:.2f}s")
+    if args.features_output:
+        dataset_df.to_csv(args.features_output, index=False)
+    if args.evaluate:
+        results = evaluate_windows(dataset_df)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Early prediction results saved to {args.output}")
@@ -0,0 +1,196 @@
+# feature_store.py
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import networkx as nx
+from cascade_store import CascadeStore
+from analysis_store import AnalysisStore, has_analysis_store
+
+FEATURE_STORE_DIR = "feature_store"
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+GRAPH_FEATURE_COLUMNS = ['num_nodes', 'num_edges', 'mean_in_degree', 'mean_out_degree',
+                         'mean_degree_centrality', 'mean_clustering_coefficient']
+CONTENT_FEATURE_COLUMNS = ['sentiment_score', 'sentiment_label', 'emotion_label']
+FEATURE_COLUMNS = GRAPH_FEATURE_COLUMNS + CONTENT_FEATURE_COLUMNS
+TARGET_COLUMNS = ['cascade_size', 'cascade_depth']
+
+
+def load_json(file_path):
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    return data
+
+def load_graph(graph_file_path):
+    with open(graph_file_path, 'rb') as f:
+        return pickle.load(f)
+
+def extract_graph_features(graph):
+    num_nodes = graph.number_of_nodes()
+    num_edges = graph.number_of_edges()
+    in_degrees = [d for n, d in graph.in_degree()]
+    out_degrees = [d for n, d in graph.out_degree()]
+    degree_centrality = nx.degree_centrality(graph)
+    clustering_coefficient = nx.clustering(graph)
+
+    features = {
+        'num_nodes': num_nodes,
+        'num_edges': num_edges,
+        'mean_in_degree': np.mean(in_degrees),
+        'mean_out_degree': np.mean(out_degrees),
+        'mean_degree_centrality': np.mean(list(degree_centrality.values())),
+        'mean_clustering_coefficient': np.mean(list(clustering_coefficient.values()))
+    }
+    return features
+
+def combine_features(graph_features, content_features):
+    combined_features = graph_features.copy()
+    combined_features.update(content_features)
+    return combined_features
+
+
+def feature_table_path(dataset, store_dir=FEATURE_STORE_DIR):
+    return os.path.join(store_dir, f"{dataset.lower()}.parquet")
+
+
+def _file_signature(path):
+    # Size and modification time only, so a table stays valid when the base directory moves
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _analysis_file_path(graph_analysis_dir, dataset, label, tweet_id):
+    # Twitter15 and Twitter16 results were written under different naming schemes
+    if dataset == 'Twitter15':
+        return os.path.join(graph_analysis_dir, f"{tweet_id}_graphs_analysis.json")
+    return os.path.join(graph_analysis_dir, f"{label}_{tweet_id}_graphs_analysis.json")
+
+
+def _load_targets(analysis_dir):
+    """
+    cascade_size and tree_depth per (label, tweet_id) from the analysis store, or None when the
+    analysis results are still per-file JSON.
+    """
+    if not has_analysis_store(analysis_dir):
+        return None
+    metrics = AnalysisStore(analysis_dir).metrics
+    return {(label, tweet_id): {'cascade_size': cascade_size, 'tree_depth': None if pd.isna(tree_depth) else tree_depth}
+            for label, tweet_id, cascade_size, tree_depth in zip(metrics['label'].tolist(), metrics['tweet_id'].tolist(),
+                                                                 metrics['cascade_size'].tolist(), metrics['tree_depth'].tolist())}
+
+
+def build_feature_table(base_dir, dataset, store_dir=FEATURE_STORE_DIR):
+    """
+    Materialize (or refresh) the feature table of one dataset: tweet id, label, graph features,
+    content features and targets, one row per source tweet with a graph and a graph analysis file.
+    Targets come from the analysis store (analysis_store.py) when analysis_results* has one, and
+    from the per-tweet *_graphs_analysis.json files otherwise.
+    Each row records a fingerprint of its inputs (graph file or cascade store, analysis results and
+    sentiment entry); rows whose fingerprint is unchanged are reused instead of being recomputed.
+    Args:
+        base_dir (str): Repository root holding the per-dataset result directories.
+        dataset (str): 'Twitter15' or 'Twitter16'.
+        store_dir (str): Directory holding the Parquet tables.
+    Returns:
+        tuple: (pd.DataFrame, number of rebuilt rows)
+    """
+    table_path = feature_table_path(dataset, store_dir)
+    cached = {}
+    if os.path.exists(table_path):
+        previous = pd.read_parquet(table_path)
+        cached = {(row['label'], row['tweet_id']): row for row in previous.to_dict('records')}
+
+    suffix = dataset[-2:]
+    cascade_store_dir = os.path.join(base_dir, f"cascades{suffix}")
+    cascade_store = CascadeStore(cascade_store_dir) if os.path.isdir(cascade_store_dir) else None
+    cascade_store_signature = _file_signature(os.path.join(cascade_store_dir, "offsets.npy")) if cascade_store else None
+
+    analysis_dir = os.path.join(base_dir, f"analysis_results{suffix}")
+    targets = _load_targets(analysis_dir)
+
+    rows = []
+    rebuilt = 0
+    for label in LABELS:
+        sentiment_file = os.path.join(base_dir, f"content_analysis_results_{dataset.lower()}", label, f"{label}_sentiment_emotion_analysis.json")
+        graph_dir = os.path.join(base_dir, f"graphs{suffix}", f"{label}_graphs")
+        graph_analysis_dir = os.path.join(analysis_dir, label)
+
+        for entry in load_json(sentiment_file):
+            tweet_id = entry['tweet_id']
+            graph_file_path = os.path.join(graph_dir, f"{tweet_id}.pkl")
+            graph_analysis_file_path = _analysis_file_path(graph_analysis_dir, dataset, label, tweet_id)
+            in_store = cascade_store is not None and tweet_id in cascade_store
+            if targets is not None:
+                graph_analysis_data = targets.get((label, tweet_id))
+                has_analysis = graph_analysis_data is not None
+            else:
+                graph_analysis_data = None
+                has_analysis = os.path.exists(graph_analysis_file_path)
+            if not ((in_store or os.path.exists(graph_file_path)) and has_analysis):
+                continue
+
+            content_features = {
+                'sentiment_score': entry['sentiment_score'],
+                'sentiment_label': entry['sentiment_label'],
+                'emotion_label': entry['emotion_label']
+            }
+            graph_signature = f"{cascade_store_signature}:{tweet_id}" if in_store else _file_signature(graph_file_path)
+            # Store rows are fingerprinted by value, so rewriting the table only rebuilds rows that changed
+            analysis_signature = repr(graph_analysis_data) if targets is not None else _file_signature(graph_analysis_file_path)
+            fingerprint = hashlib.sha1('|'.join((
+                graph_signature,
+                analysis_signature,
+                json.dumps(content_features, sort_keys=True),
+            )).encode('utf-8')).hexdigest()
+
+            row = cached.get((label, tweet_id))
+            if row is None or row['fingerprint'] != fingerprint:
+                graph = cascade_store.graph(tweet_id) if in_store else load_graph(graph_file_path)
+                if graph_analysis_data is None:
+                    graph_analysis_data = load_json(graph_analysis_file_path)
+                tree_depth = graph_analysis_data.get('tree_depth', 0)
+                row = {'tweet_id': tweet_id, 'label': label}
+                row.update(combine_features(extract_graph_features(graph), content_features))
+                row['cascade_size'] = graph_analysis_data.get('cascade_size', 0)
+                row['cascade_depth'] = tree_depth if isinstance(tree_depth, (int, float)) else 0
+                row['fingerprint'] = fingerprint
+                rebuilt += 1
+            rows.append(row)
+
+    columns = ['tweet_id', 'label'] + FEATURE_COLUMNS + TARGET_COLUMNS + ['fingerprint']
+    table = pd.DataFrame(rows, columns=columns)
+    if rebuilt or len(rows) != len(cached):
+        os.makedirs(store_dir, exist_ok=True)
+        table.to_parquet(table_path, index=False)
+    return table, rebuilt
+
+
+def load_feature_table(base_dir, dataset, store_dir=FEATURE_STORE_DIR):
+    """
+    Load the feature table of one dataset. Checking the row fingerprints only stats files and reads
+    the sentiment JSONs, so the table is refreshed on every load and stays in sync with its inputs.
+    Returns:
+        pd.DataFrame: Feature table in build order.
+    """
+    table, rebuilt = build_feature_table(base_dir, dataset, store_dir)
+    if rebuilt:
+        print(f"Feature table {feature_table_path(dataset, store_dir)}: {rebuilt} of {len(table)} rows rebuilt")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the per-dataset feature tables used by the cascade models.")
+    parser.add_argument('--base-dir', default=".")
+    parser.add_argument('--store-dir', default=FEATURE_STORE_DIR)
+    parser.add_argument('--datasets', nargs='+', default=['Twitter15', 'Twitter16'])
+    args = parser.parse_args()
+
+    for dataset in args.datasets:
+        start = time.perf_counter()
+        table, rebuilt = build_feature_table(args.base_dir, dataset, args.store_dir)
+        print(f"{dataset}: {len(table)} rows ({rebuilt} rebuilt) in {time.perf_counter() - start:.2f}s -> {feature_table_path(dataset, args.store_dir)}")
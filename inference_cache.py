@@ -0,0 +1,126 @@
+# inference_cache.py
+
+import time
+import sqlite3
+import hashlib
+import argparse
+import unicodedata
+
+DEFAULT_CACHE_PATH = "inference_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 1_000_000
+
+
+def normalize_text(text):
+    """
+    Normalize tweet text for cache keys: Unicode NFC and collapsed whitespace.
+    """
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def cache_key(model_name, revision, text):
+    """
+    Content-addressed key for one prediction: sha256 of (model id, model revision, normalized text).
+    """
+    payload = '\0'.join((model_name, revision, normalize_text(text)))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class InferenceCache:
+    """
+    On-disk SQLite cache of model predictions with size-bounded LRU eviction and hit/miss counters.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, label TEXT NOT NULL, score REAL NOT NULL, last_access INTEGER NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS predictions_model ON predictions (model)")
+        self.connection.commit()
+
+    def get_many(self, model_name, revision, texts):
+        """
+        Look up cached predictions and refresh their LRU timestamp.
+        Args:
+            model_name (str): HuggingFace model id.
+            revision (str): Model revision the predictions were made with.
+            texts (list): Texts to look up.
+        Returns:
+            list: {'label', 'score'} dicts, or None for texts that are not cached.
+        """
+        keys = [cache_key(model_name, revision, text) for text in texts]
+        found = {}
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(f"SELECT key, label, score FROM predictions WHERE key IN ({placeholders})", chunk)
+            found.update((key, {'label': label, 'score': score}) for key, label, score in rows)
+        if found:
+            now = time.time_ns()
+            self.connection.executemany("UPDATE predictions SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+            self.connection.commit()
+        self.hits += len([key for key in keys if key in found])
+        self.misses += len([key for key in keys if key not in found])
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model_name, revision, texts, predictions):
+        """
+        Store predictions, then evict least recently used entries beyond max_entries.
+        """
+        now = time.time_ns()
+        rows = [(cache_key(model_name, revision, text), model_name, prediction['label'], prediction['score'], now)
+                for text, prediction in zip(texts, predictions)]
+        self.connection.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)", rows)
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,))
+
+    def invalidate(self, model_name=None):
+        """
+        Drop cached predictions of one model, or of every model when model_name is None.
+        Returns:
+            int: Number of removed entries.
+        """
+        if model_name is None:
+            removed = self.connection.execute("DELETE FROM predictions").rowcount
+        else:
+            removed = self.connection.execute("DELETE FROM predictions WHERE model = ?", (model_name,)).rowcount
+        self.connection.commit()
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        entries = self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0, 'entries': entries}
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the inference result cache.")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH)
+    parser.add_argument('--invalidate-model', default=None, help="Model id whose cached predictions should be dropped")
+    parser.add_argument('--invalidate-all', action='store_true')
+    args = parser.parse_args()
+
+    cache = InferenceCache(args.cache)
+    if args.invalidate_all:
+        print(f"Removed {cache.invalidate()} cached predictions")
+    elif args.invalidate_model:
+        print(f"Removed {cache.invalidate(args.invalidate_model)} cached predictions for {args.invalidate_model}")
+    print(f"{cache.stats()['entries']} cached predictions in {args.cache}")
+    cache.close()
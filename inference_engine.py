@@ -0,0 +1,267 @@
+# inference_engine.py
+
+import os
+import time
+import argparse
+import multiprocessing
+from inference_cache import normalize_text
+
+SENTIMENT_MODEL = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+# Models are loaded once per process and reused across labels and datasets
+_loaded_models = {}
+# Worker pool reused across calls so each worker also loads the models only once
+_pool = None
+_pool_workers = 0
+# Intra-op thread count chosen by configure_threads, also used for ONNX Runtime sessions
+_num_threads = None
+
+
+def configure_threads(num_threads=None):
+    """
+    Set torch (and ONNX Runtime) intra-op threads for CPU-only hosts.
+    Args:
+        num_threads (int): Threads to use; defaults to the number of available cores.
+    """
+    global _num_threads
+    if num_threads is None:
+        num_threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    _num_threads = max(1, num_threads)
+    import torch
+    torch.set_num_threads(_num_threads)
+
+
+def load_model(model_name):
+    """
+    Load a sequence classification model and its tokenizer, once per process.
+    Args:
+        model_name (str): HuggingFace model id.
+    Returns:
+        tuple: (tokenizer, model) with the model in eval mode.
+    """
+    if model_name not in _loaded_models:
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        _loaded_models[model_name] = (tokenizer, model)
+    return _loaded_models[model_name]
+
+
+def iter_sorted_batches(tokenizer, texts, batch_size=32, max_length=512, return_tensors='pt'):
+    """
+    Tokenize texts once and yield length-sorted, dynamically padded batches.
+    Sorting by token count and padding only to the longest text of each batch keeps padding
+    waste small for short, similar-length tweets.
+    Args:
+        tokenizer: HuggingFace tokenizer.
+        texts (list): Texts to encode.
+        batch_size (int): Number of texts per batch.
+        max_length (int): Truncation length in tokens.
+        return_tensors (str): 'pt' for torch tensors, 'np' for NumPy arrays.
+    Yields:
+        tuple: (indices of the batch's texts in the input list, padded model inputs)
+    """
+    encodings = tokenizer(list(texts), truncation=True, max_length=max_length)
+    order = sorted(range(len(texts)), key=lambda i: len(encodings['input_ids'][i]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        features = [{key: encodings[key][i] for key in encodings.keys()} for i in batch]
+        yield batch, tokenizer.pad(features, return_tensors=return_tensors)
+
+
+def classify(texts, model_name, batch_size=32, max_length=512, backend='torch'):
+    """
+    Classify texts in length-sorted batches with dynamic padding.
+    Args:
+        texts (list): Texts to classify.
+        model_name (str): HuggingFace model id.
+        batch_size (int): Number of texts per forward pass.
+        max_length (int): Truncation length in tokens.
+        backend (str): 'torch' for eager PyTorch, 'onnx' for the quantized ONNX Runtime backend.
+    Returns:
+        list: {'label', 'score'} dicts for the top class of each text, in input order.
+    """
+    if backend == 'onnx':
+        from onnx_backend import classify_onnx
+        return classify_onnx(texts, model_name, batch_size=batch_size, max_length=max_length)
+
+    import torch
+    tokenizer, model = load_model(model_name)
+    predictions = [None] * len(texts)
+    with torch.inference_mode():
+        for batch, inputs in iter_sorted_batches(tokenizer, texts, batch_size, max_length):
+            probabilities = torch.softmax(model(**inputs).logits, dim=-1)
+            scores, indices = probabilities.max(dim=-1)
+            for i, score, index in zip(batch, scores.tolist(), indices.tolist()):
+                predictions[i] = {'label': model.config.id2label[index], 'score': score}
+    return predictions
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.close()
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        # Split the cores between workers so their torch thread pools don't oversubscribe
+        _pool = multiprocessing.get_context('spawn').Pool(workers, initializer=configure_threads, initargs=(max(1, cores // workers),))
+        _pool_workers = workers
+    return _pool
+
+
+def classify_sharded(texts, model_name, batch_size=32, workers=1, backend='torch'):
+    """
+    classify, optionally sharded across a persistent pool of worker processes.
+    """
+    if workers <= 1 or len(texts) < 2 * batch_size:
+        return classify(texts, model_name, batch_size=batch_size, backend=backend)
+    if backend == 'onnx':
+        # Export once here; workers would otherwise all export into the same files
+        from onnx_backend import export_model
+        export_model(model_name)
+    shard_size = -(-len(texts) // workers)
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+    predictions = []
+    for shard_predictions in _get_pool(workers).starmap(classify, [(shard, model_name, batch_size, 512, backend) for shard in shards]):
+        predictions.extend(shard_predictions)
+    return predictions
+
+
+_revisions = {}
+
+
+def model_revision(model_name, backend='torch'):
+    """
+    Revision string identifying the weights behind a prediction (hub commit hash plus backend),
+    used to key the inference cache. Only the model config is loaded.
+    """
+    if model_name not in _revisions:
+        from transformers import AutoConfig
+        _revisions[model_name] = getattr(AutoConfig.from_pretrained(model_name), '_commit_hash', None) or 'unknown'
+    suffix = 'onnx-int8' if backend == 'onnx' else backend
+    return f"{_revisions[model_name]}:{suffix}"
+
+
+def classify_cached(texts, model_name, batch_size=32, workers=1, backend='torch', cache=None):
+    """
+    classify_sharded that serves repeated texts from an InferenceCache and only runs the model on misses.
+    Texts that are identical after cache normalization are classified once per call.
+    Args:
+        cache (InferenceCache): Optional cache; None always runs the model.
+    Returns:
+        list: {'label', 'score'} dicts in input order.
+    """
+    if cache is None:
+        return classify_sharded(texts, model_name, batch_size=batch_size, workers=workers, backend=backend)
+    revision = model_revision(model_name, backend)
+    predictions = cache.get_many(model_name, revision, texts)
+    missing = {}
+    for i, prediction in enumerate(predictions):
+        if prediction is None:
+            missing.setdefault(normalize_text(texts[i]), []).append(i)
+    if missing:
+        missing_texts = [texts[positions[0]] for positions in missing.values()]
+        computed = classify_sharded(missing_texts, model_name, batch_size=batch_size, workers=workers, backend=backend)
+        cache.put_many(model_name, revision, missing_texts, computed)
+        for positions, prediction in zip(missing.values(), computed):
+            for i in positions:
+                predictions[i] = prediction
+    return predictions
+
+
+def analyze_tweets(tweets, batch_size=32, workers=1, backend='torch', cache=None,
+                   sentiment_mode='transformer', ambiguity_band=None, stats=None):
+    """
+    Run sentiment and emotion classification over tweets.
+    Args:
+        tweets (dict): Dictionary containing tweet IDs and their content.
+        batch_size (int): Number of tweets per forward pass.
+        workers (int): Number of worker processes to shard the tweets across.
+        backend (str): 'torch' or 'onnx' (see classify).
+        cache (InferenceCache): Optional prediction cache consulted before inference.
+        sentiment_mode (str): 'transformer' for every tweet, or 'tiered' to score with VADER first and
+                              escalate only tweets inside ambiguity_band (see tiered_sentiment.py).
+        ambiguity_band (tuple): (low, high) VADER compound band for tiered mode.
+        stats (dict): Optional counters updated by tiered mode ('lexicon', 'escalated').
+    Returns:
+        list: Result dicts in the *_sentiment_emotion_analysis.json schema, in input order.
+    """
+    items = list(tweets.items())
+    texts = [content for _, content in items]
+    if sentiment_mode == 'tiered':
+        from tiered_sentiment import DEFAULT_BAND, classify_tiered
+        sentiments = classify_tiered(texts, band=ambiguity_band or DEFAULT_BAND, stats=stats,
+                                     batch_size=batch_size, workers=workers, backend=backend, cache=cache)
+    else:
+        sentiments = classify_cached(texts, SENTIMENT_MODEL, batch_size=batch_size, workers=workers, backend=backend, cache=cache)
+    emotions = classify_cached(texts, EMOTION_MODEL, batch_size=batch_size, workers=workers, backend=backend, cache=cache)
+    results = []
+    for (tweet_id, tweet_content), sentiment, emotion in zip(items, sentiments, emotions):
+        results.append({
+            "tweet_id": tweet_id,
+            "content": tweet_content,
+            "sentiment_score": sentiment['score'],
+            "sentiment_label": sentiment['label'],
+            "emotion_label": emotion['label'],
+            "emotion_score": emotion['score']
+        })
+    return results
+
+
+def _baseline_pipelines():
+    """
+    The two pipelines of the previous content_analysis.perform_sentiment_analysis, built outside the timed region.
+    """
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL), pipeline("text-classification", model=EMOTION_MODEL)
+
+
+def _per_tweet_baseline(tweets, sentiment_analyzer, emotion_analyzer):
+    """
+    The previous per-tweet pipeline loop of content_analysis.perform_sentiment_analysis, kept as the benchmark baseline.
+    """
+    for tweet_content in tweets.values():
+        sentiment_analyzer(tweet_content)
+        emotion_analyzer(tweet_content)
+
+
+def benchmark_inference(source_tweets_file_path, limit=500, batch_sizes=(8, 32, 64), workers=1):
+    """
+    Compare tweets/sec of the per-tweet pipeline loop and the batched engine on CPU.
+    Args:
+        source_tweets_file_path (str): Path to a source_tweets.txt file.
+        limit (int): Number of tweets to benchmark on.
+        batch_sizes (tuple): Batch sizes to try.
+        workers (int): Number of worker processes for the engine.
+    """
+    from data_loader import load_source_tweets
+    tweets = dict(list(load_source_tweets(source_tweets_file_path).items())[:limit])
+    configure_threads()
+    load_model(SENTIMENT_MODEL)
+    load_model(EMOTION_MODEL)
+    # Both sides are timed with their models already loaded
+    sentiment_analyzer, emotion_analyzer = _baseline_pipelines()
+
+    start = time.perf_counter()
+    _per_tweet_baseline(tweets, sentiment_analyzer, emotion_analyzer)
+    baseline = len(tweets) / (time.perf_counter() - start)
+    print(f"per-tweet pipeline loop: {baseline:.1f} tweets/sec")
+
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        analyze_tweets(tweets, batch_size=batch_size, workers=workers)
+        throughput = len(tweets) / (time.perf_counter() - start)
+        print(f"batched engine (batch_size={batch_size}, workers={workers}): {throughput:.1f} tweets/sec ({throughput / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched sentiment/emotion inference on CPU.")
+    parser.add_argument('--source-tweets', default="rumor_detection_acl2017/twitter16/source_tweets.txt")
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[8, 32, 64])
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    benchmark_inference(args.source_tweets, limit=args.limit, batch_sizes=args.batch_sizes, workers=args.workers)
@@ -0,0 +1,366 @@
+# instrumentation.py
+
+import os
+import sys
+import json
+import time
+import heapq
+import pstats
+import cProfile
+import resource
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+
+RUN_REPORT_DIR = "run_reports"
+PROFILE_DIR = os.path.join(RUN_REPORT_DIR, "profiles")
+PROFILERS = ('cprofile', 'sample')
+# Slowest items kept per stage, and functions listed per profile in the run report
+TOP_ITEMS = 10
+TOP_FUNCTIONS = 15
+SAMPLE_INTERVAL = 0.005
+METRIC_PREFIX = "fakenews"
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _children_cpu():
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread records the Python stack of one thread every
+    interval seconds. Overhead stays low and constant however many calls the stage makes.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        """
+        Write the samples in collapsed-stack format ("outer;inner count"), as read by flamegraph tools.
+        """
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def top(self, n=TOP_FUNCTIONS):
+        total = sum(self.stacks.values())
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                inclusive[function] += count
+        return [{'function': function, 'own_fraction': count / total, 'inclusive_fraction': inclusive[function] / total}
+                for function, count in own.most_common(n)]
+
+
+class StageMetrics:
+    """
+    Counters of one pipeline stage: totals filled in by RunMetrics.stage, items and per-item
+    timings recorded by the stage itself (or by parallel.run_parallel for per-cascade tasks).
+    """
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.runs = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.children_cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.peak_rss_increase_mb = 0.0
+        self.children_peak_rss_mb = 0.0
+        self.items = 0
+        self.errors = 0
+        self.counters = Counter()
+        self.item_wall = []
+        self.item_cpu = []
+        self._slowest = []
+
+    def add_items(self, count=1):
+        self.items += count
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def record_item(self, item_id, wall_seconds, cpu_seconds=None, error=False):
+        """
+        Record one item (e.g. a cascade) processed by the stage.
+        """
+        self.items += 1
+        self.errors += bool(error)
+        self.item_wall.append(wall_seconds)
+        if cpu_seconds is not None:
+            self.item_cpu.append(cpu_seconds)
+        entry = (wall_seconds, str(item_id))
+        if len(self._slowest) < TOP_ITEMS:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def summary(self):
+        summary = {
+            'stage': self.name,
+            'labels': self.labels,
+            'runs': self.runs,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'children_cpu_seconds': self.children_cpu_seconds,
+            'peak_rss_mb': self.peak_rss_mb,
+            'peak_rss_increase_mb': self.peak_rss_increase_mb,
+            'children_peak_rss_mb': self.children_peak_rss_mb,
+            'items': self.items,
+            'items_per_sec': self.items / self.wall_seconds if self.wall_seconds else None,
+            'errors': self.errors,
+            'counters': dict(self.counters),
+        }
+        for key, values in (('item_wall_seconds', self.item_wall), ('item_cpu_seconds', self.item_cpu)):
+            if values:
+                p50, p90, p99 = np.percentile(values, [50, 90, 99])
+                summary[key] = {'count': len(values), 'sum': float(np.sum(values)), 'p50': float(p50),
+                                'p90': float(p90), 'p99': float(p99), 'max': float(np.max(values))}
+        if self._slowest:
+            summary['slowest_items'] = [{'item': item, 'wall_seconds': wall} for wall, item in sorted(self._slowest, reverse=True)]
+        return summary
+
+
+class _NullStage:
+    """
+    Stand-in used when a function is called without a RunMetrics; every recording is a no-op.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_items(self, count=1):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def record_item(self, item_id, wall_seconds, cpu_seconds=None, error=False):
+        pass
+
+
+def stage(metrics, name, **labels):
+    """
+    metrics.stage(name, **labels), or a no-op stage when metrics is None, so library functions can
+    take an optional RunMetrics.
+    """
+    return metrics.stage(name, **labels) if metrics is not None else _NullStage()
+
+
+class RunMetrics:
+    """
+    Per-stage wall time, CPU time (own and of worker processes), peak memory, item counts,
+    per-item timing percentiles and cache hit rates of one pipeline run, with an optional
+    cProfile or sampling profiler around selected stages. One summary line is printed per stage;
+    everything else goes to the run report (JSON and Prometheus text format).
+    """
+
+    def __init__(self, run_name, profile=None, profile_stages=None, profile_dir=PROFILE_DIR, quiet=False):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profile!r}; expected one of {PROFILERS}")
+        self.run_name = run_name
+        self.profile = profile
+        self.profile_stages = set(profile_stages) if profile_stages else None
+        self.profile_dir = profile_dir
+        self.quiet = quiet
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.caches = {}
+        self.profiles = []
+        self._profiler_active = False
+
+    def _profiling(self, name):
+        # Nested stages are covered by the outer stage's profile
+        return (self.profile is not None and not self._profiler_active
+                and (self.profile_stages is None or name in self.profile_stages))
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """
+        Measure a stage; repeated stages with the same name and labels accumulate.
+        Yields:
+            StageMetrics: For recording items, per-item timings and counters.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self.stages:
+            self.stages[key] = StageMetrics(name, {k: str(v) for k, v in labels.items()})
+        metrics = self.stages[key]
+        profiler = None
+        if self._profiling(name):
+            profiler = cProfile.Profile() if self.profile == 'cprofile' else SamplingProfiler()
+            profiler.enable() if self.profile == 'cprofile' else profiler.start()
+            self._profiler_active = True
+        rss_before = _peak_rss_mb()
+        children_cpu = _children_cpu()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            wall = time.perf_counter() - start
+            metrics.runs += 1
+            metrics.wall_seconds += wall
+            metrics.cpu_seconds += time.process_time() - cpu
+            metrics.children_cpu_seconds += _children_cpu() - children_cpu
+            metrics.peak_rss_mb = max(metrics.peak_rss_mb, _peak_rss_mb())
+            metrics.peak_rss_increase_mb = max(metrics.peak_rss_increase_mb, metrics.peak_rss_mb - rss_before)
+            metrics.children_peak_rss_mb = max(metrics.children_peak_rss_mb, _peak_rss_mb(resource.RUSAGE_CHILDREN))
+            if profiler is not None:
+                self._save_profile(profiler, name, labels)
+                self._profiler_active = False
+            if not self.quiet:
+                label_text = ''.join(f" {value}" for value in labels.values())
+                print(f"[{self.run_name}] {name}{label_text}: {metrics.items} items in {wall:.2f}s "
+                      f"({metrics.cpu_seconds + metrics.children_cpu_seconds:.2f}s CPU, peak RSS {metrics.peak_rss_mb:.0f} MB"
+                      f"{f', {metrics.errors} errors' if metrics.errors else ''})")
+
+    def _save_profile(self, profiler, name, labels):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        file_stem = '_'.join([self.run_name, name, *map(str, labels.values())]).replace(os.sep, '-')
+        if self.profile == 'cprofile':
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f"{file_stem}.prof")
+            profiler.dump_stats(path)
+            stats = pstats.Stats(profiler)
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+            top = [{'function': f"{function} ({os.path.basename(file)}:{line})", 'calls': calls,
+                    'own_seconds': own, 'cumulative_seconds': cumulative}
+                   for (file, line, function), (_, calls, own, cumulative, _) in rows]
+        else:
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f"{file_stem}.collapsed")
+            profiler.write_collapsed(path)
+            top = profiler.top()
+        self.profiles.append({'stage': name, 'labels': {k: str(v) for k, v in labels.items()},
+                              'profiler': self.profile, 'path': path, 'top': top})
+
+    def cache(self, name, hits, misses):
+        """
+        Record hits and misses of a cache (accumulated per name).
+        """
+        entry = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+        entry['hits'] += hits
+        entry['misses'] += misses
+
+    def report(self):
+        caches = {name: dict(entry, hit_rate=entry['hits'] / max(entry['hits'] + entry['misses'], 1))
+                  for name, entry in self.caches.items()}
+        return {
+            'run': self.run_name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'wall_seconds': time.perf_counter() - self._start,
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': [metrics.summary() for metrics in self.stages.values()],
+            'caches': caches,
+            'profiles': self.profiles,
+        }
+
+    def prometheus(self):
+        """
+        The run report in the Prometheus text exposition format (e.g. for a node_exporter textfile collector).
+        """
+        report = self.report()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in {'run': self.run_name, **labels}.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}")
+
+        stages = [({'stage': summary['stage'], **summary['labels']}, summary) for summary in report['stages']]
+        metric('stage_wall_seconds', 'gauge', "Wall time of the stage.", [(labels, s['wall_seconds']) for labels, s in stages])
+        metric('stage_cpu_seconds', 'gauge', "CPU time of the stage, including worker processes.",
+               [(labels, s['cpu_seconds'] + s['children_cpu_seconds']) for labels, s in stages])
+        metric('stage_peak_rss_bytes', 'gauge', "Peak resident memory of the process at the end of the stage.",
+               [(labels, int(s['peak_rss_mb'] * 1024 * 1024)) for labels, s in stages])
+        metric('stage_items_total', 'counter', "Items processed by the stage.", [(labels, s['items']) for labels, s in stages])
+        metric('stage_errors_total', 'counter', "Items that failed in the stage.", [(labels, s['errors']) for labels, s in stages])
+        item_samples = []
+        for labels, s in stages:
+            if 'item_wall_seconds' in s:
+                for quantile in ('p50', 'p90', 'p99'):
+                    item_samples.append(({**labels, 'quantile': f"0.{quantile[1:]}"}, s['item_wall_seconds'][quantile]))
+        if item_samples:
+            metric('item_wall_seconds', 'gauge', "Per-item wall time quantiles of the stage.", item_samples)
+        counter_samples = [({**labels, 'counter': name}, value) for labels, s in stages for name, value in s['counters'].items()]
+        if counter_samples:
+            metric('stage_counter_total', 'counter', "Stage-specific counters.", counter_samples)
+        if report['caches']:
+            metric('cache_hits_total', 'counter', "Cache hits.", [({'cache': name}, c['hits']) for name, c in report['caches'].items()])
+            metric('cache_misses_total', 'counter', "Cache misses.", [({'cache': name}, c['misses']) for name, c in report['caches'].items()])
+            metric('cache_hit_ratio', 'gauge', "Cache hit ratio.", [({'cache': name}, c['hit_rate']) for name, c in report['caches'].items()])
+        metric('run_wall_seconds', 'gauge', "Wall time of the run so far.", [({}, report['wall_seconds'])])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Write the run report to path (JSON) and next to it in Prometheus text format (.prom).
+        Returns:
+            tuple: (JSON path, Prometheus path)
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+        prometheus_path = f"{os.path.splitext(path)[0]}.prom"
+        with open(prometheus_path, 'w') as f:
+            f.write(self.prometheus())
+        print(f"Run report saved to {path} and {prometheus_path}")
+        return path, prometheus_path
+
+
+def add_arguments(parser, run_name):
+    """
+    Add the shared --metrics-output, --profile and --profile-stages options to a script's parser.
+    """
+    parser.add_argument('--metrics-output', default=os.path.join(RUN_REPORT_DIR, f"{run_name}.json"),
+                        help="Run report path (JSON; a .prom file in Prometheus text format is written next to it)")
+    parser.add_argument('--profile', choices=PROFILERS, default=None,
+                        help="Profile stages with cProfile or the sampling profiler (use --workers 1 to include per-cascade work)")
+    parser.add_argument('--profile-stages', nargs='+', default=None, help="Only profile these stages (default: all)")
+
+
+def from_arguments(run_name, args):
+    return RunMetrics(run_name, profile=args.profile, profile_stages=args.profile_stages)
@@ -0,0 +1,291 @@
+# model_experiments.py
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import itertools
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from feature_store import FEATURE_COLUMNS, FEATURE_STORE_DIR, TARGET_COLUMNS, load_feature_table
+from instrumentation import add_arguments, from_arguments, stage
+
+EXPERIMENT_CACHE_DIR = "experiment_cache"
+DATASETS = ['Twitter15', 'Twitter16']
+# Keys of the per-dataset result files, as the cascade-trigger scripts have always written them
+RESULT_KEYS = ['mse', 'mae', 'r2', 'cross_val_mse', 'feature_importances']
+# Categorical content features, label-encoded before fitting
+ENCODED_COLUMNS = ['sentiment_label', 'emotion_label']
+
+# Each experiment names an estimator class, fixed params, an optional grid of params to search
+# (the grid point with the lowest cross-validation MSE is reported), whether features are
+# standardized first, and the directory its results are written to.
+DEFAULT_EXPERIMENTS = {
+    'random_forest': {
+        'estimator': 'sklearn.ensemble.RandomForestRegressor',
+        'params': {'random_state': 42},
+        'output_dir': 'cascade_triggering_analysis_results',
+    },
+    'ridge': {
+        'estimator': 'sklearn.linear_model.Ridge',
+        'params': {'random_state': 42},
+        'output_dir': 'cascade_triggering_analysis_results_advanced',
+    },
+    'mlp': {
+        'estimator': 'sklearn.neural_network.MLPRegressor',
+        'params': {'random_state': 42, 'max_iter': 1000},
+        'grid': {'hidden_layer_sizes': [[32], [64, 32]], 'alpha': [0.0001, 0.01]},
+        'scale': True,
+        'output_dir': 'cascade_triggering_analysis_results_mlp',
+    },
+}
+
+
+def load_experiment_data(base_dir, dataset):
+    """
+    Model inputs of one dataset from the feature store, with the categorical content features
+    label-encoded as the cascade-trigger scripts did.
+    Returns:
+        tuple: (feature DataFrame, target DataFrame)
+    """
+    table = load_feature_table(base_dir, dataset, store_dir=os.path.join(base_dir, FEATURE_STORE_DIR))
+    feature_df = table[FEATURE_COLUMNS].copy()
+    label_df = table[TARGET_COLUMNS].copy()
+    for column, encoder in fit_label_encoders(feature_df).items():
+        feature_df[column] = encoder.transform(feature_df[column])
+    return feature_df, label_df
+
+
+def fit_label_encoders(feature_df):
+    """
+    One LabelEncoder per categorical content feature, fitted on the feature table. The serving
+    bundles of prediction_service.py persist these so requests are encoded like the training rows.
+    Returns:
+        dict: column name -> fitted LabelEncoder
+    """
+    return {column: LabelEncoder().fit(feature_df[column]) for column in ENCODED_COLUMNS}
+
+
+def make_splits(num_rows, test_size=0.2, n_splits=5, random_state=42):
+    """
+    The shared evaluation splits: one holdout split (train_test_split) and the unshuffled K folds
+    that cross_val_score uses for regressors. Every model is scored on exactly these indices.
+    Returns:
+        dict: split id -> (train indices, test indices)
+    """
+    indices = np.arange(num_rows)
+    train, test = train_test_split(indices, test_size=test_size, random_state=random_state)
+    splits = {'holdout': (train, test)}
+    for fold, (fold_train, fold_test) in enumerate(KFold(n_splits=n_splits).split(indices)):
+        splits[f'fold{fold}'] = (fold_train, fold_test)
+    return splits
+
+
+def data_hash(feature_df, label_df, splits):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(feature_df, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(label_df, index=False).values.tobytes())
+    for split_id, (train, test) in splits.items():
+        digest.update(split_id.encode('utf-8'))
+        digest.update(train.tobytes())
+        digest.update(test.tobytes())
+    return digest.hexdigest()
+
+
+def grid_points(experiment):
+    """
+    Every params dict of an experiment: its fixed params combined with each point of its grid.
+    """
+    grid = experiment.get('grid', {})
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield {**experiment.get('params', {}), **dict(zip(names, values))}
+
+
+def build_model(experiment, params):
+    module_name, class_name = experiment['estimator'].rsplit('.', 1)
+    estimator_class = getattr(importlib.import_module(module_name), class_name)
+    # JSON configs carry tuples (e.g. hidden_layer_sizes) as lists
+    model = estimator_class(**{name: tuple(value) if isinstance(value, list) else value for name, value in params.items()})
+    return make_pipeline(StandardScaler(), model) if experiment.get('scale') else model
+
+
+def fit_key(experiment, params, split_id, dataset_hash):
+    config = {'estimator': experiment['estimator'], 'params': params, 'scale': bool(experiment.get('scale')),
+              'split': split_id, 'sklearn': sklearn.__version__}
+    return hashlib.sha256((json.dumps(config, sort_keys=True) + dataset_hash).encode('utf-8')).hexdigest()
+
+
+def feature_importances(model):
+    model = model.steps[-1][1] if hasattr(model, 'steps') else model
+    if hasattr(model, 'feature_importances_'):
+        return model.feature_importances_.tolist()
+    if hasattr(model, 'coef_'):
+        return model.coef_.tolist()
+    return None
+
+
+def fit_and_score(experiment, params, feature_df, label_df, train, test, cache_path):
+    """
+    Fit one model on one split, score it on the split's test rows and cache the fitted model
+    (cache_path.joblib) and its scores (cache_path.json).
+    Returns:
+        dict: mse, mae, r2 and feature_importances of the fit.
+    """
+    model = build_model(experiment, params)
+    model.fit(feature_df.iloc[train], label_df.iloc[train])
+    predictions = model.predict(feature_df.iloc[test])
+    y_test = label_df.iloc[test]
+    scores = {
+        'mse': mean_squared_error(y_test, predictions),
+        'mae': mean_absolute_error(y_test, predictions),
+        'r2': r2_score(y_test, predictions),
+        'feature_importances': feature_importances(model),
+    }
+    joblib.dump(model, f"{cache_path}.joblib", compress=3)
+    with open(f"{cache_path}.json", 'w') as f:
+        json.dump(scores, f)
+    return scores
+
+
+def _timed_fit_and_score(*args):
+    start, cpu = time.perf_counter(), time.process_time()
+    scores = fit_and_score(*args)
+    return scores, time.perf_counter() - start, time.process_time() - cpu
+
+
+def load_fitted_model(cache_path):
+    return joblib.load(f"{cache_path}.joblib")
+
+
+def run_experiments(base_dir, experiments, datasets=DATASETS, workers=1, cache_dir=EXPERIMENT_CACHE_DIR,
+                    output_root=None, n_splits=5, metrics=None):
+    """
+    Evaluate every experiment and grid point on the shared splits of each dataset. Fits whose
+    (config, data) key is already in the cache are not repeated, so adding a model to the
+    configuration only fits the new model.
+    Args:
+        base_dir (str): Repository root holding the feature store inputs.
+        experiments (dict): Experiment name -> config (see DEFAULT_EXPERIMENTS).
+        datasets (list): Datasets to evaluate on.
+        workers (int): joblib worker processes for the fits.
+        cache_dir (str): Directory for cached models and scores.
+        output_root (str): Directory the experiments' output_dir paths are relative to (default base_dir).
+        n_splits (int): Number of cross-validation folds.
+        metrics (RunMetrics): Optional instrumentation; records per-fit times and the fit cache hit rate.
+    Returns:
+        dict: dataset -> experiment name -> results in the cascade_triggering_analysis_results shape
+              (mse, mae, r2 on the holdout split, cross_val_mse, feature_importances), plus the selected
+              params, the cross-validation MSE of every grid point and the path of the fitted model.
+              Only the RESULT_KEYS are written to the experiment's output_dir.
+    """
+    output_root = base_dir if output_root is None else output_root
+    os.makedirs(cache_dir, exist_ok=True)
+    all_results = {}
+    for dataset in datasets:
+        with stage(metrics, 'load_features', dataset=dataset) as load_stage:
+            feature_df, label_df = load_experiment_data(base_dir, dataset)
+            load_stage.add_items(len(feature_df))
+        if not len(feature_df):
+            continue
+        splits = make_splits(len(feature_df), n_splits=n_splits)
+        dataset_hash = data_hash(feature_df, label_df, splits)
+
+        jobs = {}
+        for name, experiment in experiments.items():
+            for point, params in enumerate(grid_points(experiment)):
+                for split_id in splits:
+                    cache_path = os.path.join(cache_dir, fit_key(experiment, params, split_id, dataset_hash))
+                    jobs[(name, point, split_id)] = (experiment, params, cache_path)
+        pending = [job for job, (_, _, cache_path) in jobs.items() if not os.path.exists(f"{cache_path}.json")]
+        print(f"{dataset}: {len(jobs)} fits, {len(jobs) - len(pending)} cached, fitting {len(pending)} with {workers} worker(s)...")
+        start = time.perf_counter()
+        with stage(metrics, 'fit_models', dataset=dataset) as fit_stage:
+            fits = Parallel(n_jobs=workers)(
+                delayed(_timed_fit_and_score)(jobs[job][0], jobs[job][1], feature_df, label_df, *splits[job[2]], jobs[job][2])
+                for job in pending)
+            for (name, point, split_id), (_, wall, cpu) in zip(pending, fits):
+                fit_stage.record_item(f"{name}[{point}]/{split_id}", wall, cpu)
+        if metrics is not None:
+            metrics.cache('model_fits', len(jobs) - len(pending), len(pending))
+        if pending:
+            print(f"{dataset}: fitted {len(pending)} models in {time.perf_counter() - start:.2f}s")
+
+        scores = {}
+        for job, (_, _, cache_path) in jobs.items():
+            with open(f"{cache_path}.json", 'r') as f:
+                scores[job] = json.load(f)
+
+        dataset_results = {}
+        fold_ids = [split_id for split_id in splits if split_id != 'holdout']
+        for name, experiment in experiments.items():
+            candidates = []
+            for point, params in enumerate(grid_points(experiment)):
+                cross_val_mse = float(np.mean([scores[(name, point, fold)]['mse'] for fold in fold_ids]))
+                candidates.append((cross_val_mse, point, params))
+            cross_val_mse, point, params = min(candidates, key=lambda candidate: candidate[0])
+            holdout = scores[(name, point, 'holdout')]
+            results = {
+                'mse': holdout['mse'],
+                'mae': holdout['mae'],
+                'r2': holdout['r2'],
+                'cross_val_mse': cross_val_mse,
+                'feature_importances': holdout['feature_importances'],
+                'model': experiment['estimator'],
+                'params': params,
+                'grid_results': [{'params': candidate_params, 'cross_val_mse': candidate_mse}
+                                 for candidate_mse, _, candidate_params in candidates],
+                'model_path': jobs[(name, point, 'holdout')][2] + ".joblib",
+            }
+            dataset_results[name] = results
+            print(f"{dataset} {name}: MSE {results['mse']:.4f}, MAE {results['mae']:.4f}, R² {results['r2']:.4f}, "
+                  f"CV MSE {cross_val_mse:.4f}, params {params}")
+
+            output_dir = os.path.join(output_root, experiment.get('output_dir', f"cascade_triggering_analysis_results_{name}"))
+            os.makedirs(output_dir, exist_ok=True)
+            dataset_output_file = os.path.join(output_dir, f"cascade_triggering_analysis_results_{dataset.lower()}.json")
+            with open(dataset_output_file, 'w') as f:
+                json.dump({key: results[key] for key in RESULT_KEYS}, f, indent=4)
+            print(f"Cascade triggering analysis results for {dataset} saved to {dataset_output_file}")
+        all_results[dataset] = dataset_results
+    return all_results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cascade-trigger regressors on shared CV folds with cached fits.")
+    parser.add_argument('--config', default=None, help="JSON file mapping experiment names to configs (default: built-in set)")
+    parser.add_argument('--models', nargs='+', default=None, help="Only run these experiments from the configuration")
+    parser.add_argument('--datasets', nargs='+', default=DATASETS)
+    parser.add_argument('--base-dir', default=".")
+    parser.add_argument('--workers', type=int, default=1, help="joblib worker processes (-1 for all cores)")
+    parser.add_argument('--cache-dir', default=EXPERIMENT_CACHE_DIR)
+    parser.add_argument('--n-splits', type=int, default=5)
+    parser.add_argument('--summary-output', default="experiment_results.json")
+    add_arguments(parser, 'model_experiments')
+    args = parser.parse_args()
+    metrics = from_arguments('model_experiments', args)
+
+    if args.config:
+        with open(args.config, 'r') as f:
+            experiments = json.load(f)
+    else:
+        experiments = DEFAULT_EXPERIMENTS
+    if args.models:
+        experiments = {name: experiments[name] for name in args.models}
+
+    start = time.perf_counter()
+    all_results = run_experiments(args.base_dir, experiments, datasets=args.datasets, workers=args.workers,
+                                  cache_dir=args.cache_dir, n_splits=args.n_splits, metrics=metrics)
+    with open(args.summary_output, 'w') as f:
+        json.dump(all_results, f, indent=4)
+    print(f"Experiments finished in {time.perf_counter() - start:.2f}s; summary saved to {args.summary_output}")
+    metrics.write(args.metrics_output)
@@ -0,0 +1,185 @@
+# onnx_backend.py
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import inference_engine
+from inference_engine import SENTIMENT_MODEL, EMOTION_MODEL, iter_sorted_batches
+
+ONNX_CACHE_DIR = "onnx_models"
+OPSET_VERSION = 14
+
+# ONNX Runtime sessions are created once per process
+_sessions = {}
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError("The ONNX backend needs onnx and onnxruntime: pip install onnx onnxruntime") from e
+    return onnxruntime
+
+
+def model_cache_dir(model_name, cache_dir=ONNX_CACHE_DIR):
+    return os.path.join(cache_dir, model_name.replace('/', '__'))
+
+
+def export_model(model_name, cache_dir=ONNX_CACHE_DIR, quantize=True):
+    """
+    Export a sequence classification model to ONNX once and cache it on disk, together with its
+    tokenizer and config, optionally followed by dynamic int8 weight quantization.
+    Later calls return the cached file without touching PyTorch. Files are written under a temporary
+    name and renamed, so a reader never sees a partial export; with several workers, export once in the
+    parent first (see inference_engine.classify_sharded).
+    Args:
+        model_name (str): HuggingFace model id.
+        cache_dir (str): Directory holding exported models.
+        quantize (bool): Whether to return the int8-quantized model.
+    Returns:
+        str: Path of the ONNX model to serve.
+    """
+    export_dir = model_cache_dir(model_name, cache_dir)
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    int8_path = os.path.join(export_dir, "model.int8.onnx")
+    target_path = int8_path if quantize else fp32_path
+    if os.path.exists(target_path):
+        return target_path
+
+    if not os.path.exists(fp32_path):
+        import torch
+        tokenizer, model = inference_engine.load_model(model_name)
+        os.makedirs(export_dir, exist_ok=True)
+        dummy = tokenizer(["an example tweet"], return_tensors='pt')
+        input_names = [name for name in tokenizer.model_input_names if name in dummy]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['logits'] = {0: 'batch'}
+        temp_path = f"{fp32_path}.{os.getpid()}.tmp"
+        torch.onnx.export(model, tuple(dummy[name] for name in input_names), temp_path,
+                          input_names=input_names, output_names=['logits'],
+                          dynamic_axes=dynamic_axes, opset_version=OPSET_VERSION)
+        tokenizer.save_pretrained(export_dir)
+        with open(os.path.join(export_dir, "labels.json"), 'w') as f:
+            json.dump({str(index): label for index, label in model.config.id2label.items()}, f)
+        # The model is renamed into place last, so its presence implies tokenizer and labels are there
+        os.replace(temp_path, fp32_path)
+        print(f"Exported {model_name} to {fp32_path}")
+
+    if quantize:
+        _require_onnxruntime()
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        temp_path = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_path, temp_path, weight_type=QuantType.QInt8)
+        os.replace(temp_path, int8_path)
+        print(f"Quantized {model_name} to {int8_path}")
+    return target_path
+
+
+def load_session(model_name, cache_dir=ONNX_CACHE_DIR, quantize=True):
+    """
+    Create (once per process) an ONNX Runtime CPU session for a cached export.
+    Args:
+        model_name (str): HuggingFace model id.
+        cache_dir (str): Directory holding exported models.
+        quantize (bool): Whether to serve the int8-quantized model.
+    Returns:
+        tuple: (tokenizer, session, id2label dict)
+    """
+    key = (model_name, cache_dir, quantize)
+    if key not in _sessions:
+        onnxruntime = _require_onnxruntime()
+        from transformers import AutoTokenizer
+        model_path = export_model(model_name, cache_dir, quantize=quantize)
+        export_dir = os.path.dirname(model_path)
+        options = onnxruntime.SessionOptions()
+        if inference_engine._num_threads:
+            options.intra_op_num_threads = inference_engine._num_threads
+        session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        with open(os.path.join(export_dir, "labels.json"), 'r') as f:
+            id2label = {int(index): label for index, label in json.load(f).items()}
+        _sessions[key] = (tokenizer, session, id2label)
+    return _sessions[key]
+
+
+def classify_onnx(texts, model_name, batch_size=32, max_length=512, cache_dir=ONNX_CACHE_DIR, quantize=True):
+    """
+    ONNX Runtime counterpart of inference_engine.classify.
+    Returns:
+        list: {'label', 'score'} dicts for the top class of each text, in input order.
+    """
+    tokenizer, session, id2label = load_session(model_name, cache_dir, quantize)
+    input_names = [node.name for node in session.get_inputs()]
+    predictions = [None] * len(texts)
+    for batch, inputs in iter_sorted_batches(tokenizer, texts, batch_size, max_length, return_tensors='np'):
+        logits = session.run(['logits'], {name: inputs[name].astype(np.int64) for name in input_names})[0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=-1, keepdims=True)
+        indices = probabilities.argmax(axis=-1)
+        for i, index, row in zip(batch, indices.tolist(), probabilities):
+            predictions[i] = {'label': id2label[index], 'score': float(row[index])}
+    return predictions
+
+
+def check_parity(source_tweets_paths, limit=None, batch_size=32):
+    """
+    Compare the quantized ONNX backend with the PyTorch path on source tweets: label agreement,
+    score deltas, per-batch latency and throughput for each model.
+    Args:
+        source_tweets_paths (list): Paths to source_tweets.txt files.
+        limit (int): Optional number of tweets to use.
+        batch_size (int): Batch size for both backends.
+    Returns:
+        dict: Parity and speed figures per model.
+    """
+    from data_loader import load_source_tweets
+    tweets = {}
+    for source_tweets_path in source_tweets_paths:
+        tweets.update(load_source_tweets(source_tweets_path))
+    texts = list(tweets.values())[:limit]
+    inference_engine.configure_threads()
+
+    report = {}
+    for model_name in (SENTIMENT_MODEL, EMOTION_MODEL):
+        inference_engine.load_model(model_name)
+        load_session(model_name)
+        timings = {}
+        outputs = {}
+        for backend in ('torch', 'onnx'):
+            start = time.perf_counter()
+            outputs[backend] = inference_engine.classify(texts, model_name, batch_size=batch_size, backend=backend)
+            timings[backend] = time.perf_counter() - start
+        agreement = np.mean([a['label'] == b['label'] for a, b in zip(outputs['torch'], outputs['onnx'])])
+        deltas = np.abs([a['score'] - b['score'] for a, b in zip(outputs['torch'], outputs['onnx'])])
+        num_batches = -(-len(texts) // batch_size)
+        report[model_name] = {
+            'tweets': len(texts),
+            'label_agreement': float(agreement),
+            'score_delta_mean': float(deltas.mean()),
+            'score_delta_max': float(deltas.max()),
+            'torch_tweets_per_sec': len(texts) / timings['torch'],
+            'onnx_tweets_per_sec': len(texts) / timings['onnx'],
+            'torch_ms_per_batch': 1000 * timings['torch'] / num_batches,
+            'onnx_ms_per_batch': 1000 * timings['onnx'] / num_batches,
+        }
+        print(f"{model_name}: agreement {agreement:.2%}, score delta mean/max {deltas.mean():.4f}/{deltas.max():.4f}, "
+              f"torch {report[model_name]['torch_tweets_per_sec']:.1f} vs onnx {report[model_name]['onnx_tweets_per_sec']:.1f} tweets/sec")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the content models to quantized ONNX and check parity with PyTorch.")
+    parser.add_argument('--source-tweets', nargs='+', default=["rumor_detection_acl2017/twitter15/source_tweets.txt",
+                                                               "rumor_detection_acl2017/twitter16/source_tweets.txt"])
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--output', default=None, help="Optional path to write the parity report as JSON")
+    args = parser.parse_args()
+
+    parity_report = check_parity(args.source_tweets, limit=args.limit, batch_size=args.batch_size)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(parity_report, f, indent=4)
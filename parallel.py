@@ -0,0 +1,53 @@
+# parallel.py
+
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def _call(func, args):
+    # Wall and CPU time are measured in the process that runs the task
+    start, cpu = time.perf_counter(), time.process_time()
+    try:
+        result, error = func(*args), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    return result, error, time.perf_counter() - start, time.process_time() - cpu
+
+
+def run_parallel(func, tasks, workers=1, sizes=None, stage_metrics=None):
+    """
+    Run func over independent per-cascade tasks, optionally on a process pool.
+    Tasks are submitted largest first so that the biggest cascades start early and the
+    long tail does not serialize at the end; results are returned in the original task order.
+    Args:
+        func (callable): Module-level function (must be picklable) called as func(*args).
+        tasks (list): List of (task_id, args) tuples, e.g. (tweet_id, (path, ...)).
+        workers (int): Number of worker processes; 1 runs everything in this process.
+        sizes (list): Optional cost estimate per task (e.g. file size) used for scheduling.
+        stage_metrics (StageMetrics): Optional instrumentation stage that records each task's wall and CPU time.
+    Returns:
+        list: (task_id, result, error) tuples in task order; error is a traceback string or None.
+    """
+    order = list(range(len(tasks)))
+    if sizes is not None:
+        order.sort(key=lambda i: sizes[i], reverse=True)
+
+    outcomes = [None] * len(tasks)
+    if workers <= 1:
+        for i in order:
+            outcomes[i] = _call(func, tasks[i][1])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_call, func, tasks[i][1]): i for i in order}
+            for future in as_completed(futures):
+                outcomes[futures[future]] = future.result()
+
+    results = []
+    for (task_id, _), (result, error, wall, cpu) in zip(tasks, outcomes):
+        if error is not None:
+            print(f"Error processing {task_id}:\n{error}")
+        if stage_metrics is not None:
+            stage_metrics.record_item(task_id, wall, cpu, error=error is not None)
+        results.append((task_id, result, error))
+    return results
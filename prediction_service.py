@@ -0,0 +1,480 @@
+# prediction_service.py
+
+import os
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+import http.client
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import joblib
+import numpy as np
+import pandas as pd
+import networkx as nx
+from data_loader import load_source_tweets
+from feature_store import FEATURE_COLUMNS, FEATURE_STORE_DIR, TARGET_COLUMNS, extract_graph_features, load_feature_table
+from inference_engine import analyze_tweets, configure_threads
+from model_experiments import DEFAULT_EXPERIMENTS, EXPERIMENT_CACHE_DIR, fit_label_encoders, run_experiments
+from tree_parser import parse_tree_line
+
+SERVING_MODEL_DIR = "serving_models"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+# Latencies kept for the percentile metrics; older requests drop out of the window
+LATENCY_WINDOW = 10000
+
+
+def serving_model_path(dataset, experiment_name='random_forest', model_dir=SERVING_MODEL_DIR):
+    return os.path.join(model_dir, f"{dataset.lower()}_{experiment_name}.joblib")
+
+
+def export_model(base_dir, dataset, experiment_name='random_forest', model_dir=SERVING_MODEL_DIR,
+                 cache_dir=EXPERIMENT_CACHE_DIR):
+    """
+    Persist a trained cascade model for serving: the experiment's holdout-split model (taken from the
+    model_experiments.py cache, so it is only fitted when the cache has no such fit yet) together with
+    the label encoders of the categorical content features and its evaluation results.
+    Args:
+        base_dir (str): Repository root holding the feature store inputs.
+        dataset (str): 'Twitter15' or 'Twitter16'.
+        experiment_name (str): Experiment of model_experiments.DEFAULT_EXPERIMENTS to serve.
+        model_dir (str): Directory for the bundle and its evaluation JSON.
+        cache_dir (str): model_experiments.py fit cache.
+    Returns:
+        str: Path of the saved bundle.
+    """
+    experiment = dict(DEFAULT_EXPERIMENTS[experiment_name], output_dir=model_dir)
+    results = run_experiments(base_dir, {experiment_name: experiment}, datasets=[dataset], cache_dir=cache_dir,
+                              output_root=".")[dataset][experiment_name]
+    table = load_feature_table(base_dir, dataset, store_dir=os.path.join(base_dir, FEATURE_STORE_DIR))
+    bundle = {
+        'model': joblib.load(results['model_path']),
+        'encoders': fit_label_encoders(table),
+        'feature_columns': FEATURE_COLUMNS,
+        'target_columns': TARGET_COLUMNS,
+        'dataset': dataset,
+        'experiment': experiment_name,
+        'params': results['params'],
+        'metrics': {key: results[key] for key in ('mse', 'mae', 'r2', 'cross_val_mse')},
+    }
+    os.makedirs(model_dir, exist_ok=True)
+    bundle_path = serving_model_path(dataset, experiment_name, model_dir)
+    joblib.dump(bundle, bundle_path, compress=3)
+    print(f"Serving bundle for {dataset} {experiment_name} saved to {bundle_path}")
+    return bundle_path
+
+
+def tree_graph(tree_lines=None):
+    """
+    Build the uid-keyed graph of a (partial) cascade the way save_graph.build_tree_network does.
+    Args:
+        tree_lines (list): Lines in the tree-file format ("['uid', 'tweet_id', 'delay']->[...]");
+                           None or empty for a cascade with only its source tweet.
+    Returns:
+        nx.DiGraph: Directed graph of the cascade.
+    """
+    G = nx.DiGraph()
+    edges = []
+    for line in tree_lines or ():
+        fields = parse_tree_line(line)
+        if fields is not None:
+            edges.append((fields[0], fields[3], {'delay': float(fields[5])}))
+    if not edges:
+        # Every tree file starts with the ROOT -> source user edge
+        edges.append(('ROOT', 'source', {'delay': 0.0}))
+    G.add_edges_from(edges)
+    return G
+
+
+class LatencyStats:
+    """
+    Thread-safe sliding window of latencies (seconds) with percentile summaries in milliseconds.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._values = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._values.append(seconds)
+            self.count += 1
+
+    def summary(self):
+        with self._lock:
+            values = np.array(self._values)
+        if not len(values):
+            return {'count': self.count}
+        p50, p99 = np.percentile(values, [50, 99]) * 1000
+        return {'count': self.count, 'p50_ms': float(p50), 'p99_ms': float(p99),
+                'mean_ms': float(values.mean() * 1000), 'max_ms': float(values.max() * 1000)}
+
+
+class MicroBatcher:
+    """
+    Collects concurrently submitted items into batches for one worker thread. A batch is processed
+    as soon as it has max_batch_size items or its first item has waited max_wait_ms, so a lone request
+    pays at most max_wait_ms extra while concurrent requests share one model call.
+    """
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=5.0):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items, futures = zip(*batch)
+            self.batch_sizes.append(len(batch))
+            try:
+                results = self.process_batch(list(items))
+            except Exception as error:
+                for future in futures:
+                    future.set_exception(error)
+                continue
+            for future, result in zip(futures, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class CascadePredictor:
+    """
+    Predicts the eventual cascade_size and cascade_depth of a source tweet from its text and an
+    optional partial retweet tree. The serving bundle (model and label encoders) and the content
+    models are loaded once; graph features are computed in the calling thread, and the sentiment,
+    emotion and regression models run on micro-batches of concurrent requests.
+    """
+
+    def __init__(self, model_path, backend='torch', cache_path=None, sentiment_mode='transformer',
+                 max_batch_size=32, max_wait_ms=5.0):
+        bundle = joblib.load(model_path)
+        self.model = bundle['model']
+        self.encoders = bundle['encoders']
+        self.feature_columns = bundle['feature_columns']
+        self.target_columns = bundle['target_columns']
+        self.info = {key: bundle[key] for key in ('dataset', 'experiment', 'params', 'metrics')}
+        self.backend = backend
+        self.cache_path = cache_path
+        self.sentiment_mode = sentiment_mode
+        self._cache = None
+        self.request_latency = LatencyStats()
+        self.content_latency = LatencyStats()
+        self.regressor_latency = LatencyStats()
+        self.errors = 0
+        self._batcher = MicroBatcher(self._predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    def _content_features(self, texts):
+        if self.cache_path and self._cache is None:
+            # SQLite connections stay in the thread that opened them, here the batcher thread
+            from inference_cache import InferenceCache
+            self._cache = InferenceCache(self.cache_path)
+        tweets = {str(i): text for i, text in enumerate(texts)}
+        return analyze_tweets(tweets, batch_size=len(texts), backend=self.backend, cache=self._cache,
+                              sentiment_mode=self.sentiment_mode)
+
+    def _predict_batch(self, items):
+        start = time.perf_counter()
+        content = self._content_features([text for text, _ in items])
+        self.content_latency.record(time.perf_counter() - start)
+
+        rows, results = [], [None] * len(items)
+        for i, ((_, graph_features), entry) in enumerate(zip(items, content)):
+            row = dict(graph_features, sentiment_score=entry['sentiment_score'])
+            try:
+                for column, encoder in self.encoders.items():
+                    row[column] = int(encoder.transform([entry[column]])[0])
+            except ValueError:
+                results[i] = ValueError(f"{column} {entry[column]!r} was not seen in training")
+                continue
+            rows.append((i, row, entry))
+
+        if rows:
+            start = time.perf_counter()
+            features = pd.DataFrame([row for _, row, _ in rows], columns=self.feature_columns)
+            predictions = np.atleast_2d(self.model.predict(features))
+            self.regressor_latency.record(time.perf_counter() - start)
+            for (i, row, entry), prediction in zip(rows, predictions):
+                result = {target: float(value) for target, value in zip(self.target_columns, prediction)}
+                result['features'] = dict(row, sentiment_label=entry['sentiment_label'], emotion_label=entry['emotion_label'])
+                results[i] = result
+        return results
+
+    def submit(self, text, tree_lines=None):
+        """
+        Compute the graph features and queue the request for the next micro-batch.
+        Returns:
+            Future: Resolves to the prediction dict.
+        """
+        features = {key: float(value) for key, value in extract_graph_features(tree_graph(tree_lines)).items()}
+        return self._batcher.submit((text, features))
+
+    def predict(self, text, tree_lines=None):
+        """
+        Predict one cascade.
+        Args:
+            text (str): Source tweet text.
+            tree_lines (list): Optional partial tree in the tree-file line format.
+        Returns:
+            dict: Predicted cascade_size and cascade_depth, plus the model input features.
+        """
+        return self.predict_many([{'text': text, 'tree': tree_lines}])[0]
+
+    def predict_many(self, requests):
+        """
+        Predict several cascades ({'text', 'tree'} dicts); they share micro-batches with concurrent callers.
+        """
+        start = time.perf_counter()
+        try:
+            futures = [self.submit(request['text'], request.get('tree')) for request in requests]
+            results = [future.result() for future in futures]
+        except Exception:
+            self.errors += 1
+            raise
+        self.request_latency.record(time.perf_counter() - start)
+        return results
+
+    def warmup(self):
+        """
+        Run one prediction so the content models are loaded before the first request is timed.
+        """
+        self.predict("warmup")
+        self.request_latency = LatencyStats()
+        self.content_latency = LatencyStats()
+        self.regressor_latency = LatencyStats()
+
+    def metrics(self):
+        batch_sizes = np.array(self._batcher.batch_sizes)
+        metrics = {
+            'model': self.info,
+            'requests': self.request_latency.summary(),
+            'content_batches': self.content_latency.summary(),
+            'regressor_batches': self.regressor_latency.summary(),
+            'mean_batch_size': float(batch_sizes.mean()) if len(batch_sizes) else None,
+            'errors': self.errors,
+        }
+        if self._cache is not None:
+            metrics['inference_cache'] = {'hits': self._cache.hits, 'misses': self._cache.misses}
+        return metrics
+
+    def close(self):
+        self._batcher.close()
+
+
+def make_handler(predictor):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        # Keep-alive connections, so load tests measure the service rather than TCP setup; without
+        # TCP_NODELAY the separately written headers and body stall on delayed ACKs
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(200, predictor.metrics())
+            elif self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send_json(404, {'error': f"Unknown path {self.path}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if 'instances' in payload:
+                    self._send_json(200, {'predictions': predictor.predict_many(payload['instances'])})
+                else:
+                    self._send_json(200, predictor.predict(payload['text'], payload.get('tree')))
+            except (KeyError, TypeError, ValueError) as error:
+                self._send_json(400, {'error': str(error)})
+            except Exception as error:
+                # Model or runtime failures still get a response instead of a dropped connection
+                self._send_json(500, {'error': f"{type(error).__name__}: {error}"})
+
+        def log_message(self, format, *args):
+            # One line per request would dominate the service's own latency under load
+            pass
+
+    return PredictionHandler
+
+
+def serve(predictor, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Serve POST /predict ({"text", "tree"} or {"instances": [...]}), GET /metrics and GET /health.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(predictor))
+    server.daemon_threads = True
+    print(f"Serving {predictor.info['dataset']} {predictor.info['experiment']} predictions on http://{host}:{port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        predictor.close()
+
+
+def load_test_requests(dataset_dir, limit=1000, max_edges=50, seed=42):
+    """
+    Requests built from a dataset's source tweets and the first edges of their trees, as a
+    partially observed cascade would arrive.
+    """
+    tweets = load_source_tweets(os.path.join(dataset_dir, "source_tweets.txt"))
+    rng = random.Random(seed)
+    requests = []
+    for tweet_id, text in list(tweets.items())[:limit]:
+        tree_file_path = os.path.join(dataset_dir, "tree", f"{tweet_id}.txt")
+        tree_lines = []
+        if os.path.exists(tree_file_path):
+            with open(tree_file_path, 'r') as file:
+                tree_lines = [line.strip() for _, line in zip(range(rng.randint(0, max_edges)), file)]
+        requests.append({'text': text, 'tree': tree_lines})
+    return requests
+
+
+def load_test(url, requests, num_requests=1000, concurrency=16):
+    """
+    Send num_requests single-cascade requests from concurrency keep-alive clients and report
+    client-side throughput and p50/p99 latency next to the service's own /metrics.
+    """
+    target = urlparse(url)
+    latencies = LatencyStats(window=num_requests)
+    counter = iter(range(num_requests))
+    lock = threading.Lock()
+    failures = []
+
+    def client():
+        connection = http.client.HTTPConnection(target.hostname, target.port)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = json.dumps(requests[i % len(requests)])
+            start = time.perf_counter()
+            try:
+                connection.request('POST', target.path or '/predict', body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as error:
+                # Count the request as failed and carry on with a fresh connection
+                failures.append(type(error).__name__)
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port)
+                continue
+            latencies.record(time.perf_counter() - start)
+            if response.status != 200:
+                failures.append(response.status)
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    connection = http.client.HTTPConnection(target.hostname, target.port)
+    connection.request('GET', '/metrics')
+    service_metrics = json.loads(connection.getresponse().read())
+    connection.close()
+
+    report = {'requests': num_requests, 'concurrency': concurrency, 'failures': len(failures),
+              'throughput_per_sec': num_requests / elapsed, 'client': latencies.summary(), 'service': service_metrics}
+    client_summary = report['client']
+    print(f"{num_requests} requests, concurrency {concurrency}: {report['throughput_per_sec']:.1f} req/s, "
+          f"p50 {client_summary['p50_ms']:.1f} ms, p99 {client_summary['p99_ms']:.1f} ms, "
+          f"mean batch size {service_metrics['mean_batch_size']}, {len(failures)} failures")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve cascade size/depth predictions in-process or over local HTTP.")
+    parser.add_argument('--export', action='store_true', help="Persist the serving bundle from the model_experiments cache")
+    parser.add_argument('--serve', action='store_true', help="Run the local HTTP endpoint")
+    parser.add_argument('--load-test', action='store_true', help="Send load to a running endpoint")
+    parser.add_argument('--dataset', default="Twitter16")
+    parser.add_argument('--experiment', default="random_forest")
+    parser.add_argument('--base-dir', default=".")
+    parser.add_argument('--model-dir', default=SERVING_MODEL_DIR)
+    parser.add_argument('--backend', choices=['torch', 'onnx'], default='torch')
+    parser.add_argument('--sentiment-mode', choices=['transformer', 'tiered'], default='transformer')
+    parser.add_argument('--cache', default=None, help="Optional inference cache path (see inference_cache.py)")
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--requests', type=int, default=1000, help="Load test: number of requests")
+    parser.add_argument('--concurrency', type=int, default=16, help="Load test: concurrent clients")
+    parser.add_argument('--load-test-data', default="rumor_detection_acl2017/twitter16", help="Load test: source_tweets.txt and tree/ directory")
+    parser.add_argument('--output', default=None, help="Load test: optional JSON report path")
+    args = parser.parse_args()
+
+    model_path = serving_model_path(args.dataset, args.experiment, args.model_dir)
+    if args.export or (args.serve and not os.path.exists(model_path)):
+        export_model(args.base_dir, args.dataset, args.experiment, model_dir=args.model_dir)
+    if args.serve:
+        configure_threads()
+        predictor = CascadePredictor(model_path, backend=args.backend, cache_path=args.cache, sentiment_mode=args.sentiment_mode,
+                                     max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        predictor.warmup()
+        serve(predictor, args.host, args.port)
+    if args.load_test:
+        report = load_test(f"http://{args.host}:{args.port}/predict", load_test_requests(args.load_test_data),
+                           num_requests=args.requests, concurrency=args.concurrency)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=4)
+            print(f"Load test report saved to {args.output}")
@@ -1,20 +1,54 @@
 # preprocess_data.py
 
 import os
-from data_loader import load_labels, load_source_tweets
+import json
+import time
+import shutil
+import argparse
+from data_loader import TREE_MANIFEST_FILE, load_labels, load_source_tweets
 
-def separate_data_by_labels(label_file_path, source_tweets_file_path, tree_files_path, output_dir):
+# 'manifest' only writes the tree manifest and downstream stages read the raw tree files through it;
+# 'hardlink' also fills the {label}_trees folders without copying any data; 'copy' duplicates the files
+TREE_MODES = ('manifest', 'hardlink', 'copy')
+
+def _place_tree_file(source_path, target_path, mode):
+    """
+    Hardlink or copy one tree file into a {label}_trees folder.
+    Returns:
+        str: 'hardlink' or 'copy', the way the file was actually placed.
+    """
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+    if mode == 'hardlink':
+        try:
+            os.link(source_path, target_path)
+            return 'hardlink'
+        except OSError:
+            # Different filesystem or no hardlink support: fall back to a copy
+            pass
+    shutil.copyfile(source_path, target_path)
+    return 'copy'
+
+def separate_data_by_labels(label_file_path, source_tweets_file_path, tree_files_path, output_dir, mode='hardlink'):
     """
     Separate data by labels and store them in specified directories.
+    A tree manifest (tweet ID -> label, tree file path relative to output_dir, size in bytes) is
+    always written; the tree files themselves are hardlinked or copied into {label}_trees folders,
+    or, in 'manifest' mode, left in place (see data_loader.list_label_trees).
     Args:
         label_file_path (str): Path to the label file.
         source_tweets_file_path (str): Path to the source tweets file.
         tree_files_path (str): Path to the directory containing tree files.
         output_dir (str): Directory to store the separated data.
+        mode (str): One of TREE_MODES.
+    Returns:
+        dict: Number of trees per placement ('manifest', 'hardlink' or 'copy'), missing trees and bytes.
     """
+    if mode not in TREE_MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {TREE_MODES}")
     labels = load_labels(label_file_path)
     source_tweets = load_source_tweets(source_tweets_file_path)
-    
+
     # Ensure the output directory exists
     os.makedirs(output_dir, exist_ok=True)
     print(f"Output directory {output_dir} created.")
@@ -33,23 +67,47 @@ def separate_data_by_labels(label_file_path, source_tweets_file_path, tree_files
                 if tweet_id in source_tweets:
                     file.write(f"{tweet_id}\t{source_tweets[tweet_id]}\n")
         print(f"Separated source tweets for {label}.")
-    
-    # Separate tree files
+
+    # Index the tree files, then place them
+    stats = {'manifest': 0, 'hardlink': 0, 'copy': 0, 'missing': 0, 'bytes': 0}
+    trees = {}
     for label, tweet_ids in labels.items():
         label_tree_dir = os.path.join(output_dir, f"{label}_trees")
-        os.makedirs(label_tree_dir, exist_ok=True)
+        if mode != 'manifest':
+            os.makedirs(label_tree_dir, exist_ok=True)
         for tweet_id in tweet_ids:
             tree_file_path = os.path.join(tree_files_path, f"{tweet_id}.txt")
-            if os.path.exists(tree_file_path):
-                os.system(f"cp {tree_file_path} {label_tree_dir}")
+            try:
+                size = os.stat(tree_file_path).st_size
+            except FileNotFoundError:
+                stats['missing'] += 1
+                continue
+            trees[tweet_id] = {'label': label, 'path': os.path.relpath(tree_file_path, output_dir), 'bytes': size}
+            stats['bytes'] += size
+            if mode == 'manifest':
+                stats['manifest'] += 1
+            else:
+                stats[_place_tree_file(tree_file_path, os.path.join(label_tree_dir, f"{tweet_id}.txt"), mode)] += 1
         print(f"Separated tree files for {label}.")
 
+    with open(os.path.join(output_dir, TREE_MANIFEST_FILE), 'w') as file:
+        json.dump({'tree_dir': os.path.relpath(tree_files_path, output_dir), 'trees': trees}, file, indent=1)
+
     print("Data separation complete. Check the output directory for separated files.")
+    return stats
 
 if __name__ == "__main__":
-    label_file_path = "rumor_detection_acl2017/twitter16/label.txt"
-    source_tweets_file_path = "rumor_detection_acl2017/twitter16/source_tweets.txt"
-    tree_files_path = "rumor_detection_acl2017/twitter16/tree"
-    output_dir = "processed_data16"
+    parser = argparse.ArgumentParser(description="Split a rumor_detection_acl2017 dataset by label.")
+    parser.add_argument('--label-file', default="rumor_detection_acl2017/twitter16/label.txt")
+    parser.add_argument('--source-tweets', default="rumor_detection_acl2017/twitter16/source_tweets.txt")
+    parser.add_argument('--tree-dir', default="rumor_detection_acl2017/twitter16/tree")
+    parser.add_argument('--output-dir', default="processed_data16")
+    parser.add_argument('--mode', choices=TREE_MODES, default='hardlink',
+                        help="How tree files reach {label}_trees: not at all (manifest only), hardlinked, or copied")
+    args = parser.parse_args()
 
-    separate_data_by_labels(label_file_path, source_tweets_file_path, tree_files_path, output_dir)
\ No newline at end of file
+    start = time.perf_counter()
+    stats = separate_data_by_labels(args.label_file, args.source_tweets, args.tree_dir, args.output_dir, mode=args.mode)
+    print(f"{stats['manifest'] + stats['hardlink'] + stats['copy']} tree files ({stats['bytes'] / 1e6:.1f} MB) indexed in "
+          f"{time.perf_counter() - start:.2f}s: {stats['hardlink']} hardlinked, {stats['copy']} copied, "
+          f"{stats['manifest']} read in place, {stats['missing']} missing")
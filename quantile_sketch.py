@@ -0,0 +1,116 @@
+# quantile_sketch.py
+
+import math
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# Magnitudes below this are counted as zero instead of getting a logarithmic bucket
+MIN_INDEXABLE_VALUE = 1e-12
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a relative-error guarantee, following DDSketch (Masson et al., 2019).
+    Values are counted in logarithmic buckets ((gamma^(i-1), gamma^i] with gamma = (1+a)/(1-a)), so any
+    quantile is returned within a relative error a of the true value. Two sketches with the same accuracy
+    merge by adding bucket counts, which lets per-cascade summaries be combined per label without keeping
+    every node value. Count, sum, min and max are tracked exactly.
+    """
+
+    __slots__ = ('relative_accuracy', 'gamma', '_log_gamma', 'positive', 'negative', 'zero_count',
+                 'count', 'sum', 'min', 'max')
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        """
+        Add an array (or list) of values in one vectorized step.
+        Returns:
+            QuantileSketch: self, for chaining.
+        """
+        values = np.asarray(values)
+        if values.size == 0:
+            return self
+        values = values.ravel()
+        self.count += values.size
+        self.sum += float(values.sum())
+        # .item() keeps integer metrics integral, as the per-file results had them
+        self.min = min(self.min, values.min().item())
+        self.max = max(self.max, values.max().item())
+        values = values.astype(np.float64, copy=False)
+        self.zero_count += int(np.count_nonzero(np.abs(values) < MIN_INDEXABLE_VALUE))
+        self._add_buckets(self.positive, values[values >= MIN_INDEXABLE_VALUE])
+        self._add_buckets(self.negative, -values[values <= -MIN_INDEXABLE_VALUE])
+        return self
+
+    def _add_buckets(self, buckets, magnitudes):
+        if len(magnitudes):
+            indices, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64), return_counts=True)
+            for index, count in zip(indices.tolist(), counts.tolist()):
+                buckets[index] = buckets.get(index, 0) + count
+
+    def merge(self, other):
+        """
+        Add another sketch's counts to this one. Both must use the same relative accuracy.
+        Returns:
+            QuantileSketch: self, for chaining.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracies")
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_buckets.items():
+                buckets[index] = buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def _buckets(self):
+        """
+        Representative values and counts of all buckets, in ascending value order.
+        """
+        negative_indices = np.array(sorted(self.negative, reverse=True), dtype=np.int64)
+        positive_indices = np.array(sorted(self.positive), dtype=np.int64)
+        scale = 2 / (self.gamma + 1)
+        values = np.concatenate([-scale * self.gamma ** negative_indices.astype(np.float64), [0.0],
+                                 scale * self.gamma ** positive_indices.astype(np.float64)])
+        counts = np.concatenate([[self.negative[i] for i in negative_indices.tolist()], [self.zero_count],
+                                 [self.positive[i] for i in positive_indices.tolist()]]).astype(np.int64)
+        return values, counts
+
+    def quantiles(self, qs):
+        """
+        Approximate quantiles for an array of fractions in [0, 1], clamped to the exact min and max.
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        values, counts = self._buckets()
+        ranks = qs * (self.count - 1)
+        positions = np.searchsorted(np.cumsum(counts), ranks, side='right')
+        return np.clip(values[np.minimum(positions, len(values) - 1)], self.min, self.max)
+
+    def histogram(self, edges):
+        """
+        Approximate counts per bin for the given bin edges, assigning each bucket to its representative value.
+        """
+        values, counts = self._buckets()
+        values = np.clip(values, self.min, self.max)
+        histogram, _ = np.histogram(values, bins=edges, weights=counts)
+        return histogram.astype(np.int64)
@@ -0,0 +1,214 @@
+# result_cache.py
+
+import os
+import json
+import pickle
+import hashlib
+import argparse
+import numpy as np
+import networkx as nx
+from parallel import run_parallel
+
+DEFAULT_CACHE_DIR = "result_cache"
+# Version of the code behind each namespace, part of every key. Bump 'graphs' when
+# save_graph.build_tree_network changes, and 'analysis' when analysis.analyze_graph,
+# centrality.compute_centralities or cascade_metrics.analyze_cascade change.
+RESULT_VERSIONS = {'graphs': 1, 'analysis': 1}
+LIBRARY_VERSIONS = {'numpy': np.__version__, 'networkx': nx.__version__}
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def arrays_digest(arrays):
+    """
+    SHA-256 of a cascade's edge columns (e.g. CascadeStore.arrays), in field order.
+    """
+    digest = hashlib.sha256()
+    for field in sorted(arrays):
+        digest.update(field.encode('utf-8'))
+        digest.update(arrays[field].tobytes())
+    return digest.hexdigest()
+
+
+def result_key(namespace, digest, config=None):
+    """
+    Key of one derived result: the namespace (what is computed) with its code version and the numpy and
+    networkx versions, the input's content digest and the options it is computed with. The key does not
+    involve dataset, label, tweet id or file name.
+    """
+    versions = dict(LIBRARY_VERSIONS, code=RESULT_VERSIONS[namespace])
+    payload = '\0'.join((namespace, json.dumps(versions, sort_keys=True), digest,
+                          json.dumps(config, sort_keys=True, default=str)))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk store of per-cascade results (built graphs, analysis results), one
+    pickle per key under cache_dir/namespace/. Identical cascades in other datasets, under other labels
+    or file names map to the same key, so they are built and analyzed once. Per-namespace counters
+    record hits (results from earlier runs), duplicates (repeats within a run) and misses.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.counters = {}
+
+    def path(self, namespace, key):
+        return os.path.join(self.cache_dir, namespace, key[:2], f"{key}.pkl")
+
+    def contains(self, namespace, key):
+        return os.path.exists(self.path(namespace, key))
+
+    def load(self, namespace, key):
+        with open(self.path(namespace, key), 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, namespace, key, value):
+        """
+        Pickle a result under its key. The file is written under a temporary name and renamed, so
+        readers in other processes never see a partial entry.
+        """
+        path = self.path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(temp_path, path)
+
+    def link(self, namespace, key, target_path):
+        """
+        Make target_path a hardlink to a cached entry (a copy when hardlinks are not possible).
+        """
+        if os.path.lexists(target_path):
+            os.remove(target_path)
+        try:
+            os.link(self.path(namespace, key), target_path)
+        except OSError:
+            with open(self.path(namespace, key), 'rb') as source, open(target_path, 'wb') as target:
+                target.write(source.read())
+
+    def record(self, namespace, hits=0, duplicates=0, misses=0, skipped_bytes=0):
+        counters = self.counters.setdefault(namespace, {'hits': 0, 'duplicates': 0, 'misses': 0, 'skipped_bytes': 0})
+        counters['hits'] += hits
+        counters['duplicates'] += duplicates
+        counters['misses'] += misses
+        counters['skipped_bytes'] += skipped_bytes
+
+    def report_to(self, metrics):
+        """
+        Add the hit rate of every namespace to a RunMetrics report; hits include in-run duplicates.
+        """
+        if metrics is None:
+            return
+        for namespace, counters in self.counters.items():
+            metrics.cache(f"results_{namespace}", counters['hits'] + counters['duplicates'], counters['misses'])
+
+    def entries(self):
+        """
+        Number of entries and their total size in bytes per namespace.
+        """
+        usage = {}
+        if not os.path.isdir(self.cache_dir):
+            return usage
+        for namespace in sorted(os.listdir(self.cache_dir)):
+            count = size = 0
+            for root, _, files in os.walk(os.path.join(self.cache_dir, namespace)):
+                for file_name in files:
+                    if file_name.endswith(".pkl"):
+                        count += 1
+                        size += os.path.getsize(os.path.join(root, file_name))
+            usage[namespace] = {'entries': count, 'bytes': size}
+        return usage
+
+
+def run_deduplicated(func, tasks, keys, cache, namespace, workers=1, sizes=None, stage_metrics=None, produces_file=False):
+    """
+    run_parallel over per-cascade tasks, computing every distinct key once and reusing cached results.
+    Tasks whose key is already cached are not run (hits), and only the first of several tasks with
+    the same key is run (the others are duplicates). Without a cache this is plain run_parallel.
+    Args:
+        func (callable): Module-level worker function, as for run_parallel.
+        tasks (list): (task_id, args) tuples.
+        keys (list): result_key of every task.
+        cache (ResultCache): Cache to read and fill; None runs every task.
+        namespace (str): Cache namespace of the results.
+        workers (int): Number of worker processes.
+        sizes (list): Optional cost estimate per task; also summed into the skipped_bytes counter.
+        stage_metrics (StageMetrics): Optional instrumentation stage; gets per-task timings of the tasks
+                                      that ran and 'cache_hits', 'duplicates' and 'skipped_bytes' counters.
+        produces_file (bool): func writes its entry itself: its last argument (the output path) is
+                              replaced by a path in the cache, and results are the entry's cache path.
+    Returns:
+        list: (task_id, result, error) tuples in task order, as run_parallel.
+    """
+    if cache is None:
+        return run_parallel(func, tasks, workers=workers, sizes=sizes, stage_metrics=stage_metrics)
+
+    seen = set()
+    pending, pending_keys, pending_sizes = [], [], []
+    hits = duplicates = skipped_bytes = 0
+    for i, ((task_id, args), key) in enumerate(zip(tasks, keys)):
+        size = sizes[i] if sizes is not None else 0
+        if key in seen:
+            duplicates += 1
+            skipped_bytes += size
+            continue
+        seen.add(key)
+        if cache.contains(namespace, key):
+            hits += 1
+            skipped_bytes += size
+            continue
+        if produces_file:
+            # Written under a temporary name and renamed once the task succeeded
+            os.makedirs(os.path.dirname(cache.path(namespace, key)), exist_ok=True)
+            args = args[:-1] + (f"{cache.path(namespace, key)}.tmp",)
+        pending.append((task_id, args))
+        pending_keys.append(key)
+        pending_sizes.append(size)
+
+    outcomes = run_parallel(func, pending, workers=workers, sizes=pending_sizes if sizes is not None else None,
+                            stage_metrics=stage_metrics)
+    computed, errors = {}, {}
+    for key, (_, result, error) in zip(pending_keys, outcomes):
+        if error is not None:
+            errors[key] = error
+        elif produces_file:
+            os.replace(f"{cache.path(namespace, key)}.tmp", cache.path(namespace, key))
+            computed[key] = cache.path(namespace, key)
+        else:
+            cache.store(namespace, key, result)
+            computed[key] = result
+    cache.record(namespace, hits=hits, duplicates=duplicates, misses=len(pending), skipped_bytes=skipped_bytes)
+    if stage_metrics is not None:
+        stage_metrics.count('cache_hits', hits)
+        stage_metrics.count('duplicates', duplicates)
+        stage_metrics.count('skipped_bytes', skipped_bytes)
+    print(f"{namespace}: {len(pending)} computed, {hits} from the result cache, {duplicates} duplicates within this run")
+
+    results = []
+    for (task_id, _), key in zip(tasks, keys):
+        if key in errors:
+            results.append((task_id, None, errors[key]))
+            continue
+        if key not in computed:
+            computed[key] = cache.path(namespace, key) if produces_file else cache.load(namespace, key)
+        results.append((task_id, computed[key], None))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the contents of the content-addressed result cache.")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    for namespace, usage in ResultCache(args.cache_dir).entries().items():
+        print(f"{namespace}: {usage['entries']} entries, {usage['bytes'] / 1e6:.1f} MB")
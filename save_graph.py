@@ -1,9 +1,12 @@
 # save_graph.py
 
 import os
+import argparse
 import networkx as nx
 import pickle
-from data_loader import parse_tree_file
+from data_loader import list_label_trees, load_tree_manifest, parse_tree_file
+from result_cache import DEFAULT_CACHE_DIR, ResultCache, file_digest, result_key, run_deduplicated
+from instrumentation import add_arguments, from_arguments, stage
 
 def build_tree_network(tree_file_path):
     """
@@ -16,8 +19,6 @@ def build_tree_network(tree_file_path):
     G = nx.DiGraph()
     edges = parse_tree_file(tree_file_path)
     G.add_edges_from(edges)
-    
-    print(f"Built network for tree file {tree_file_path} with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges.")
     return G
 
 def save_graph(G, output_path):
@@ -27,30 +28,75 @@ def save_graph(G, output_path):
         G (nx.DiGraph): Directed graph to save.
         output_path (str): Path to save the graph.
     """
-    with open(output_path, 'wb') as f:
+    # Replace the file instead of writing into it: graph files may be hardlinks into the result cache
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
         pickle.dump(G, f)
-    print(f"Graph saved to {output_path}")
+    os.replace(temp_path, output_path)
 
-def process_directory(input_dir, output_dir):
+def build_and_save_graph(tree_file_path, output_path):
+    """
+    Build the graph for one tree file and save it; used as the per-cascade worker task.
+    Args:
+        tree_file_path (str): Path to the tree file.
+        output_path (str): Path to save the graph.
+    """
+    G = build_tree_network(tree_file_path)
+    save_graph(G, output_path)
+    return output_path
+
+def process_directory(input_dir, output_dir, workers=1, metrics=None, label=None, tree_files=None, cache=None):
     """
     Process all tree files in the input directory and save the graphs to the output directory.
     Args:
         input_dir (str): Directory containing tree files.
         output_dir (str): Directory to save the graphs.
+        workers (int): Number of worker processes to build graphs with.
+        metrics (RunMetrics): Optional instrumentation; records the per-cascade build times.
+        label (str): Label of the directory, used to name the instrumentation stage.
+        tree_files (list): Optional (tweet_id, path) tuples to process instead of listing input_dir
+                           (see data_loader.list_label_trees).
+        cache (ResultCache): Optional result cache. Every distinct tree file content is built once, and
+                             the graph files are hardlinks to the cached graphs.
     """
     os.makedirs(output_dir, exist_ok=True)
-    for tree_file in os.listdir(input_dir):
-        if tree_file.endswith(".txt"):
-            tree_file_path = os.path.join(input_dir, tree_file)
-            G = build_tree_network(tree_file_path)
-            output_path = os.path.join(output_dir, tree_file.replace('.txt', '.pkl'))
-            save_graph(G, output_path)
+    if tree_files is None:
+        tree_files = [(tree_file.replace('.txt', ''), os.path.join(input_dir, tree_file))
+                      for tree_file in os.listdir(input_dir) if tree_file.endswith(".txt")]
+    tasks, sizes = [], []
+    for tweet_id, tree_file_path in tree_files:
+        output_path = os.path.join(output_dir, f"{tweet_id}.pkl")
+        tasks.append((tweet_id, (tree_file_path, output_path)))
+        sizes.append(os.path.getsize(tree_file_path))
+    with stage(metrics, 'build_graphs', label=label or os.path.basename(input_dir)) as build_stage:
+        keys = [result_key('graphs', file_digest(args[0])) for _, args in tasks] if cache is not None else None
+        results = run_deduplicated(build_and_save_graph, tasks, keys, cache, 'graphs', workers=workers, sizes=sizes,
+                                   stage_metrics=build_stage, produces_file=True)
+        if cache is not None:
+            for (tweet_id, (_, output_path)), key, (_, _, error) in zip(tasks, keys, results):
+                if error is None:
+                    cache.link('graphs', key, output_path)
+        build_stage.count('input_bytes', sum(sizes))
+    return results
 
 if __name__ == "__main__":
-    base_input_dir = "processed_data16"
-    base_output_dir = "graphs16"
+    parser = argparse.ArgumentParser(description="Build and pickle a graph for every tree file.")
+    parser.add_argument('--input-dir', default="processed_data16")
+    parser.add_argument('--output-dir', default="graphs16")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    parser.add_argument('--result-cache', default=DEFAULT_CACHE_DIR, help="Content-addressed cache of built graphs, shared across datasets")
+    parser.add_argument('--no-result-cache', action='store_true', help="Build every graph, even if an identical tree was built before")
+    add_arguments(parser, 'save_graph')
+    args = parser.parse_args()
+    metrics = from_arguments('save_graph', args)
+    cache = None if args.no_result_cache else ResultCache(args.result_cache)
 
+    manifest = load_tree_manifest(args.input_dir)
     for label in ['true', 'false', 'unverified', 'non-rumor']:
-        input_dir = os.path.join(base_input_dir, f"{label}_trees")
-        output_dir = os.path.join(base_output_dir, f"{label}_graphs")
-        process_directory(input_dir, output_dir)
\ No newline at end of file
+        input_dir = os.path.join(args.input_dir, f"{label}_trees")
+        output_dir = os.path.join(args.output_dir, f"{label}_graphs")
+        process_directory(input_dir, output_dir, workers=args.workers, metrics=metrics, label=label,
+                          tree_files=list_label_trees(args.input_dir, label, manifest), cache=cache)
+    if cache is not None:
+        cache.report_to(metrics)
+    metrics.write(args.metrics_output)
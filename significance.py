@@ -0,0 +1,253 @@
+# significance.py
+
+import os
+import time
+import argparse
+import itertools
+import numpy as np
+from analysis import aggregate_results
+from parallel import run_parallel
+
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+DEFAULT_RESAMPLES = 20000
+DEFAULT_CONFIDENCE = 0.95
+# Resamples drawn per array operation; peak memory is a few times chunk_size * cascades * 8 bytes
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def label_matrices(aggregated_results):
+    """
+    One value per cascade for every metric and label. Scalar metrics are used as they are; list
+    metrics (per-node distributions) are reduced to their per-cascade mean, because node values of
+    one cascade are not independent observations.
+    Args:
+        aggregated_results (dict): Output of analysis.aggregate_results.
+    Returns:
+        tuple: (list of metric names, dict label -> array of shape (cascades, metrics) with NaN where
+               a cascade has no numeric value for a metric)
+    """
+    columns = {}
+    for metric in aggregated_results['true'][0].keys():
+        by_label = {}
+        for label in LABELS:
+            values = []
+            for result in aggregated_results.get(label, []):
+                value = result.get(metric)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values.append(value)
+                elif isinstance(value, list) and value:
+                    values.append(np.mean(value))
+                else:
+                    values.append(np.nan)
+            by_label[label] = np.asarray(values, dtype=np.float64)
+        pooled = np.concatenate(list(by_label.values()))
+        # Metrics that never vary (e.g. the error bound of exact centralities) carry no signal
+        if np.any(~np.isnan(pooled)) and np.nanmax(pooled) > np.nanmin(pooled):
+            columns[metric] = by_label
+    metrics = list(columns)
+    matrices = {label: np.column_stack([columns[metric][label] for metric in metrics]) if metrics else np.empty((0, 0))
+                for label in LABELS if aggregated_results.get(label)}
+    return metrics, matrices
+
+
+def _weighted_sums(weights, values, present):
+    """
+    Sums and counts of every metric (column) under each row of weights, skipping missing values.
+    """
+    return weights @ values, weights @ present
+
+
+def _divide(sums, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def bootstrap_means(matrix, resamples, rng, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Per-metric means of `resamples` bootstrap resamples of the cascades (rows) of matrix. Each chunk
+    draws chunk_size resamples at once as a matrix of per-cascade multiplicities, shared by all metrics.
+    Returns:
+        np.ndarray: Shape (resamples, metrics).
+    """
+    n = len(matrix)
+    present = (~np.isnan(matrix)).astype(np.float64)
+    values = np.nan_to_num(matrix)
+    means = np.empty((resamples, matrix.shape[1]))
+    for start in range(0, resamples, chunk_size):
+        count = min(chunk_size, resamples - start)
+        indices = rng.integers(0, n, size=(count, n)) + np.arange(count)[:, None] * n
+        weights = np.bincount(indices.ravel(), minlength=count * n).reshape(count, n).astype(np.float64)
+        means[start:start + count] = _divide(*_weighted_sums(weights, values, present))
+    return means
+
+
+def permutation_differences(a, b, resamples, rng, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Per-metric differences in means between the cascades relabeled as a and the rest, over random
+    relabelings of the pooled cascades. Each chunk draws chunk_size membership rows at once.
+    Returns:
+        np.ndarray: Shape (resamples, metrics).
+    """
+    pooled = np.concatenate([a, b])
+    present = (~np.isnan(pooled)).astype(np.float64)
+    values = np.nan_to_num(pooled)
+    total_sums, total_counts = values.sum(axis=0), present.sum(axis=0)
+    differences = np.empty((resamples, pooled.shape[1]))
+    for start in range(0, resamples, chunk_size):
+        count = min(chunk_size, resamples - start)
+        # The len(a) smallest of uniform random keys form a uniformly random relabeling; a partition
+        # finds them in linear time per row, which is cheaper than shuffling every row
+        keys = rng.random((count, len(pooled)))
+        threshold = np.partition(keys, len(a) - 1, axis=1)[:, len(a) - 1:len(a)]
+        in_a = (keys <= threshold).astype(np.float64)
+        sums_a, counts_a = _weighted_sums(in_a, values, present)
+        differences[start:start + count] = _divide(sums_a, counts_a) - _divide(total_sums - sums_a, total_counts - counts_a)
+    return differences
+
+
+def bootstrap_label(matrix, resamples=DEFAULT_RESAMPLES, seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Worker task: bootstrap means of one label, shared by every pair the label takes part in.
+    """
+    return bootstrap_means(matrix, resamples, np.random.default_rng(seed), chunk_size)
+
+
+def permutation_test(a, b, resamples=DEFAULT_RESAMPLES, seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Worker task: two-sided permutation p-values of the difference in means of every metric between
+    two labels, using the add-one estimate so that a finite test never reports exactly zero.
+    """
+    null = permutation_differences(a, b, resamples, np.random.default_rng(seed), chunk_size)
+    observed = np.nanmean(a, axis=0) - np.nanmean(b, axis=0)
+    # Rounding can make a relabeling that equals the observed split differ in the last bits
+    extreme = np.abs(null) >= np.abs(observed) * (1 - 1e-12)
+    return (np.count_nonzero(extreme, axis=0) + 1) / (resamples + 1)
+
+
+def summarize_pair(metrics, label_a, label_b, a, b, means_a, means_b, p_values, confidence=DEFAULT_CONFIDENCE):
+    """
+    Combine the bootstrap means and permutation p-values of two labels into one result per metric.
+    Returns:
+        list: One dict per metric with the means, their bootstrap intervals, the difference with its
+              interval and the permutation p-value.
+    """
+    alpha = (1 - confidence) / 2
+    observed_a, observed_b = np.nanmean(a, axis=0), np.nanmean(b, axis=0)
+    mean_ci_a = np.nanquantile(means_a, [alpha, 1 - alpha], axis=0)
+    mean_ci_b = np.nanquantile(means_b, [alpha, 1 - alpha], axis=0)
+    difference_ci = np.nanquantile(means_a - means_b, [alpha, 1 - alpha], axis=0)
+    results = []
+    for i, metric in enumerate(metrics):
+        n_a, n_b = int(np.count_nonzero(~np.isnan(a[:, i]))), int(np.count_nonzero(~np.isnan(b[:, i])))
+        if not n_a or not n_b:
+            continue
+        results.append({
+            'metric': metric,
+            'labels': [label_a, label_b],
+            'n': [n_a, n_b],
+            'mean': [float(observed_a[i]), float(observed_b[i])],
+            'mean_ci': [mean_ci_a[:, i].tolist(), mean_ci_b[:, i].tolist()],
+            'difference': float(observed_a[i] - observed_b[i]),
+            'difference_ci': difference_ci[:, i].tolist(),
+            'p_value': float(p_values[i]),
+        })
+    return results
+
+
+def holm_adjust(p_values):
+    """
+    Holm-Bonferroni adjusted p-values, controlling the family-wise error rate over all tests.
+    """
+    p_values = np.asarray(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate(p_values[order] * (len(p_values) - np.arange(len(p_values))))
+    result = np.empty_like(adjusted)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def run_significance_tests(aggregated_results, resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE,
+                           seed=42, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Test every metric for every pair of labels. Every label is bootstrapped once and every pair gets
+    one permutation test; each of these tasks covers all metrics at once and can run on a worker.
+    Args:
+        aggregated_results (dict): Output of analysis.aggregate_results.
+        resamples (int): Bootstrap and permutation resamples per test.
+        confidence (float): Confidence level of the bootstrap intervals.
+        seed (int): Base seed.
+        workers (int): Worker processes (see parallel.run_parallel).
+        chunk_size (int): Resamples per array operation.
+    Returns:
+        list: One result dict per (metric, label pair), with Holm-adjusted p-values.
+    """
+    metrics, matrices = label_matrices(aggregated_results)
+    labels = list(matrices)
+    pairs = list(itertools.combinations(labels, 2))
+    # Independent streams per task, derived from (seed, task index), so results do not depend on the workers
+    seeds = np.random.SeedSequence(seed).generate_state(len(labels) + len(pairs))
+
+    bootstrap_tasks = [(label, (matrices[label], resamples, seeds[i], chunk_size)) for i, label in enumerate(labels)]
+    bootstraps = {label: means for label, means, error in
+                  run_parallel(bootstrap_label, bootstrap_tasks, workers=workers, sizes=[len(matrices[label]) for label in labels])}
+    permutation_tasks = [(f"{label_a}/{label_b}", (matrices[label_a], matrices[label_b], resamples, seeds[len(labels) + i], chunk_size))
+                         for i, (label_a, label_b) in enumerate(pairs)]
+    p_values = [p for _, p, error in run_parallel(permutation_test, permutation_tasks, workers=workers,
+                                                  sizes=[len(matrices[a]) + len(matrices[b]) for a, b in pairs])]
+
+    pair_results = []
+    for (label_a, label_b), pair_p_values in zip(pairs, p_values):
+        if pair_p_values is None or bootstraps[label_a] is None or bootstraps[label_b] is None:
+            continue
+        pair_results.extend(summarize_pair(metrics, label_a, label_b, matrices[label_a], matrices[label_b],
+                                           bootstraps[label_a], bootstraps[label_b], pair_p_values, confidence))
+    # Group by metric, then label pair, like the comparison results file
+    results = sorted(pair_results, key=lambda result: metrics.index(result['metric']))
+    for result, adjusted in zip(results, holm_adjust([result['p_value'] for result in results])):
+        result['p_value_holm'] = float(adjusted)
+    return results
+
+
+def significance_output_path(comparison_output):
+    root, extension = os.path.splitext(comparison_output)
+    return f"{root}_significance{extension or '.txt'}"
+
+
+def save_significance_results(results, output_path, confidence=DEFAULT_CONFIDENCE):
+    """
+    Save test results in the layout of the comparison results file.
+    """
+    level = f"{confidence:.0%}"
+    with open(output_path, 'w') as file:
+        for metric, metric_results in itertools.groupby(results, key=lambda result: result['metric']):
+            file.write(f"Metric: {metric}\n")
+            for result in metric_results:
+                label_a, label_b = result['labels']
+                file.write(f"  {label_a} vs {label_b}:\n")
+                for label, n, mean, (low, high) in zip(result['labels'], result['n'], result['mean'], result['mean_ci']):
+                    file.write(f"    Mean {label}: {mean} ({level} CI {low} to {high}, n={n})\n")
+                low, high = result['difference_ci']
+                file.write(f"    Difference: {result['difference']} ({level} CI {low} to {high})\n")
+                file.write(f"    Permutation p-value: {result['p_value']}\n")
+                file.write(f"    Holm-adjusted p-value: {result['p_value_holm']}\n")
+    print(f"Significance results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap intervals and permutation tests between labels for every analysis metric.")
+    parser.add_argument('--output-dir', default="analysis_results16", help="Analysis results (see analysis.aggregate_results)")
+    parser.add_argument('--comparison-output', default="comparison_results16.txt",
+                        help="Comparison file; results are written next to it as <name>_significance.txt")
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES)
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Resamples per array operation")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    aggregated_results = aggregate_results(args.output_dir)
+    results = run_significance_tests(aggregated_results, resamples=args.resamples, confidence=args.confidence,
+                                     seed=args.seed, workers=args.workers, chunk_size=args.chunk_size)
+    print(f"Ran {len(results)} tests with {args.resamples} resamples each in {time.perf_counter() - start:.2f}s")
+    save_significance_results(results, significance_output_path(args.comparison_output), confidence=args.confidence)
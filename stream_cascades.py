@@ -0,0 +1,254 @@
+# stream_cascades.py
+
+import sys
+import json
+import math
+import time
+import argparse
+from collections import OrderedDict
+from tree_parser import parse_tree_line
+
+
+class CascadeState:
+    """
+    Incrementally maintained metrics of one cascade. Each retweet event (uid, tweet_id) is a node;
+    an event that arrives again under another parent keeps its first parent, as in cascade_metrics.
+    """
+
+    __slots__ = ('cascade_id', 'event_depth', 'level_counts', 'edges', 'duplicates',
+                 'delay_count', 'delay_mean', 'delay_m2', 'delay_min', 'delay_max', 'last_update')
+
+    def __init__(self, cascade_id):
+        self.cascade_id = cascade_id
+        self.event_depth = {}
+        self.level_counts = []
+        self.edges = 0
+        self.duplicates = 0
+        self.delay_count = 0
+        self.delay_mean = 0.0
+        self.delay_m2 = 0.0
+        self.delay_min = math.inf
+        self.delay_max = -math.inf
+        self.last_update = 0.0
+
+    def add_event(self, event, depth, delay):
+        self.event_depth[event] = depth
+        if depth > len(self.level_counts):
+            self.level_counts.append(0)
+        self.level_counts[depth - 1] += 1
+        # Welford's online mean/variance
+        self.delay_count += 1
+        difference = delay - self.delay_mean
+        self.delay_mean += difference / self.delay_count
+        self.delay_m2 += difference * (delay - self.delay_mean)
+        self.delay_min = min(self.delay_min, delay)
+        self.delay_max = max(self.delay_max, delay)
+
+    def snapshot(self, final=False):
+        """
+        Current metrics, using the key names of analysis.analyze_graph / cascade_metrics where they exist.
+        """
+        count = self.delay_count
+        return {
+            'cascade_id': self.cascade_id,
+            'cascade_size': len(self.event_depth),
+            'tree_depth': len(self.level_counts),
+            'max_breadth': max(self.level_counts) if self.level_counts else 0,
+            'breadth_per_level': list(self.level_counts),
+            'edges_seen': self.edges,
+            'duplicate_edges': self.duplicates,
+            'propagation_delay_min': self.delay_min if count else None,
+            'propagation_delay_mean': self.delay_mean if count else None,
+            'propagation_delay_max': self.delay_max if count else None,
+            'propagation_delay_std': math.sqrt(self.delay_m2 / count) if count else None,
+            'final': final,
+        }
+
+
+class CascadeTracker:
+    """
+    Maintains per-cascade state from a stream of tree-format edges in O(1) amortized time per edge.
+    Edges are routed to cascades through an index of every live event; a 'ROOT' edge starts a cascade
+    keyed by the source tweet id, and an edge whose parent is unknown starts one keyed by the parent's
+    tweet id. Cascades with no edge for idle_timeout seconds, or beyond max_cascades (least recently
+    updated first), are evicted together with their events, which keeps memory bounded.
+    """
+
+    def __init__(self, idle_timeout=3600.0, max_cascades=100000, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.max_cascades = max_cascades
+        self.clock = clock
+        self.cascades = OrderedDict()
+        self.event_index = {}
+        self.dirty = set()
+        self.evicted = []
+        self.edges = 0
+
+    def _cascade(self, cascade_id, now):
+        state = self.cascades.get(cascade_id)
+        if state is None:
+            state = self.cascades[cascade_id] = CascadeState(cascade_id)
+        else:
+            self.cascades.move_to_end(cascade_id)
+        state.last_update = now
+        return state
+
+    def add_edge(self, fields, cascade_id=None):
+        """
+        Apply one edge.
+        Args:
+            fields (list): Edge fields as returned by tree_parser.parse_tree_line.
+            cascade_id (str): Optional explicit cascade id (e.g. from a "cascade_id<TAB>edge" line).
+        """
+        # Delays are parsed first so a malformed edge raises ValueError before any state changes
+        parent_delay = float(fields[2])
+        delay = float(fields[5])
+        now = self.clock()
+        self.edges += 1
+        parent = (fields[0], fields[1])
+        child = (fields[3], fields[4])
+
+        if cascade_id is None:
+            if fields[0] == 'ROOT':
+                cascade_id = fields[4]
+            else:
+                cascade_id = self.event_index.get(parent, fields[1])
+        state = self._cascade(cascade_id, now)
+        state.edges += 1
+        self.dirty.add(cascade_id)
+
+        if fields[0] == 'ROOT':
+            parent_depth = 0
+        else:
+            parent_depth = state.event_depth.get(parent)
+            if parent_depth is None:
+                # Unknown parent: it becomes a source event of this cascade
+                parent_depth = 1
+                state.add_event(parent, parent_depth, parent_delay)
+                self.event_index[parent] = cascade_id
+
+        if child == parent or child in state.event_depth:
+            state.duplicates += 1
+        else:
+            state.add_event(child, parent_depth + 1, delay)
+            self.event_index[child] = cascade_id
+
+        if len(self.cascades) > self.max_cascades:
+            self._evict(next(iter(self.cascades)))
+
+    def _evict(self, cascade_id):
+        state = self.cascades.pop(cascade_id)
+        for event in state.event_depth:
+            if self.event_index.get(event) == cascade_id:
+                del self.event_index[event]
+        self.dirty.discard(cascade_id)
+        self.evicted.append(state.snapshot(final=True))
+
+    def evict_idle(self):
+        """
+        Evict cascades that have been quiet for longer than idle_timeout.
+        Cascades are kept in update order, so only the idle prefix is visited.
+        """
+        now = self.clock()
+        while self.cascades:
+            cascade_id, state = next(iter(self.cascades.items()))
+            if now - state.last_update <= self.idle_timeout:
+                break
+            self._evict(cascade_id)
+
+    def drain_snapshots(self):
+        """
+        Snapshots of cascades updated since the last call, followed by final snapshots of evicted cascades.
+        """
+        snapshots = [self.cascades[cascade_id].snapshot() for cascade_id in self.dirty]
+        snapshots.extend(self.evicted)
+        self.dirty = set()
+        self.evicted = []
+        return snapshots
+
+
+def follow(file, poll_interval=0.5):
+    """
+    Yield lines from a file that keeps growing, like tail -f. Partial lines are held back until complete.
+    """
+    buffer = ''
+    while True:
+        chunk = file.readline()
+        if not chunk:
+            yield None
+            time.sleep(poll_interval)
+            continue
+        buffer += chunk
+        if buffer.endswith('\n'):
+            yield buffer
+            buffer = ''
+
+
+def run_stream(lines, tracker, output, snapshot_every=1000, snapshot_interval=5.0):
+    """
+    Consume edge lines and write JSON-lines metric snapshots on a cadence.
+    Malformed lines are skipped; whenever their count has grown, a {"skipped_lines": N, "last_error": ...}
+    line is written with the snapshots.
+    Args:
+        lines (iterable): Edge lines; None items signal that the input is idle (see follow).
+        tracker (CascadeTracker): Tracker to update.
+        output (file): Where snapshot JSON lines are written.
+        snapshot_every (int): Emit snapshots after this many edges.
+        snapshot_interval (float): Emit snapshots at least this often, in seconds.
+    Returns:
+        int: Number of skipped malformed lines.
+    """
+    skipped = {'lines': 0, 'reported': 0, 'last_error': None}
+
+    def emit():
+        tracker.evict_idle()
+        for snapshot in tracker.drain_snapshots():
+            output.write(json.dumps(snapshot) + '\n')
+        if skipped['lines'] > skipped['reported']:
+            output.write(json.dumps({'skipped_lines': skipped['lines'], 'last_error': skipped['last_error']}) + '\n')
+            skipped['reported'] = skipped['lines']
+        output.flush()
+
+    last_emit = time.monotonic()
+    edges_since_emit = 0
+    for line in lines:
+        if line is not None:
+            cascade_id = None
+            if '\t' in line:
+                cascade_id, line = line.split('\t', 1)
+            try:
+                fields = parse_tree_line(line)
+                if fields is not None:
+                    tracker.add_edge(fields, cascade_id=cascade_id)
+                    edges_since_emit += 1
+            except ValueError as e:
+                # One bad line must not stop a long-running consumer and drop the cascades in memory
+                skipped['lines'] += 1
+                skipped['last_error'] = str(e)
+        if edges_since_emit >= snapshot_every or time.monotonic() - last_emit >= snapshot_interval:
+            emit()
+            last_emit = time.monotonic()
+            edges_since_emit = 0
+    emit()
+    return skipped['lines']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain cascade metrics online from a stream of parent->child edges.")
+    parser.add_argument('--input', default=None, help="Edge file to read (stdin when omitted)")
+    parser.add_argument('--follow', action='store_true', help="Keep reading as the input file grows")
+    parser.add_argument('--output', default=None, help="File for JSON-lines snapshots (stdout when omitted)")
+    parser.add_argument('--snapshot-every', type=int, default=1000, help="Edges between snapshots")
+    parser.add_argument('--snapshot-interval', type=float, default=5.0, help="Seconds between snapshots")
+    parser.add_argument('--idle-timeout', type=float, default=3600.0, help="Seconds of silence before a cascade is evicted")
+    parser.add_argument('--max-cascades', type=int, default=100000, help="Maximum number of cascades kept in memory")
+    args = parser.parse_args()
+
+    input_file = open(args.input, 'r') if args.input else sys.stdin
+    output_file = open(args.output, 'a') if args.output else sys.stdout
+    lines = follow(input_file) if args.follow else input_file
+    tracker = CascadeTracker(idle_timeout=args.idle_timeout, max_cascades=args.max_cascades)
+    try:
+        run_stream(lines, tracker, output_file, snapshot_every=args.snapshot_every, snapshot_interval=args.snapshot_interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,38 @@
+# tests/test_cascade_metrics.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+
+from cascade_metrics import analyze_cascade, build_event_tree, node_names
+from tree_parser import parse_tree_arrays
+
+
+def test_parent_only_event_hangs_off_root(tmp_path):
+    tree_file = tmp_path / "1.txt"
+    tree_file.write_text(
+        "['ROOT', 'ROOT', '0.0']->['1', '1', '0.0']\n"
+        "['1', '1', '0.0']->['2', '1', '1.0']\n"
+        "['7', '1', '2.0']->['8', '1', '3.0']\n"
+    )
+    arrays = parse_tree_arrays(str(tree_file))
+    tree = build_event_tree(arrays)
+
+    names = node_names(tree)
+    parents = {names[i]: names[p] for i, p in enumerate(tree['parent'].tolist()) if i > 0}
+    assert parents == {'1:1': 'ROOT', '2:1': '1:1', '7:1': 'ROOT', '8:1': '7:1'}
+    assert (tree['depth'] >= 0).all()
+    assert tree['subtree_size'][0] == len(names)
+    assert tree['num_children'][0] == 2
+    assert tree['discarded_edges'] == 0
+    # The attachment of '7:1' to ROOT is not an input edge, so its delay is unknown
+    assert math.isnan(tree['delay'][names.index('7:1')])
+
+    results = analyze_cascade(arrays)
+    assert results['discarded_edges'] == 0
+    assert results['propagation_delay_min'] == 0.0
+    assert results['propagation_delay_mean'] == (0.0 + 1.0 + 3.0) / 3
+    assert results['propagation_delay_max'] == 3.0
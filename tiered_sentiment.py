@@ -0,0 +1,142 @@
+# tiered_sentiment.py
+
+import os
+import json
+import time
+import argparse
+
+# Compound VADER scores strictly inside this band are escalated to the transformer
+DEFAULT_BAND = (-0.5, 0.5)
+
+_analyzer = None
+
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def lexicon_sentiment(texts):
+    """
+    Score texts with the VADER lexicon.
+    The compound score in [-1, 1] is mapped onto the transformer's POSITIVE/NEGATIVE labels, with
+    score = (1 + |compound|) / 2 so that it reads like the transformer's top-class probability.
+    Args:
+        texts (list): Texts to score.
+    Returns:
+        list: {'label', 'score', 'compound'} dicts in input order.
+    """
+    analyzer = _get_analyzer()
+    predictions = []
+    for text in texts:
+        compound = analyzer.polarity_scores(text)['compound']
+        predictions.append({
+            'label': 'POSITIVE' if compound >= 0 else 'NEGATIVE',
+            'score': (1 + abs(compound)) / 2,
+            'compound': compound,
+        })
+    return predictions
+
+
+def escalation_mask(lexicon_predictions, band=DEFAULT_BAND):
+    """
+    Which texts the lexicon is unsure about: compound score strictly inside the band.
+    """
+    low, high = band
+    return [low < prediction['compound'] < high for prediction in lexicon_predictions]
+
+
+def classify_tiered(texts, band=DEFAULT_BAND, stats=None, **transformer_kwargs):
+    """
+    Tiered sentiment classification: VADER for every text, the transformer only for texts whose
+    lexicon score falls inside the ambiguity band.
+    Args:
+        texts (list): Texts to classify.
+        band (tuple): (low, high) compound-score band that triggers escalation.
+        stats (dict): Optional counters updated with 'lexicon' and 'escalated' text counts.
+        **transformer_kwargs: Passed to inference_engine.classify_cached (batch_size, workers, backend, cache).
+    Returns:
+        list: {'label', 'score'} dicts in input order.
+    """
+    from inference_engine import SENTIMENT_MODEL, classify_cached
+    lexicon_predictions = lexicon_sentiment(texts)
+    escalate = escalation_mask(lexicon_predictions, band)
+    escalated = [i for i, flag in enumerate(escalate) if flag]
+    predictions = [{'label': p['label'], 'score': p['score']} for p in lexicon_predictions]
+    if escalated:
+        transformer_predictions = classify_cached([texts[i] for i in escalated], SENTIMENT_MODEL, **transformer_kwargs)
+        for i, prediction in zip(escalated, transformer_predictions):
+            predictions[i] = prediction
+    if stats is not None:
+        stats['lexicon'] = stats.get('lexicon', 0) + len(texts) - len(escalated)
+        stats['escalated'] = stats.get('escalated', 0) + len(escalated)
+    return predictions
+
+
+def load_reference_results(results_dirs):
+    """
+    Load full-transformer sentiment results (*_sentiment_emotion_analysis.json) as the reference.
+    Args:
+        results_dirs (list): content_analysis_results_* directories.
+    Returns:
+        list: (content, sentiment_label) pairs.
+    """
+    reference = []
+    for results_dir in results_dirs:
+        for label in ['true', 'false', 'unverified', 'non-rumor']:
+            file_path = os.path.join(results_dir, label, f"{label}_sentiment_emotion_analysis.json")
+            if os.path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    reference.extend((entry['content'], entry['sentiment_label']) for entry in json.load(f))
+    return reference
+
+
+def evaluate_bands(results_dirs, bands, transformer_tweets_per_sec=None):
+    """
+    Report escalation rate, agreement with the full-transformer output and throughput per band.
+    Escalated tweets take the transformer's label, so only lexicon-handled tweets can disagree.
+    Args:
+        results_dirs (list): content_analysis_results_* directories holding the transformer output.
+        bands (list): (low, high) bands to evaluate.
+        transformer_tweets_per_sec (float): Measured transformer sentiment throughput; when given, the
+            end-to-end tiered throughput is estimated from it.
+    Returns:
+        list: One report dict per band.
+    """
+    reference = load_reference_results(results_dirs)
+    texts = [content for content, _ in reference]
+    start = time.perf_counter()
+    lexicon_predictions = lexicon_sentiment(texts)
+    lexicon_seconds = time.perf_counter() - start
+    print(f"VADER scored {len(texts)} tweets at {len(texts) / lexicon_seconds:,.0f} tweets/sec")
+
+    reports = []
+    for band in bands:
+        escalate = escalation_mask(lexicon_predictions, band)
+        escalation_rate = sum(escalate) / len(texts)
+        agreement = sum(flag or prediction['label'] == label
+                        for flag, prediction, (_, label) in zip(escalate, lexicon_predictions, reference)) / len(texts)
+        report = {'band': list(band), 'tweets': len(texts), 'escalation_rate': escalation_rate, 'agreement': agreement}
+        line = f"band {band}: escalation {escalation_rate:.1%}, agreement {agreement:.1%}"
+        if transformer_tweets_per_sec:
+            seconds = lexicon_seconds + sum(escalate) / transformer_tweets_per_sec
+            report['tweets_per_sec'] = len(texts) / seconds
+            line += f", ~{report['tweets_per_sec']:.0f} tweets/sec vs {transformer_tweets_per_sec:.0f} transformer-only"
+        print(line)
+        reports.append(report)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate VADER-first tiered sentiment against the transformer output.")
+    parser.add_argument('--results-dirs', nargs='+', default=["content_analysis_results_twitter15", "content_analysis_results_twitter16"])
+    parser.add_argument('--bands', nargs='+', type=float, default=[0.05, 0.25, 0.5, 0.75],
+                        help="Half-widths h of symmetric bands (-h, h)")
+    parser.add_argument('--transformer-tweets-per-sec', type=float, default=None,
+                        help="Measured transformer throughput (e.g. from inference_engine.py) to estimate tiered throughput")
+    args = parser.parse_args()
+
+    evaluate_bands(args.results_dirs, [(-h, h) for h in args.bands], transformer_tweets_per_sec=args.transformer_tweets_per_sec)
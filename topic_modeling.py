@@ -0,0 +1,173 @@
+# topic_modeling.py
+
+import os
+import json
+import time
+import argparse
+from gensim import corpora
+from gensim.models import LdaModel, LdaMulticore
+from gensim.parsing.preprocessing import preprocess_string
+
+DICTIONARY_FILE = "dictionary.gensim"
+MODEL_FILE = "lda.gensim"
+TRAINED_IDS_FILE = "trained_ids.json"
+
+
+def iter_tweets(source):
+    """
+    Stream (tweet_id, content) pairs from a source tweets file, or from an in-memory dict.
+    Args:
+        source (str or dict): Path to a <tweet_id>\\t<text> file, or dict of tweet IDs to content.
+    """
+    if isinstance(source, dict):
+        yield from source.items()
+        return
+    with open(source, 'r') as f:
+        for line in f:
+            tweet_id, tweet_content = line.rstrip('\n').split('\t', 1)
+            yield tweet_id, tweet_content
+
+
+class TweetCorpus:
+    """
+    Bag-of-words corpus that re-reads its source on every pass instead of holding all documents in memory.
+    """
+
+    def __init__(self, source, dictionary, tweet_ids=None):
+        self.source = source
+        self.dictionary = dictionary
+        self.tweet_ids = tweet_ids
+
+    def __iter__(self):
+        for tweet_id, tweet_content in iter_tweets(self.source):
+            if self.tweet_ids is None or tweet_id in self.tweet_ids:
+                yield self.dictionary.doc2bow(preprocess_string(tweet_content))
+
+
+def perplexity(lda_model, corpus):
+    """
+    Per-word perplexity of a streamed corpus under the model, using the same 2^(-per-word bound)
+    estimate that gensim logs during training.
+    """
+    num_words = sum(count for document in corpus for _, count in document)
+    return 2 ** (-lda_model.bound(corpus) / max(num_words, 1))
+
+
+def train_topic_model(source, num_topics=5, passes=15, mode='multicore', workers=None, chunksize=2000, random_state=None):
+    """
+    Train an LDA model over a streamed corpus.
+    Args:
+        source (str or dict): Source tweets file or dict (see iter_tweets).
+        num_topics (int): Number of topics to extract.
+        passes (int): Passes over the corpus.
+        mode (str): 'multicore' (LdaMulticore), 'online' (single-core online LdaModel) or 'batch'
+                    (single-core LdaModel with default settings, the previous behaviour).
+        workers (int): Worker processes for multicore mode; gensim's default is cores - 1.
+        chunksize (int): Documents per training chunk.
+        random_state (int): Seed for reproducible topics.
+    Returns:
+        tuple: (LdaModel, Dictionary, set of trained tweet IDs)
+    """
+    dictionary = corpora.Dictionary(preprocess_string(tweet_content) for _, tweet_content in iter_tweets(source))
+    corpus = TweetCorpus(source, dictionary)
+    if mode == 'multicore':
+        lda_model = LdaMulticore(corpus, num_topics=num_topics, id2word=dictionary, passes=passes,
+                                 workers=workers, chunksize=chunksize, random_state=random_state)
+    elif mode == 'online':
+        lda_model = LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=passes,
+                             chunksize=chunksize, update_every=1, random_state=random_state)
+    else:
+        lda_model = LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=passes, random_state=random_state)
+    trained_ids = {tweet_id for tweet_id, _ in iter_tweets(source)}
+    return lda_model, dictionary, trained_ids
+
+
+def save_topic_model(model_dir, lda_model, dictionary, trained_ids):
+    os.makedirs(model_dir, exist_ok=True)
+    dictionary.save(os.path.join(model_dir, DICTIONARY_FILE))
+    lda_model.save(os.path.join(model_dir, MODEL_FILE))
+    with open(os.path.join(model_dir, TRAINED_IDS_FILE), 'w') as f:
+        json.dump(sorted(trained_ids), f)
+
+
+def load_topic_model(model_dir):
+    """
+    Load a model saved by save_topic_model.
+    Returns:
+        tuple: (LdaModel, Dictionary, set of trained tweet IDs), or None when no model is saved.
+    """
+    if not os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+        return None
+    lda_model = LdaModel.load(os.path.join(model_dir, MODEL_FILE))
+    dictionary = corpora.Dictionary.load(os.path.join(model_dir, DICTIONARY_FILE))
+    with open(os.path.join(model_dir, TRAINED_IDS_FILE), 'r') as f:
+        trained_ids = set(json.load(f))
+    return lda_model, dictionary, trained_ids
+
+
+def update_topic_model(source, lda_model, dictionary, trained_ids, passes=1):
+    """
+    Update an existing model with tweets it has not been trained on, instead of retraining.
+    The vocabulary of a trained model is fixed, so words unseen at training time are ignored.
+    Args:
+        source (str or dict): Source tweets file or dict (see iter_tweets).
+        lda_model (LdaModel): Model to update in place.
+        dictionary (Dictionary): The model's dictionary.
+        trained_ids (set): Tweet IDs already used for training; updated in place.
+        passes (int): Passes over the new tweets.
+    Returns:
+        int: Number of new tweets the model was updated with.
+    """
+    new_ids = {tweet_id for tweet_id, _ in iter_tweets(source) if tweet_id not in trained_ids}
+    if new_ids:
+        lda_model.update(TweetCorpus(source, dictionary, tweet_ids=new_ids), passes=passes)
+        trained_ids.update(new_ids)
+    return len(new_ids)
+
+
+def save_topics(lda_model, label, output_dir, num_words=10):
+    """
+    Write the model's topics to {label}_topic_modeling.json.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    topics = lda_model.print_topics(num_words=num_words)
+    topics_dict = {f"Topic {i+1}": topic for i, topic in topics}
+    output_file_path = os.path.join(output_dir, f"{label}_topic_modeling.json")
+    with open(output_file_path, 'w') as f:
+        json.dump(topics_dict, f, indent=4)
+    return output_file_path
+
+
+def compare_configurations(source, configurations, num_topics=5):
+    """
+    Report training time and perplexity for several training configurations on the same tweets.
+    Args:
+        source (str or dict): Source tweets file or dict (see iter_tweets).
+        configurations (list): Keyword-argument dicts for train_topic_model.
+        num_topics (int): Number of topics to extract.
+    Returns:
+        list: (configuration, seconds, perplexity) tuples.
+    """
+    results = []
+    for configuration in configurations:
+        start = time.perf_counter()
+        lda_model, dictionary, _ = train_topic_model(source, num_topics=num_topics, **configuration)
+        seconds = time.perf_counter() - start
+        score = perplexity(lda_model, TweetCorpus(source, dictionary))
+        print(f"{configuration}: trained in {seconds:.2f}s, perplexity {score:.1f}")
+        results.append((configuration, seconds, score))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare LDA training configurations on a source tweets file.")
+    parser.add_argument('--source-tweets', default="processed_data16/false_source_tweets.txt")
+    parser.add_argument('--num-topics', type=int, default=5)
+    parser.add_argument('--passes', type=int, default=15)
+    args = parser.parse_args()
+
+    compare_configurations(args.source_tweets, [
+        {'mode': 'batch', 'passes': args.passes, 'random_state': 42},
+        {'mode': 'online', 'passes': args.passes, 'random_state': 42},
+        {'mode': 'multicore', 'passes': args.passes, 'random_state': 42},
+    ], num_topics=args.num_topics)
@@ -0,0 +1,162 @@
+# tree_parser.py
+
+import os
+import time
+import argparse
+import numpy as np
+
+# Characters stripped from a tree line before splitting it into fields:
+# "['ROOT', 'ROOT', '0.0']->['39364684', '265953285247209472', '0.0']"
+# becomes "ROOT,ROOT,0.0->39364684,265953285247209472,0.0".
+_STRIP_TABLE = str.maketrans('', '', "[]' \r\n")
+
+# Numeric id used for the synthetic 'ROOT' parent in columnar output.
+ROOT_ID = -1
+
+ARRAY_FIELDS = ('parent_uid', 'parent_tweet_id', 'child_uid', 'child_tweet_id', 'delay')
+
+
+def parse_tree_line(line):
+    """
+    Split one tree line into its fields without using eval.
+    Args:
+        line (str): A "['uid', 'tweet_id', 'delay']->['uid', 'tweet_id', 'delay']" line.
+    Returns:
+        list: [parent_uid, parent_tweet_id, parent_delay, child_uid, child_tweet_id, child_delay] as strings,
+              or None for a blank line.
+    """
+    fields = line.translate(_STRIP_TABLE).replace('->', ',').split(',')
+    if len(fields) != 6:
+        if not line.strip():
+            return None
+        raise ValueError(f"Malformed tree line: {line.strip()!r}")
+    return fields
+
+
+def iter_tree_lines(tree_file_path):
+    """
+    Stream the fields of every edge in a tree file without using eval.
+    Args:
+        tree_file_path (str): Path to the tree file.
+    Yields:
+        list: [parent_uid, parent_tweet_id, parent_delay, child_uid, child_tweet_id, child_delay] as strings.
+    """
+    with open(tree_file_path, 'r') as file:
+        for line in file:
+            fields = line.translate(_STRIP_TABLE).replace('->', ',').split(',')
+            if len(fields) != 6:
+                if not line.strip():
+                    continue
+                raise ValueError(f"Malformed tree line in {tree_file_path}: {line.strip()!r}")
+            yield fields
+
+
+def parse_tree_edges(tree_file_path):
+    """
+    Parse the tree file into the edge tuples used to build networkx graphs.
+    Args:
+        tree_file_path (str): Path to the tree file.
+    Returns:
+        list: List of edges represented as (parent_uid, child_uid, {'delay': float}).
+    """
+    return [(fields[0], fields[3], {'delay': float(fields[5])}) for fields in iter_tree_lines(tree_file_path)]
+
+
+def parse_tree_arrays(tree_file_path):
+    """
+    Parse the tree file into columnar NumPy arrays.
+    The 'ROOT' placeholder is encoded as ROOT_ID in the uid and tweet id columns.
+    Args:
+        tree_file_path (str): Path to the tree file.
+    Returns:
+        dict: Arrays keyed by ARRAY_FIELDS; ids are int64 and delays float64.
+    """
+    parent_uid, parent_tweet_id, child_uid, child_tweet_id, delay = [], [], [], [], []
+    root = str(ROOT_ID)
+    for fields in iter_tree_lines(tree_file_path):
+        if fields[0] == 'ROOT':
+            fields[0] = fields[1] = root
+        parent_uid.append(fields[0])
+        parent_tweet_id.append(fields[1])
+        child_uid.append(fields[3])
+        child_tweet_id.append(fields[4])
+        delay.append(fields[5])
+
+    return {
+        'parent_uid': np.array(parent_uid, dtype=np.int64),
+        'parent_tweet_id': np.array(parent_tweet_id, dtype=np.int64),
+        'child_uid': np.array(child_uid, dtype=np.int64),
+        'child_tweet_id': np.array(child_tweet_id, dtype=np.int64),
+        'delay': np.array(delay, dtype=np.float64),
+    }
+
+
+def _parse_tree_file_eval(tree_file_path):
+    """
+    Previous eval-based implementation of data_loader.parse_tree_file, kept as the benchmark baseline.
+    """
+    edges = []
+    with open(tree_file_path, 'r') as file:
+        lines = file.readlines()
+        for line in lines:
+            parent, child = line.strip().split('->')
+            parent = eval(parent.strip())
+            child = eval(child.strip())
+            edges.append((parent[0], child[0], {'delay': float(child[2])}))
+    return edges
+
+
+def list_tree_files(tree_dirs):
+    """
+    Collect every tree file in the given directories.
+    Args:
+        tree_dirs (list): Directories containing tree files.
+    Returns:
+        list: Paths of all .txt tree files.
+    """
+    tree_files = []
+    for tree_dir in tree_dirs:
+        for tree_file in sorted(os.listdir(tree_dir)):
+            if tree_file.endswith(".txt"):
+                tree_files.append(os.path.join(tree_dir, tree_file))
+    return tree_files
+
+
+def benchmark_parsers(tree_dirs, repeats=3):
+    """
+    Compare parser throughput (edges/sec) on every tree file in the given directories.
+    Args:
+        tree_dirs (list): Directories containing tree files.
+        repeats (int): Number of timed passes per parser; the best pass is reported.
+    Returns:
+        dict: Best wall time and edges/sec for each parser.
+    """
+    tree_files = list_tree_files(tree_dirs)
+    parsers = {
+        'eval (baseline)': _parse_tree_file_eval,
+        'parse_tree_edges': parse_tree_edges,
+        'parse_tree_arrays': parse_tree_arrays,
+    }
+    results = {}
+    for name, parser in parsers.items():
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            num_edges = 0
+            for tree_file_path in tree_files:
+                parsed = parser(tree_file_path)
+                num_edges += len(parsed['delay']) if isinstance(parsed, dict) else len(parsed)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {'files': len(tree_files), 'edges': num_edges, 'seconds': best, 'edges_per_sec': num_edges / best}
+        print(f"{name:>20}: {num_edges} edges from {len(tree_files)} files in {best:.2f}s ({num_edges / best:,.0f} edges/sec)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tree file parsers.")
+    parser.add_argument('--tree-dirs', nargs='+', default=["rumor_detection_acl2017/twitter15/tree", "rumor_detection_acl2017/twitter16/tree"])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    benchmark_parsers(args.tree_dirs, repeats=args.repeats)
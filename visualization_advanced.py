@@ -1,130 +1,320 @@
+# visualization_advanced.py
+
 import os
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
+import time
+import hashlib
+import argparse
+from html import escape
+from urllib.parse import quote
 import numpy as np
+from parallel import run_parallel
+from instrumentation import add_arguments, from_arguments, stage
 
-# Set paths
-base_dir = "./"
-content_analysis_results_dir = {
-    "Twitter15": "content_analysis_results_twitter15",
-    "Twitter16": "content_analysis_results_twitter16"
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+DATASETS = ['twitter15', 'twitter16']
+# Model result directories of cascade_trigger_analysis.py ("Random" model) and advanced_cascade_trigger_analysis.py
+CASCADE_RESULTS_DIRS = {
+    "Random": "cascade_triggering_analysis_results",
+    "Advanced": "cascade_triggering_analysis_results_advanced",
 }
-cascade_results_dir = {
-    "Regular": "cascade_triggering_analysis_results",
-    "Advanced": "cascade_triggering_analysis_results_advanced"
+METRIC_NAMES = {'mse': "MSE", 'mae': "MAE", 'r2': "R²", 'cross_val_mse': "Cross-Validation MSE"}
+SENTIMENT_LABELS = ["POSITIVE", "NEGATIVE", "NEUTRAL"]
+SECTIONS = {
+    'topics': "Topic word clouds",
+    'sentiment': "Sentiment and emotion",
+    'models': "Cascade triggering models",
 }
+DEFAULT_OUTPUT_DIR = "report"
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.html"
 
 # Helper function to load JSON data
 def load_json(file_path):
     with open(file_path, 'r') as f:
         return json.load(f)
 
+def dataset_title(dataset):
+    """
+    Display name of a dataset ('twitter16' -> 'Twitter16').
+    """
+    return dataset[:1].upper() + dataset[1:]
+
+def content_results_dir(dataset, base_dir="."):
+    return os.path.join(base_dir, f"content_analysis_results_{dataset}")
+
+def cascade_results_file(model, dataset, base_dir="."):
+    return os.path.join(base_dir, CASCADE_RESULTS_DIRS[model], f"cascade_triggering_analysis_results_{dataset}.json")
+
+def _new_figure(width, height):
+    # Figures are drawn straight on the non-interactive Agg canvas, without pyplot. matplotlib is
+    # only imported by the processes that render, so a run with nothing to redo never loads it.
+    from matplotlib.figure import Figure
+    return Figure(figsize=(width, height))
+
+def _bar_figure(names, values, title, xlabel, ylabel, output_path, colors=None, width=10, rotate=False):
+    fig = _new_figure(width, 6)
+    ax = fig.subplots()
+    ax.bar(names, values, color=colors)
+    ax.set_title(title)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if rotate:
+        ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(output_path)
+
 # 1. Topic Modeling Visualization
-def visualize_topic_modeling(results_dir):
-    for dataset in content_analysis_results_dir:
-        for label in ['true', 'false', 'unverified', 'non-rumor']:
-            file_path = os.path.join(results_dir[dataset], label, f"{label}_topic_modeling.json")
-            topics = load_json(file_path)
-            for topic, words in topics.items():
-                word_freq = {word.split("*")[1].strip("\""): float(word.split("*")[0]) for word in words.split("+")}
-                wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(word_freq)
-                plt.figure(figsize=(10, 5))
-                plt.imshow(wordcloud, interpolation='bilinear')
-                plt.axis("off")
-                plt.title(f"{dataset} - {label} - {topic}")
-                plt.savefig(f"{dataset}_{label}_{topic}_wordcloud.png")
-                plt.close()
+def render_topic_wordclouds(input_path, output_dir, dataset, label):
+    """
+    One word cloud per LDA topic of a label.
+    Args:
+        input_path (str): {label}_topic_modeling.json written by content_analysis.py.
+        output_dir (str): Directory to save the figures to.
+        dataset (str): Dataset name, e.g. 'twitter16'.
+        label (str): Veracity label.
+    Returns:
+        list: File names of the figures written.
+    """
+    from wordcloud import WordCloud
+    outputs = []
+    for topic, words in load_json(input_path).items():
+        word_freq = {word.split("*")[1].strip().strip("\""): float(word.split("*")[0]) for word in words.split("+")}
+        wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(word_freq)
+        fig = _new_figure(10, 5)
+        ax = fig.subplots()
+        ax.imshow(wordcloud.to_array(), interpolation='bilinear')
+        ax.axis("off")
+        ax.set_title(f"{dataset_title(dataset)} - {label} - {topic}")
+        file_name = f"{dataset_title(dataset)}_{label}_{topic}_wordcloud.png"
+        fig.savefig(os.path.join(output_dir, file_name))
+        outputs.append(file_name)
+    return outputs
 
 # 2. Sentiment and Emotion Distribution
-def visualize_sentiment_emotion(results_dir):
-    for dataset in content_analysis_results_dir:
-        sentiment_counts = {"POSITIVE": 0, "NEGATIVE": 0, "NEUTRAL": 0}
-        emotion_counts = {}
-        for label in ['true', 'false', 'unverified', 'non-rumor']:
-            file_path = os.path.join(results_dir[dataset], label, f"{label}_sentiment_emotion_analysis.json")
-            data = load_json(file_path)
-            for entry in data:
-                sentiment_counts[entry['sentiment_label']] += 1
-                if entry['emotion_label'] not in emotion_counts:
-                    emotion_counts[entry['emotion_label']] = 0
-                emotion_counts[entry['emotion_label']] += 1
-
-        # Plot Sentiment Distribution
-        plt.figure(figsize=(8, 6))
-        plt.bar(sentiment_counts.keys(), sentiment_counts.values(), color=['blue', 'orange', 'green'])
-        plt.title(f"{dataset} - Sentiment Distribution")
-        plt.xlabel("Sentiment")
-        plt.ylabel("Count")
-        plt.savefig(f"{dataset}_sentiment_distribution.png")
-        plt.close()
-
-        # Plot Emotion Distribution
-        plt.figure(figsize=(10, 6))
-        plt.bar(emotion_counts.keys(), emotion_counts.values())
-        plt.title(f"{dataset} - Emotion Distribution")
-        plt.xlabel("Emotion")
-        plt.ylabel("Count")
-        plt.xticks(rotation=45)
-        plt.savefig(f"{dataset}_emotion_distribution.png")
-        plt.close()
-
-# 3. Cascade Triggering Analysis (Random Model)
-def visualize_cascade_triggering_random(results_dir):
-    metrics = load_json(os.path.join(results_dir["Regular"], "cascade_triggering_analysis_results_twitter16.json"))
-    labels = ["MSE", "MAE", "R²", "Cross-Validation MSE"]
-    values = [metrics['mse'], metrics['mae'], metrics['r2'], metrics['cross_val_mse']]
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(labels, values, color=['blue', 'orange', 'green', 'red'])
-    plt.title("Random Model - Evaluation Metrics")
-    plt.ylabel("Value")
-    plt.savefig("random_model_evaluation_metrics.png")
-    plt.close()
-
-# 4. Cascade Triggering Analysis (Advanced Model)
-def visualize_cascade_triggering_advanced(results_dir):
-    metrics = load_json(os.path.join(results_dir["Advanced"], "cascade_triggering_analysis_results_twitter16.json"))
-    labels = ["MSE", "MAE", "R²", "Cross-Validation MSE"]
-    values = [metrics['mse'], metrics['mae'], metrics['r2'], metrics['cross_val_mse']]
-
-    plt.figure(figsize=(10, 6))
-    plt.bar(labels, values, color=['blue', 'orange', 'green', 'red'])
-    plt.title("Advanced Model - Evaluation Metrics")
-    plt.ylabel("Value")
-    plt.savefig("advanced_model_evaluation_metrics.png")
-    plt.close()
+def render_sentiment_emotion(input_paths, output_dir, dataset):
+    """
+    Sentiment and emotion distributions over all labels of a dataset.
+    Args:
+        input_paths (list): {label}_sentiment_emotion_analysis.json of every label.
+        output_dir (str): Directory to save the figures to.
+        dataset (str): Dataset name.
+    Returns:
+        list: File names of the figures written.
+    """
+    sentiment_counts = dict.fromkeys(SENTIMENT_LABELS, 0)
+    emotion_counts = {}
+    for input_path in input_paths:
+        for entry in load_json(input_path):
+            sentiment_counts[entry['sentiment_label']] = sentiment_counts.get(entry['sentiment_label'], 0) + 1
+            emotion_counts[entry['emotion_label']] = emotion_counts.get(entry['emotion_label'], 0) + 1
 
-# 5. Comparative Analysis
-def visualize_comparative_analysis(results_dir):
-    regular_metrics = load_json(os.path.join(results_dir["Regular"], "cascade_triggering_analysis_results_twitter16.json"))
-    advanced_metrics = load_json(os.path.join(results_dir["Advanced"], "cascade_triggering_analysis_results_twitter16.json"))
+    name = dataset_title(dataset)
+    outputs = [f"{name}_sentiment_distribution.png", f"{name}_emotion_distribution.png"]
+    _bar_figure(list(sentiment_counts), list(sentiment_counts.values()), f"{name} - Sentiment Distribution", "Sentiment", "Count",
+                os.path.join(output_dir, outputs[0]), colors=['blue', 'orange', 'green'], width=8)
+    _bar_figure(list(emotion_counts), list(emotion_counts.values()), f"{name} - Emotion Distribution", "Emotion", "Count",
+                os.path.join(output_dir, outputs[1]), rotate=True)
+    return outputs
 
-    labels = ["MSE", "MAE", "R²", "Cross-Validation MSE"]
-    regular_values = [regular_metrics['mse'], regular_metrics['mae'], regular_metrics['r2'], regular_metrics['cross_val_mse']]
-    advanced_values = [advanced_metrics['mse'], advanced_metrics['mae'], advanced_metrics['r2'], advanced_metrics['cross_val_mse']]
+# 3./4. Cascade Triggering Analysis (Random and Advanced Model)
+def render_model_metrics(input_path, output_dir, dataset, model):
+    """
+    Evaluation metrics of one cascade triggering model on a dataset.
+    Args:
+        input_path (str): Model result JSON.
+        output_dir (str): Directory to save the figure to.
+        dataset (str): Dataset name.
+        model (str): 'Random' or 'Advanced' (see CASCADE_RESULTS_DIRS).
+    Returns:
+        list: File name of the figure written.
+    """
+    metrics = load_json(input_path)
+    file_name = f"{dataset_title(dataset)}_{model.lower()}_model_evaluation_metrics.png"
+    _bar_figure(list(METRIC_NAMES.values()), [metrics[key] for key in METRIC_NAMES],
+                f"{dataset_title(dataset)} - {model} Model - Evaluation Metrics", None, "Value",
+                os.path.join(output_dir, file_name), colors=['blue', 'orange', 'green', 'red'])
+    return [file_name]
 
-    x = np.arange(len(labels))
+# 5. Comparative Analysis
+def render_model_comparison(input_paths, output_dir, dataset):
+    """
+    Side-by-side metrics of the Random and Advanced models on a dataset.
+    Args:
+        input_paths (list): Random and Advanced model result JSONs.
+        output_dir (str): Directory to save the figure to.
+        dataset (str): Dataset name.
+    Returns:
+        list: File name of the figure written.
+    """
+    regular_metrics, advanced_metrics = (load_json(input_path) for input_path in input_paths)
+    x = np.arange(len(METRIC_NAMES))
     width = 0.35
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    rects1 = ax.bar(x - width/2, regular_values, width, label='Regular Model', color='blue')
-    rects2 = ax.bar(x + width/2, advanced_values, width, label='Advanced Model', color='green')
-
+    fig = _new_figure(10, 6)
+    ax = fig.subplots()
+    ax.bar(x - width/2, [regular_metrics[key] for key in METRIC_NAMES], width, label='Random Model', color='blue')
+    ax.bar(x + width/2, [advanced_metrics[key] for key in METRIC_NAMES], width, label='Advanced Model', color='green')
     ax.set_xlabel('Metrics')
-    ax.set_title('Comparison of Regular and Advanced Models')
+    ax.set_title(f'{dataset_title(dataset)} - Comparison of Random and Advanced Models')
     ax.set_xticks(x)
-    ax.set_xticklabels(labels)
+    ax.set_xticklabels(list(METRIC_NAMES.values()))
     ax.legend()
-
     fig.tight_layout()
-    plt.savefig("model_comparison.png")
-    plt.close()
-
-# Run visualizations
-visualize_topic_modeling(content_analysis_results_dir)
-visualize_sentiment_emotion(content_analysis_results_dir)
-visualize_cascade_triggering_random(cascade_results_dir)
-visualize_cascade_triggering_advanced(cascade_results_dir)
-visualize_comparative_analysis(cascade_results_dir)
\ No newline at end of file
+    file_name = f"{dataset_title(dataset)}_model_comparison.png"
+    fig.savefig(os.path.join(output_dir, file_name))
+    return [file_name]
+
+RENDERERS = {
+    'topic_wordclouds': render_topic_wordclouds,
+    'sentiment_emotion': render_sentiment_emotion,
+    'model_metrics': render_model_metrics,
+    'model_comparison': render_model_comparison,
+}
+
+def _render(kind, args):
+    return RENDERERS[kind](*args)
+
+def plan_figures(datasets=DATASETS, output_dir=DEFAULT_OUTPUT_DIR, base_dir="."):
+    """
+    Every figure task of the report. A task renders one or more figures from its input JSON files.
+    Args:
+        datasets (list): Dataset names, e.g. ['twitter15', 'twitter16'].
+        output_dir (str): Report directory.
+        base_dir (str): Directory holding the result directories.
+    Returns:
+        list: Task dicts with 'key', 'section', 'kind', 'inputs' and renderer 'args'.
+    """
+    tasks = []
+    for dataset in datasets:
+        content_dir = content_results_dir(dataset, base_dir)
+        for label in LABELS:
+            input_path = os.path.join(content_dir, label, f"{label}_topic_modeling.json")
+            tasks.append({'key': f"{dataset}/topics/{label}", 'section': 'topics', 'kind': 'topic_wordclouds',
+                          'inputs': [input_path], 'args': (input_path, output_dir, dataset, label)})
+        input_paths = [os.path.join(content_dir, label, f"{label}_sentiment_emotion_analysis.json") for label in LABELS]
+        tasks.append({'key': f"{dataset}/sentiment_emotion", 'section': 'sentiment', 'kind': 'sentiment_emotion',
+                      'inputs': input_paths, 'args': (input_paths, output_dir, dataset)})
+        for model in CASCADE_RESULTS_DIRS:
+            input_path = cascade_results_file(model, dataset, base_dir)
+            tasks.append({'key': f"{dataset}/models/{model.lower()}", 'section': 'models', 'kind': 'model_metrics',
+                          'inputs': [input_path], 'args': (input_path, output_dir, dataset, model)})
+        input_paths = [cascade_results_file(model, dataset, base_dir) for model in CASCADE_RESULTS_DIRS]
+        tasks.append({'key': f"{dataset}/models/comparison", 'section': 'models', 'kind': 'model_comparison',
+                      'inputs': input_paths, 'args': (input_paths, output_dir, dataset)})
+    return tasks
+
+def file_hash(path):
+    """
+    SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def task_fingerprint(task, input_hashes):
+    """
+    Hash of everything a task's figures depend on: the renderer, its arguments and its input contents.
+    """
+    config = {'kind': task['kind'], 'args': list(task['args']), 'inputs': [input_hashes[path] for path in task['inputs']]}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+def write_index(manifest, tasks, output_path, datasets):
+    """
+    Write an HTML page showing every figure of the report, grouped by dataset and section.
+    """
+    lines = ["<!DOCTYPE html>", "<html><head><meta charset=\"utf-8\"><title>Fake news analysis report</title></head><body>",
+             f"<h1>Fake news analysis report: {escape(', '.join(dataset_title(dataset) for dataset in datasets))}</h1>"]
+    for dataset in datasets:
+        lines.append(f"<h2>{escape(dataset_title(dataset))}</h2>")
+        for section, title in SECTIONS.items():
+            figures = [output for task in tasks if task['section'] == section and task['key'].startswith(f"{dataset}/")
+                       for output in manifest.get(task['key'], {}).get('outputs', [])]
+            if figures:
+                lines.append(f"<h3>{escape(title)}</h3>")
+                lines.extend(f"<figure style=\"display:inline-block\"><img src=\"{quote(figure)}\" width=\"480\">"
+                             f"<figcaption>{escape(figure)}</figcaption></figure>" for figure in figures)
+    lines.append("</body></html>")
+    with open(output_path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+def build_report(datasets=DATASETS, output_dir=DEFAULT_OUTPUT_DIR, base_dir=".", workers=1, force=False, metrics=None):
+    """
+    Render the report figures into output_dir, skipping tasks whose inputs have not changed.
+    A manifest in output_dir records each task's fingerprint (see task_fingerprint) and figures;
+    a task is rendered again only when its fingerprint changes or one of its figures is missing.
+    Args:
+        datasets (list): Dataset names.
+        output_dir (str): Report directory; gets the figures, manifest.json and index.html.
+        base_dir (str): Directory holding the result directories.
+        workers (int): Number of processes rendering figures.
+        force (bool): Render every task regardless of the manifest.
+        metrics (RunMetrics): Optional instrumentation.
+    Returns:
+        dict: Task counts ('rendered', 'up_to_date', 'missing_inputs', 'failed').
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = load_json(manifest_path) if os.path.exists(manifest_path) else {}
+    tasks = plan_figures(datasets, output_dir, base_dir)
+    counts = {'rendered': 0, 'up_to_date': 0, 'missing_inputs': 0, 'failed': 0}
+
+    pending, fingerprints = [], {}
+    with stage(metrics, 'hash_inputs') as hash_stage:
+        input_hashes = {}
+        for task in tasks:
+            missing = [path for path in task['inputs'] if not os.path.exists(path)]
+            if missing:
+                print(f"Skipping {task['key']}: missing {', '.join(missing)}")
+                manifest.pop(task['key'], None)
+                counts['missing_inputs'] += 1
+                continue
+            for path in task['inputs']:
+                if path not in input_hashes:
+                    input_hashes[path] = file_hash(path)
+            fingerprints[task['key']] = task_fingerprint(task, input_hashes)
+            entry = manifest.get(task['key'])
+            if (not force and entry is not None and entry['fingerprint'] == fingerprints[task['key']]
+                    and all(os.path.exists(os.path.join(output_dir, output)) for output in entry['outputs'])):
+                counts['up_to_date'] += 1
+            else:
+                pending.append(task)
+        hash_stage.add_items(len(input_hashes))
+
+    with stage(metrics, 'render_figures') as render_stage:
+        results = run_parallel(_render, [(task['key'], (task['kind'], task['args'])) for task in pending], workers=workers,
+                               stage_metrics=render_stage)
+    for task, (key, outputs, error) in zip(pending, results):
+        if error is None:
+            manifest[key] = {'fingerprint': fingerprints[key], 'inputs': task['inputs'], 'outputs': outputs}
+            counts['rendered'] += 1
+        else:
+            manifest.pop(key, None)
+            counts['failed'] += 1
+    if metrics is not None:
+        metrics.cache('figures', counts['up_to_date'], len(pending))
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    write_index(manifest, tasks, os.path.join(output_dir, INDEX_FILE), datasets)
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the report figures, redoing only those whose input JSON changed.")
+    parser.add_argument('--datasets', nargs='+', default=DATASETS)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--force', action='store_true', help="Render every figure even if its inputs are unchanged")
+    add_arguments(parser, 'visualization_advanced')
+    args = parser.parse_args()
+    metrics = from_arguments('visualization_advanced', args)
+
+    start = time.perf_counter()
+    counts = build_report(args.datasets, args.output_dir, workers=args.workers, force=args.force, metrics=metrics)
+    print(f"{counts['rendered']} figure tasks rendered, {counts['up_to_date']} up to date, {counts['failed']} failed, "
+          f"{counts['missing_inputs']} with missing inputs in {time.perf_counter() - start:.2f}s; "
+          f"index at {os.path.join(args.output_dir, INDEX_FILE)}")
+    metrics.write(args.metrics_output)
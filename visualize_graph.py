@@ -1,10 +1,27 @@
 # visualize_graph.py
 
 import os
+import time
+import argparse
+import numpy as np
 import networkx as nx
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
 import pickle
-from data_loader import parse_tree_file
+from data_loader import list_label_trees, load_tree_manifest, parse_tree_file
+from tree_parser import parse_tree_arrays
+from cascade_metrics import build_event_tree
+from parallel import run_parallel
+from instrumentation import add_arguments, from_arguments, stage
+
+LABELS = ['true', 'false', 'unverified', 'non-rumor']
+# Nodes labelled with their uid and subtree size in radial renders
+DEFAULT_TOP_K = 10
+DEFAULT_FIGSIZE = 12
+DEFAULT_DPI = 150
+DELAY_COLORMAP = 'viridis'
 
 def visualize_network(G, title='Network Visualization'):
     """
@@ -15,18 +32,131 @@ def visualize_network(G, title='Network Visualization'):
     """
     plt.figure(figsize=(12, 12))
     pos = nx.spring_layout(G, k=0.15, iterations=20)
-    
+
     # Draw nodes and edges with different styles
     nx.draw_networkx_nodes(G, pos, node_size=50, node_color='blue')
     nx.draw_networkx_edges(G, pos, edgelist=G.edges(), edge_color='gray')
-    
+
     # Draw labels to understand the propagation
     labels = {node: node for node in G.nodes()}
     nx.draw_networkx_labels(G, pos, labels, font_size=8, font_color='black')
-    
+
     plt.title(title)
     plt.show()
 
+def radial_tree_layout(tree):
+    """
+    Radial layout of an event tree in O(n): every node sits on the circle of radius depth, in the
+    middle of an angular wedge proportional to its subtree size, and its children split that
+    wedge in order. When ROOT has a single child (the source tweet), the source is the center.
+    Args:
+        tree (dict): Event tree as returned by cascade_metrics.build_event_tree.
+    Returns:
+        tuple: (x, y, radius) arrays per node; nodes above the center have NaN coordinates.
+    """
+    parent, subtree_size, levels = tree['parent'], tree['subtree_size'], tree['levels']
+    # Wedge start of every node, in units of one node; a node's own slot is the first half unit
+    # of its wedge, so its children's wedges (which sum to subtree_size - 1) start half a unit in
+    start = np.zeros(len(parent), dtype=np.float64)
+    for level in levels[1:]:
+        # _bfs_levels emits the children of each parent contiguously, so no sort is needed
+        level_parents = parent[level]
+        sizes = subtree_size[level]
+        offsets = np.cumsum(sizes) - sizes
+        new_group = np.r_[True, level_parents[1:] != level_parents[:-1]]
+        group_offsets = offsets[new_group][np.cumsum(new_group) - 1]
+        start[level] = start[level_parents] + 0.5 + offsets - group_offsets
+
+    shift = 1 if tree['num_children'][0] == 1 else 0
+    center = levels[shift][0]
+    angle = (start + subtree_size / 2) * (2 * np.pi / subtree_size[center])
+    radius = (tree['depth'] - shift).astype(np.float64)
+    radius[radius < 0] = np.nan
+    return radius * np.cos(angle), radius * np.sin(angle), radius
+
+def render_cascade(tree_file_path, output_path, top_k=DEFAULT_TOP_K, figsize=DEFAULT_FIGSIZE, dpi=DEFAULT_DPI, title=None):
+    """
+    Render a cascade with the radial tree layout to an image file, without a display.
+    Edges are drawn as a single line collection, nodes as one scatter colored by delay, and only
+    the top_k nodes by subtree size are labelled. Marker size and edge width shrink with the
+    number of nodes so large cascades stay readable.
+    Args:
+        tree_file_path (str): Path to the tree file.
+        output_path (str): Image path (the format follows the extension, e.g. .png).
+        top_k (int): Number of nodes to label.
+        figsize (float): Figure width and height in inches.
+        dpi (int): Resolution of raster output.
+        title (str): Plot title; defaults to the tree file name, node count and depth.
+    Returns:
+        dict: Number of nodes and edges drawn and the cascade depth.
+    """
+    tree = build_event_tree(parse_tree_arrays(tree_file_path))
+    x, y, radius = radial_tree_layout(tree)
+    drawn = np.flatnonzero(~np.isnan(radius))
+    children = drawn[radius[drawn] > 0]
+    parents = tree['parent'][children]
+    num_nodes = len(drawn)
+
+    # Fixed axes positions instead of bbox_inches='tight', which draws the whole figure twice
+    fig = Figure(figsize=(figsize * 1.1, figsize))
+    ax = fig.add_axes((0.01, 0.01, 0.85, 0.94))
+    segments = np.stack([np.column_stack([x[parents], y[parents]]), np.column_stack([x[children], y[children]])], axis=1)
+    ax.add_collection(LineCollection(segments, colors='gray', linewidths=min(0.8, 20 / np.sqrt(num_nodes)),
+                                     alpha=0.5, zorder=1, rasterized=True))
+    # Delays are minutes since the source tweet and span several orders of magnitude (a few are negative)
+    colors = np.log10(1 + np.maximum(tree['delay'][drawn], 0))
+    # Events with no known delay (NaN) are drawn in gray
+    cmap = matplotlib.colormaps[DELAY_COLORMAP].with_extremes(bad='lightgray')
+    points = ax.scatter(x[drawn], y[drawn], c=colors, cmap=cmap, s=min(30.0, max(0.5, 20_000 / num_nodes)),
+                        linewidths=0, zorder=2, rasterized=True)
+    fig.colorbar(points, cax=fig.add_axes((0.89, 0.2, 0.02, 0.6)), label='log10(1 + delay in minutes)')
+
+    # Labels point away from the center so labels of neighbouring hubs do not stack up
+    ranked = drawn[np.argsort(-tree['subtree_size'][drawn], kind='stable')][:top_k]
+    for node in ranked.tolist():
+        angle = np.arctan2(y[node], x[node]) if radius[node] > 0 else np.pi / 2
+        ax.annotate(f"{tree['uid'][node]} ({tree['subtree_size'][node]})", (x[node], y[node]), fontsize=7,
+                    xytext=(8 * np.cos(angle), 8 * np.sin(angle)), textcoords='offset points',
+                    ha='left' if np.cos(angle) >= 0 else 'right', va='center', zorder=3,
+                    bbox={'boxstyle': 'round,pad=0.2', 'facecolor': 'white', 'alpha': 0.7, 'linewidth': 0})
+
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.autoscale_view()
+    ax.set_axis_off()
+    ax.set_title(title or f"Cascade {os.path.basename(tree_file_path)}: {num_nodes} nodes, depth {int(np.nanmax(radius))}")
+    fig.savefig(output_path, dpi=dpi)
+    return {'nodes': num_nodes, 'edges': len(children), 'depth': int(np.nanmax(radius))}
+
+def render_directory(tree_dir, output_dir, workers=1, top_k=DEFAULT_TOP_K, image_format='png', metrics=None, label=None,
+                     tree_files=None):
+    """
+    Render every tree file of a directory (e.g. processed_data16/true_trees) with render_cascade.
+    Args:
+        tree_dir (str): Directory containing tree files.
+        output_dir (str): Directory to save the images to.
+        workers (int): Number of worker processes.
+        top_k (int): Number of nodes to label per cascade.
+        image_format (str): Image file extension.
+        metrics (RunMetrics): Optional instrumentation; records the per-cascade render times.
+        label (str): Label of the directory, used to name the instrumentation stage.
+        tree_files (list): Optional (tweet_id, path) tuples to render instead of listing tree_dir
+                           (see data_loader.list_label_trees).
+    Returns:
+        list: (tweet_id, stats, error) per cascade.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if tree_files is None:
+        tree_files = [(tree_file.replace('.txt', ''), os.path.join(tree_dir, tree_file))
+                      for tree_file in sorted(os.listdir(tree_dir)) if tree_file.endswith(".txt")]
+    tasks, sizes = [], []
+    for tweet_id, tree_file_path in tree_files:
+        tasks.append((tweet_id, (tree_file_path, os.path.join(output_dir, f"{tweet_id}.{image_format}"), top_k)))
+        sizes.append(os.path.getsize(tree_file_path))
+    with stage(metrics, 'render_cascades', label=label or os.path.basename(tree_dir)) as render_stage:
+        results = run_parallel(render_cascade, tasks, workers=workers, sizes=sizes, stage_metrics=render_stage)
+        render_stage.count('nodes', sum(stats['nodes'] for _, stats, _ in results if stats))
+    return results
+
 def visualize_saved_graph(graph_file_path):
     """
     Visualize a saved graph file.
@@ -47,17 +177,36 @@ def visualize_tree_file(tree_file_path):
     G = nx.DiGraph()
     edges = parse_tree_file(tree_file_path)
     G.add_edges_from(edges)
-    
+
     print(f"Visualizing network for tree file {tree_file_path} with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges.")
     visualize_network(G, title=f'Visualization for {os.path.basename(tree_file_path)}')
 
 if __name__ == "__main__":
-    # Uncomment one of the following lines to visualize a tree file or a saved graph file
-    
-    # Visualize a single tree file
-    # tree_file_path = "processed_data15/true_trees/295152287901417472.txt"
-    # visualize_tree_file(tree_file_path)
-    
-    # Visualize a saved graph file
-    graph_file_path = "graphs16/true_graphs/498430783699554305.pkl"
-    visualize_saved_graph(graph_file_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Visualize cascades: interactive spring layout of a saved graph, or radial renders of tree files.")
+    parser.add_argument('--graph-file', default="graphs16/true_graphs/498430783699554305.pkl", help="Saved graph to show interactively")
+    parser.add_argument('--tree-file', default=None, help="Render one tree file with the radial layout")
+    parser.add_argument('--input-dir', default=None, help="Render every {label}_trees directory of a processed dataset (e.g. processed_data16)")
+    parser.add_argument('--output', default=None, help="Image path for --tree-file (default: <tweet_id>.png)")
+    parser.add_argument('--output-dir', default="images/cascades16", help="Image directory for --input-dir")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help="Nodes labelled per cascade, by subtree size")
+    parser.add_argument('--format', default='png')
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes")
+    add_arguments(parser, 'visualize_graph')
+    args = parser.parse_args()
+
+    if args.tree_file:
+        output_path = args.output or os.path.basename(args.tree_file).replace('.txt', f'.{args.format}')
+        start = time.perf_counter()
+        stats = render_cascade(args.tree_file, output_path, top_k=args.top_k)
+        print(f"Rendered {stats['nodes']} nodes (depth {stats['depth']}) to {output_path} in {time.perf_counter() - start:.2f}s")
+    elif args.input_dir:
+        metrics = from_arguments('visualize_graph', args)
+        manifest = load_tree_manifest(args.input_dir)
+        for label in LABELS:
+            tree_dir = os.path.join(args.input_dir, f"{label}_trees")
+            render_directory(tree_dir, os.path.join(args.output_dir, label), workers=args.workers, top_k=args.top_k,
+                             image_format=args.format, metrics=metrics, label=label,
+                             tree_files=list_label_trees(args.input_dir, label, manifest))
+        metrics.write(args.metrics_output)
+    else:
+        visualize_saved_graph(args.graph_file)